@@ -0,0 +1,84 @@
+"""Compare the per-keyword and the batched json aggregation of AggSerpAPIBundle
+
+The per-keyword path runs the `AggAPIJSON` pipeline on each series,
+the batched path concatenates all series as `AggSerpAPIBundle` does
+and serializes them at once with `AggAPIJSON.to_json_bytes_by`. Only the aggregation is timed,
+the files are not written.
+
+```sh
+poetry run python benchmarks/bench_agg_batched.py --n-keywords 1000 --n-keywords 5000
+```
+"""
+import datetime
+import time
+from typing import List
+
+import click
+import pandas as pd
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+from synthetic import weekly_series
+
+from sm_trendy.aggregate.agg import AggAPIJSON, AggSerpAPIBundle
+from sm_trendy.utilities.config import PathParams
+from sm_trendy.utilities.schema import enforce_trend_schema
+
+
+def per_keyword(frames: List[pd.DataFrame]):
+    return {
+        i: AggAPIJSON().to_json_bytes(dataframe=df, sort_by="date")
+        for i, df in enumerate(frames)
+    }
+
+
+def batched(frames: List[pd.DataFrame]):
+    inputs = [
+        (
+            PathParams(keyword=f"coffee {i}", cat="0", geo="DE", timeframe="today 5-y"),
+            None,
+            None,
+            df,
+        )
+        for i, df in enumerate(frames)
+    ]
+    series = AggSerpAPIBundle._concat(inputs)
+    return AggAPIJSON().to_json_bytes_by(
+        dataframe=series, by="series_id", sort_by="date"
+    )
+
+
+@click.command()
+@click.option("--n-keywords", type=int, multiple=True, default=[1000])
+@click.option("--repeat", type=int, default=3)
+def main(n_keywords: List[int], repeat: int):
+    logger.remove()
+
+    table = Table(title="Aggregate 5-year weekly series to json")
+    for c in ["keywords", "path", "time (s)", "per keyword (ms)"]:
+        table.add_column(c, justify="right")
+
+    for n in n_keywords:
+        frames = [
+            enforce_trend_schema(
+                weekly_series(
+                    keyword=f"coffee {i}", start=datetime.date(2018, 7, 29), seed=i
+                )
+            )
+            for i in range(n)
+        ]
+        for name, func in {"per keyword": per_keyword, "batched": batched}.items():
+            seconds = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                func(frames)
+                seconds.append(time.perf_counter() - t0)
+            table.add_row(
+                str(n), name, f"{min(seconds):.3f}", f"{min(seconds) / n * 1e3:.3f}"
+            )
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
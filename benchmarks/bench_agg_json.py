@@ -0,0 +1,93 @@
+"""Compare the legacy and the vectorized json serialization of AggAPIJSON
+
+The legacy path builds a list of dictionaries, sorts it in python,
+and dumps it with the standard library.
+
+```sh
+poetry run python benchmarks/bench_agg_json.py --n-series 200
+```
+"""
+import datetime
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import click
+import pandas as pd
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+from synthetic import weekly_series
+
+from sm_trendy.aggregate.agg import AggAPIJSON
+from sm_trendy.utilities.schema import enforce_trend_schema, format_dates
+from sm_trendy.utilities.storage import StoreJSON
+
+
+def legacy(apj: AggAPIJSON, dataframe, sort_by: str):
+    df = dataframe.copy()
+    df = df[apj.keep_columns]
+    df["date"] = format_dates(df["date"])
+    df.rename(columns=apj.fields, inplace=True)
+    records = df.to_dict(orient="records")
+    return sorted(records, key=lambda x: x[sort_by])
+
+
+def measure(func):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+@click.command()
+@click.option("--n-series", type=int, default=200)
+@click.option("--repeat", type=int, default=3)
+def main(n_series: int, repeat: int):
+    logger.remove()
+    # weekly series since 2004, for several queries in one frame
+    df = enforce_trend_schema(
+        pd.concat(
+            [
+                weekly_series(
+                    keyword=f"coffee {i}",
+                    start=datetime.date(2004, 1, 4),
+                    n_weeks=1000,
+                    seed=i,
+                )
+                for i in range(n_series)
+            ]
+        ).sample(frac=1, random_state=42)
+    )
+    apj = AggAPIJSON()
+
+    table = Table(title=f"Serialize {len(df)} points")
+    for c in ["path", "time (s)", "peak memory (MB)"]:
+        table.add_column(c, justify="right")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sj = StoreJSON(target_folder=Path(tmp), snapshot_date="latest")
+        paths = {
+            "legacy": lambda: sj.save(records=legacy(apj, df, "date")),
+            "vectorized": lambda: sj.save(
+                records=apj.to_json_bytes(df, sort_by="date")
+            ),
+        }
+        for name, func in paths.items():
+            results = [measure(func) for _ in range(repeat)]
+            table.add_row(
+                name,
+                f"{min(r[0] for r in results):.3f}",
+                f"{min(r[1] for r in results) / 1e6:.1f}",
+            )
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Wall time of `PooledDownload` with one keyword per request and with
+batches of up to five keywords
+
+The requests are simulated: google answers after `--latency` seconds
+with synthetic weekly series, and each proxy allows one request every
+`--min-interval` seconds. The keywords are spread over `--n-geos`
+geos, so that some batches are not full. The trends are written to a
+temporary folder, as `download-pytrends` does.
+
+```sh
+poetry run python benchmarks/bench_batch_pytrends.py --n-keywords 100 --n-proxies 2
+```
+"""
+import datetime
+import tempfile
+import time
+from pathlib import Path
+
+import click
+import pandas as pd
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+from synthetic import keywords, weekly_series
+
+from sm_trendy.use_pytrends.config import Config, RequestParams
+from sm_trendy.use_pytrends.get_trends import PooledDownload
+from sm_trendy.use_pytrends.proxy import ProxyPool
+from sm_trendy.utilities.config import PathParams, TrendParams
+
+
+class SimulatedTrendReq:
+    latency = 0.05
+
+    def __init__(self, proxy: str):
+        self.proxy = proxy
+        self.requests = 0
+
+    def build_payload(self, kw_list, cat=0, timeframe="today 5-y", geo=""):
+        self.kw_list = kw_list
+
+    def interest_over_time(self) -> pd.DataFrame:
+        time.sleep(self.latency)
+        self.requests += 1
+        df = pd.DataFrame(
+            {
+                k: weekly_series(k, datetime.date(2018, 7, 22), seed=i)[
+                    "extracted_value"
+                ]
+                for i, k in enumerate(self.kw_list)
+            }
+        )
+        df.insert(0, "date", pd.date_range("2018-07-22", periods=len(df), freq="7D"))
+        df["isPartial"] = False
+        return df
+
+
+def configs(n_keywords: int, n_geos: int):
+    geos = ["DE", "US", "FR", "GB", "IT", "ES"][:n_geos]
+    return [
+        Config(
+            request_params=RequestParams(),
+            trend_params=TrendParams(
+                keyword=k, geo=geos[i % n_geos], timeframe="today 5-y", cat=0
+            ),
+            path_params=PathParams(
+                keyword=k, cat="0", geo=geos[i % n_geos], timeframe="today 5-y"
+            ),
+        )
+        for i, k in enumerate(keywords(n_keywords))
+    ]
+
+
+@click.command()
+@click.option("--n-keywords", type=int, default=100)
+@click.option("--n-geos", type=int, default=3)
+@click.option("--n-proxies", type=int, default=2)
+@click.option("--latency", type=float, default=0.05)
+@click.option("--min-interval", type=float, default=0.2)
+def main(
+    n_keywords: int, n_geos: int, n_proxies: int, latency: float, min_interval: float
+):
+    logger.remove()
+    SimulatedTrendReq.latency = latency
+
+    table = Table(
+        title=(
+            f"{n_keywords} keywords in {n_geos} geos, {n_proxies} proxies, "
+            f"{min_interval} s between requests"
+        )
+    )
+    for c in ["batch size", "requests", "time (s)", "keywords / s"]:
+        table.add_column(c, justify="right")
+
+    for batch_size in [1, 5]:
+        services = []
+
+        def factory(proxy: str) -> SimulatedTrendReq:
+            services.append(SimulatedTrendReq(proxy))
+            return services[-1]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            pdl = PooledDownload(
+                parent_folder=Path(tmp),
+                snapshot_date=datetime.date(2023, 6, 1),
+                proxy_pool=ProxyPool(
+                    [f"proxy-{i}" for i in range(n_proxies)],
+                    min_interval=min_interval,
+                ),
+                trends_service_factory=factory,
+                batch_size=batch_size,
+            )
+            t0 = time.perf_counter()
+            summary = pdl(configs(n_keywords, n_geos))
+            seconds = time.perf_counter() - t0
+
+        assert summary["downloaded"] == n_keywords
+        table.add_row(
+            str(batch_size),
+            str(sum(s.requests for s in services)),
+            f"{seconds:.2f}",
+            f"{n_keywords / seconds:.1f}",
+        )
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
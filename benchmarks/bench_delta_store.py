@@ -0,0 +1,119 @@
+"""Benchmark the delta time series store against the full-copy layout
+
+```sh
+poetry run python benchmarks/bench_delta_store.py --n-keywords 20 --n-snapshots 30
+```
+"""
+import datetime
+import tempfile
+import time
+from pathlib import Path
+
+import click
+import pandas as pd
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+from synthetic import SyntheticTrend, daily_snapshots, keywords
+
+from sm_trendy.utilities.config import PathParams
+from sm_trendy.utilities.storage import (
+    StoreDataFrame,
+    StoreDeltaDataFrame,
+    list_snapshot_dates,
+)
+
+LAYOUTS = ["csv", "parquet", "delta"]
+
+
+def folder_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def save_snapshot(
+    layout: str, target_folder: Path, snapshot_date: datetime.date, trend
+):
+    if layout == "delta":
+        sdd = StoreDeltaDataFrame(
+            target_folder=target_folder, snapshot_date=snapshot_date
+        )
+        sdd.save(trend)
+    else:
+        sdf = StoreDataFrame(target_folder=target_folder, snapshot_date=snapshot_date)
+        sdf.save(trend, formats=[layout])
+
+
+def load_snapshot(layout: str, target_folder: Path, snapshot_date: str):
+    if layout == "delta":
+        return StoreDeltaDataFrame(target_folder=target_folder).load(snapshot_date)
+
+    data_path = (
+        target_folder
+        / f"format={layout}"
+        / f"snapshot_date={snapshot_date}"
+        / f"data.{layout}"
+    )
+    if layout == "csv":
+        return pd.read_csv(data_path)
+    else:
+        return pd.read_parquet(data_path)
+
+
+@click.command()
+@click.option("--n-keywords", type=int, default=20)
+@click.option("--n-snapshots", type=int, default=30)
+def main(n_keywords: int, n_snapshots: int):
+    logger.remove()
+    first_snapshot = datetime.date(2023, 7, 1)
+    target_folders = {
+        k: PathParams(keyword=k, cat="0", geo="DE", timeframe="today 5-y")
+        for k in keywords(n_keywords)
+    }
+    series = {
+        k: daily_snapshots(k, first_snapshot, n_snapshots, seed=i)
+        for i, k in enumerate(target_folders)
+    }
+
+    table = Table(title=f"{n_keywords} keywords x {n_snapshots} daily snapshots")
+    for c in ["layout", "size (MB)", "write (s)", "read latest (s)", "read all (s)"]:
+        table.add_column(c, justify="right")
+
+    for layout in LAYOUTS:
+        with tempfile.TemporaryDirectory() as tmp:
+            parent_folder = Path(tmp)
+
+            t0 = time.perf_counter()
+            for k, snapshots in series.items():
+                target_folder = target_folders[k].path(parent_folder=parent_folder)
+                for snapshot_date, df in snapshots.items():
+                    trend = SyntheticTrend(dataframe=df, metadata={"keyword": k})
+                    save_snapshot(layout, target_folder, snapshot_date, trend)
+            t_write = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            for k in series:
+                target_folder = target_folders[k].path(parent_folder=parent_folder)
+                latest = list_snapshot_dates(target_folder / f"format={layout}")[-1]
+                load_snapshot(layout, target_folder, latest)
+            t_read_latest = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            for k, snapshots in series.items():
+                target_folder = target_folders[k].path(parent_folder=parent_folder)
+                for snapshot_date in snapshots:
+                    load_snapshot(layout, target_folder, snapshot_date.isoformat())
+            t_read_all = time.perf_counter() - t0
+
+            table.add_row(
+                layout,
+                f"{folder_size(parent_folder) / 1e6:.2f}",
+                f"{t_write:.2f}",
+                f"{t_read_latest:.2f}",
+                f"{t_read_all:.2f}",
+            )
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""End-to-end throughput, latency percentiles and peak RSS of
+`download-serpapi`, `agg` and `agg-metadata`, offline
+
+For each of `--sizes`, a serpapi config of synthetic keywords is
+written, and the commands run as subprocesses against a local fake
+SerpAPI, see `fake_serpapi.py`, which answers after `--latency`
+seconds and throttles a fraction `--throttle-rate` of the searches.
+The downloads and aggregations are stored in a local folder, while
+`agg-metadata`, which requires S3, writes to the in-memory S3 of the
+fake server.
+
+The latency percentiles are taken from the run reports of the
+commands, i.e., the `fetch`, `read`, `serialise` and `upload` stages,
+and the peak RSS from the resource usage of each subprocess. The
+results are saved as json, `benchmarks/results/<commit>.json` by
+default, to be compared across commits.
+
+```sh
+poetry run python benchmarks/bench_e2e.py run --sizes 1000,10000,50000 --latency 0.02 --throttle-rate 0.02
+poetry run python benchmarks/bench_e2e.py compare benchmarks/results/e35520b.json benchmarks/results/312906f.json
+```
+"""
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import click
+from fake_serpapi import FakeSerpAPI
+from rich.console import Console
+from rich.table import Table
+from synthetic import keywords
+
+REPO = Path(__file__).resolve().parent.parent
+FIXTURE = REPO / "tests" / "data" / "use_serpapi" / "serpapi_coffee_results.json"
+BUCKET = "trendy-bench"
+
+# run the cli with the SerpAPI backend given as first argument
+BOOTSTRAP = (
+    "import sys; from serpapi.serp_api_client import SerpApiClient; "
+    "SerpApiClient.BACKEND = sys.argv.pop(1); "
+    "from sm_trendy.cli import trendy; trendy(prog_name='trendy')"
+)
+STAGES = {
+    "download-serpapi": ["fetch/serpapi", "parse/serpapi", "upload/csv", "upload/json"],
+    "agg": [
+        "read/csv",
+        "parse/csv",
+        "serialise/json",
+        "serialise/json-batched",
+        "upload/json",
+    ],
+    "agg-metadata": [],
+}
+
+
+def write_configs(work_dir: Path, n_keywords: int) -> Dict[str, Path]:
+    """serpapi config of synthetic keywords, and the aggregation
+    configs of `agg` and `agg-metadata`
+    """
+    geos = ["DE", "US", "GB", "FR", "ES"]
+    serpapi_config = {
+        "global": {
+            "serpapi": {"date": "today 5-y", "cat": "0", "tz": "120"},
+            "path": {"parent_folder": str(work_dir / "download")},
+        },
+        "keywords": [
+            {
+                "serpapi": {
+                    "timeframe": "today 5-y",
+                    "cat": "0",
+                    "geo": geos[i % len(geos)],
+                    "q": keyword,
+                }
+            }
+            for i, keyword in enumerate(keywords(n_keywords))
+        ],
+    }
+    paths = {
+        "serpapi": work_dir / "serpapi_config.json",
+        "agg": work_dir / "aggregate_config.json",
+        "agg-metadata": work_dir / "metadata_config.json",
+    }
+    with open(paths["serpapi"], "w") as fp:
+        json.dump(serpapi_config, fp)
+    for name, parent_folder in [
+        ("agg", str(work_dir / "agg")),
+        ("agg-metadata", f"s3://{BUCKET}/agg"),
+    ]:
+        with open(paths[name], "w") as fp:
+            json.dump(
+                {
+                    "global": {"path": {"parent_folder": parent_folder}},
+                    "keywords": [{"config": str(paths["serpapi"])}],
+                },
+                fp,
+            )
+
+    return paths
+
+
+def run_command(args: List[str], backend: str, env: Dict, log_path: Path) -> Dict:
+    """run a trendy command in a subprocess
+
+    :return: wall time, peak RSS and exit code
+    """
+    with open(log_path, "w") as log:
+        t0 = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-c", BOOTSTRAP, backend] + args,
+            env=env,
+            cwd=log_path.parent,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        _, status, rusage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - t0
+
+    return {
+        "seconds": round(seconds, 3),
+        # kilobytes on linux
+        "peak_rss_mb": round(rusage.ru_maxrss / 1024, 1),
+        "exit_code": os.waitstatus_to_exitcode(status),
+    }
+
+
+def stage_percentiles(parent_folder: Path, command: str) -> Dict[str, Dict]:
+    """percentiles of the stages in the latest run report of a command"""
+    reports = sorted(
+        (parent_folder / "_runs" / f"command={command}").glob("run=*/report.json")
+    )
+    if not reports:
+        return {}
+    with open(reports[-1], "r") as fp:
+        report = json.load(fp)
+
+    return {
+        f"{s['stage']}/{s['kind']}": {
+            k: s[k]
+            for k in [
+                "count",
+                "errors",
+                "mean_seconds",
+                "p50_seconds",
+                "p95_seconds",
+                "p99_seconds",
+            ]
+        }
+        for s in report["stages"]
+    }
+
+
+def commit() -> str:
+    try:
+        sha = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO, text=True
+        ).strip()
+        dirty = subprocess.check_output(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=REPO,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+    return f"{sha}-dirty" if dirty else sha
+
+
+def _ms(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.1f}"
+
+
+@click.group()
+def main():
+    pass
+
+
+@main.command()
+@click.option("--sizes", type=str, default="1000", help="e.g., 1000,10000,50000")
+@click.option("--latency", type=float, default=0.02, help="Seconds of a search")
+@click.option("--throttle-rate", type=float, default=0.0, help="Fraction of 429")
+@click.option("--s3-latency", type=float, default=0.0, help="Seconds of an S3 call")
+@click.option("--wait-min", type=float, default=0.001)
+@click.option("--wait-max", type=float, default=0.01)
+@click.option("--batched/--no-batched", default=False, help="agg --batched")
+@click.option("--output", type=click.Path(path_type=Path), default=None)
+@click.option("--work-dir", type=click.Path(path_type=Path), default=None)
+def run(
+    sizes: str,
+    latency: float,
+    throttle_rate: float,
+    s3_latency: float,
+    wait_min: float,
+    wait_max: float,
+    batched: bool,
+    output: Optional[Path],
+    work_dir: Optional[Path],
+):
+    sha = commit()
+    if output is None:
+        output = REPO / "benchmarks" / "results" / f"{sha}.json"
+    keep = work_dir is not None
+    work_dir = Path(tempfile.mkdtemp(prefix="trendy-bench-", dir=work_dir))
+
+    table = Table(
+        title=f"{sha}: latency {latency} s, throttle rate {throttle_rate}",
+    )
+    for c in [
+        "n",
+        "command",
+        "s",
+        "n / s",
+        "RSS MB",
+        "stage",
+        "p50 ms",
+        "p95 ms",
+        "p99 ms",
+    ]:
+        table.add_column(c, justify="right")
+
+    results = []
+    with FakeSerpAPI(
+        FIXTURE,
+        latency=latency,
+        throttle_rate=throttle_rate,
+        s3_latency=s3_latency,
+    ) as server:
+        env = {
+            **os.environ,
+            "SERPAPI_KEY": "bench",
+            "AWS_ENDPOINT_URL_S3": server.url,
+            "AWS_ACCESS_KEY_ID": "bench",
+            "AWS_SECRET_ACCESS_KEY": "bench",
+            "AWS_DEFAULT_REGION": "eu-central-1",
+        }
+        for n_keywords in [int(s) for s in sizes.split(",")]:
+            size_dir = work_dir / f"n={n_keywords}"
+            size_dir.mkdir()
+            configs = write_configs(size_dir, n_keywords)
+            commands = {
+                "download-serpapi": [
+                    "download-serpapi",
+                    str(configs["serpapi"]),
+                    str(wait_min),
+                    str(wait_max),
+                    "--max-interval",
+                    "1",
+                    "--cooldown",
+                    "1",
+                    "--max-attempts",
+                    "5",
+                    "--retry-backoff",
+                    "0.1",
+                    "--dead-letter",
+                    str(size_dir / "dead_letter.jsonl"),
+                ],
+                "agg": ["agg", str(configs["agg"])]
+                + (["--batched"] if batched else []),
+                "agg-metadata": ["agg-metadata", str(configs["agg-metadata"])],
+            }
+            parent_folders = {
+                "download-serpapi": size_dir / "download",
+                "agg": size_dir / "agg",
+            }
+
+            for command, args in commands.items():
+                searches, throttled = server.searches, server.throttled
+                result = {
+                    "n_keywords": n_keywords,
+                    "command": command,
+                    **run_command(
+                        args,
+                        backend=server.url,
+                        env=env,
+                        log_path=size_dir / f"{command}.log",
+                    ),
+                }
+                result["keywords_per_second"] = round(n_keywords / result["seconds"], 1)
+                result["searches"] = server.searches - searches
+                result["throttled"] = server.throttled - throttled
+                result["stages"] = (
+                    stage_percentiles(parent_folders[command], command)
+                    if command in parent_folders
+                    else {}
+                )
+                if result["exit_code"] != 0:
+                    Console().print(
+                        f"[red]{command} failed, see {size_dir / f'{command}.log'}"
+                    )
+                    keep = True
+                results.append(result)
+
+                rows = [s for s in STAGES[command] if s in result["stages"]] or [""]
+                for i, stage in enumerate(rows):
+                    s = result["stages"].get(stage, {})
+                    table.add_row(
+                        *(
+                            [
+                                str(n_keywords),
+                                command,
+                                f"{result['seconds']:.1f}",
+                                f"{result['keywords_per_second']:.0f}",
+                                f"{result['peak_rss_mb']:.0f}",
+                            ]
+                            if i == 0
+                            else [""] * 5
+                        ),
+                        stage,
+                        _ms(s.get("p50_seconds")),
+                        _ms(s.get("p95_seconds")),
+                        _ms(s.get("p99_seconds")),
+                    )
+
+    Console().print(table)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as fp:
+        json.dump(
+            {
+                "commit": sha,
+                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "params": {
+                    "latency": latency,
+                    "throttle_rate": throttle_rate,
+                    "s3_latency": s3_latency,
+                    "wait_min": wait_min,
+                    "wait_max": wait_max,
+                    "batched": batched,
+                },
+                "results": results,
+            },
+            fp,
+            indent=2,
+        )
+    Console().print(f"Results written to {output}")
+
+    if keep:
+        Console().print(f"Work folder kept in {work_dir}")
+    else:
+        shutil.rmtree(work_dir)
+
+
+@main.command()
+@click.argument("baseline", type=click.Path(exists=True, path_type=Path))
+@click.argument("candidate", type=click.Path(exists=True, path_type=Path))
+def compare(baseline: Path, candidate: Path):
+    """compare the results of two commits"""
+    runs = []
+    for path in [baseline, candidate]:
+        with open(path, "r") as fp:
+            runs.append(json.load(fp))
+
+    table = Table(title=f"{runs[0]['commit']} -> {runs[1]['commit']}")
+    for c in ["keywords", "command", "metric", "baseline", "candidate", "change"]:
+        table.add_column(c, justify="right")
+
+    candidates = {(r["n_keywords"], r["command"]): r for r in runs[1]["results"]}
+    for b in runs[0]["results"]:
+        c = candidates.get((b["n_keywords"], b["command"]))
+        if c is None:
+            continue
+        for metric in ["keywords_per_second", "peak_rss_mb"]:
+            change = (c[metric] - b[metric]) / b[metric] if b[metric] else 0
+            table.add_row(
+                str(b["n_keywords"]),
+                b["command"],
+                metric,
+                f"{b[metric]:.1f}",
+                f"{c[metric]:.1f}",
+                f"{change:+.1%}",
+            )
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
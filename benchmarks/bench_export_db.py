@@ -0,0 +1,157 @@
+"""Time of `trendy export-db` on a synthetic downloaded folder
+
+A folder with `--n-snapshots` daily csv snapshots of `--n-keywords`
+keywords is created. The naive path reads each snapshot one after the
+other and appends it to SQLite with `DataFrame.to_sql`, rebuilding the
+file on each run. `ExportDatabase` is timed for the first export, for a
+re-run without new snapshots, and for a re-run after one more day of
+snapshots, which only loads the new day.
+
+```sh
+poetry run python benchmarks/bench_export_db.py --n-keywords 200 --n-snapshots 10
+```
+"""
+import datetime
+import json
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import click
+import pandas as pd
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+from synthetic import SyntheticTrend, daily_snapshots, keywords
+
+from sm_trendy.aggregate.agg import DownloadedLoader
+from sm_trendy.aggregate.database import ExportDatabase
+from sm_trendy.utilities.config import PathParams
+from sm_trendy.utilities.storage import StoreDataFrame, list_snapshot_dates
+
+
+def build_folder(
+    parent_folder: Path, n_keywords: int, n_snapshots: int
+) -> tuple[Path, list[PathParams]]:
+    """downloaded csv snapshots and the serpapi config of the keywords"""
+    first_snapshot = datetime.date(2023, 7, 1)
+    path_params = []
+    for i, keyword in enumerate(keywords(n_keywords)):
+        p = PathParams(keyword=keyword, cat="0", geo="DE", timeframe="today 5-y")
+        path_params.append(p)
+        for snapshot_date, df in daily_snapshots(
+            keyword=keyword,
+            first_snapshot=first_snapshot,
+            n_snapshots=n_snapshots,
+            seed=i,
+        ).items():
+            StoreDataFrame(
+                target_folder=p.path(parent_folder=parent_folder),
+                snapshot_date=snapshot_date,
+            ).save(SyntheticTrend(df, metadata={}), formats=["csv"])
+
+    config_path = parent_folder / "serpapi_config.json"
+    with open(config_path, "w") as fp:
+        json.dump(
+            {
+                "global": {
+                    "serpapi": {"date": "today 5-y", "cat": "0", "tz": "120"},
+                    "path": {"parent_folder": str(parent_folder)},
+                },
+                "keywords": [
+                    {
+                        "serpapi": {
+                            "timeframe": p.timeframe,
+                            "cat": p.cat,
+                            "geo": p.geo,
+                            "q": p.keyword,
+                        }
+                    }
+                    for p in path_params
+                ],
+            },
+            fp,
+        )
+
+    return config_path, path_params
+
+
+def naive(parent_folder: Path, path_params: list[PathParams], database_path: Path):
+    database_path.unlink(missing_ok=True)
+    con = sqlite3.connect(database_path)
+    dll = DownloadedLoader(parent_folder=parent_folder)
+    for p in path_params:
+        for snapshot_date in list_snapshot_dates(
+            p.path(parent_folder=parent_folder) / "format=csv"
+        ):
+            df = dll(p, snapshot_date=snapshot_date)
+            pd.DataFrame(
+                {
+                    "keyword": p.keyword,
+                    "cat": p.cat,
+                    "geo": p.geo,
+                    "timeframe": p.timeframe,
+                    "snapshot_date": snapshot_date,
+                    "date": df["date"],
+                    "value": df["extracted_value"],
+                }
+            ).to_sql("trends", con, if_exists="append", index=False)
+    con.close()
+
+
+def timed(func) -> float:
+    t0 = time.perf_counter()
+    func()
+    return time.perf_counter() - t0
+
+
+@click.command()
+@click.option("--n-keywords", type=int, default=200)
+@click.option("--n-snapshots", type=int, default=10)
+@click.option("--max-workers", type=int, default=8)
+def main(n_keywords: int, n_snapshots: int, max_workers: int):
+    logger.remove()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parent_folder = Path(tmp) / "downloaded"
+        config_path, path_params = build_folder(
+            parent_folder, n_keywords=n_keywords, n_snapshots=n_snapshots
+        )
+        database_path = Path(tmp) / "trends.db"
+        export_database = ExportDatabase(
+            database_path=database_path, snapshots="all", max_workers=max_workers
+        )
+
+        table = Table(
+            title=f"Export {n_keywords} keywords x {n_snapshots} snapshots to SQLite"
+        )
+        for c in ["path", "time (s)"]:
+            table.add_column(c, justify="right")
+
+        table.add_row(
+            "naive, full rebuild",
+            f"{timed(lambda: naive(parent_folder, path_params, Path(tmp) / 'naive.db')):.3f}",
+        )
+        table.add_row(
+            "export-db, first run",
+            f"{timed(lambda: export_database([config_path])):.3f}",
+        )
+        table.add_row(
+            "export-db, no new snapshots",
+            f"{timed(lambda: export_database([config_path])):.3f}",
+        )
+
+        build_folder(parent_folder, n_keywords=n_keywords, n_snapshots=n_snapshots + 1)
+        table.add_row(
+            "export-db, one new day",
+            f"{timed(lambda: export_database([config_path])):.3f}",
+        )
+
+        console = Console()
+        console.print(table)
+        console.print(f"database size: {database_path.stat().st_size / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Compare load time and memory of the csv, parquet and feather formats
+
+The downloaded test fixtures are replicated for many keywords,
+then every format is loaded with `DownloadedLoader` in a separate
+process to measure the peak RSS.
+
+```sh
+poetry run python benchmarks/bench_formats.py main --n-keywords 2000
+```
+"""
+import datetime
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import click
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+from synthetic import keywords
+
+from sm_trendy.aggregate.agg import DownloadedLoader
+from sm_trendy.utilities.config import PathParams
+from sm_trendy.utilities.storage import StoreDataFrame
+
+FORMATS = ["csv", "parquet", "feather"]
+FIXTURE_FOLDER = (
+    Path(__file__).parent.parent / "tests" / "data" / "aggregate" / "serpapi_downloaded"
+)
+
+
+def path_params(n_keywords: int):
+    return [
+        PathParams(keyword=k, cat="0", geo="DE", timeframe="today 5-y")
+        for k in keywords(n_keywords)
+    ]
+
+
+def prepare(parent_folder: Path, n_keywords: int):
+    """replicate the test fixtures for `n_keywords` keywords"""
+    fixtures = [
+        DownloadedLoader(parent_folder=FIXTURE_FOLDER)(
+            PathParams(keyword=k, cat="0", geo="DE", timeframe="today 5-y")
+        )
+        for k in ["curtain", "phone case"]
+    ]
+
+    for i, pp in enumerate(path_params(n_keywords)):
+        df = fixtures[i % len(fixtures)].assign(query=pp.keyword)
+        sdf = StoreDataFrame(
+            target_folder=pp.path(parent_folder=parent_folder),
+            snapshot_date=datetime.date(2023, 7, 31),
+        )
+        sdf.save(SimpleNamespace(dataframe=df, metadata={}), formats=FORMATS)
+
+
+@click.group()
+def cli():
+    logger.remove()
+
+
+@cli.command()
+@click.option("--n-keywords", type=int, default=2000)
+def main(n_keywords: int):
+    table = Table(title=f"Load {n_keywords} keywords")
+    for c in ["format", "load (s)", "peak RSS (MB)", "size (MB)"]:
+        table.add_column(c, justify="right")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prepare(Path(tmp), n_keywords)
+
+        runs = [(f, []) for f in FORMATS] + [("feather", ["--arrow"])]
+        for f, options in runs:
+            result = subprocess.run(
+                [sys.executable, __file__, "load", tmp, f, str(n_keywords)] + options,
+                capture_output=True,
+                check=True,
+                text=True,
+            )
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            size = sum(p.stat().st_size for p in Path(tmp).rglob(f"data.{f}"))
+            table.add_row(
+                f"{f} (arrow table)" if options else f,
+                f"{stats['seconds']:.2f}",
+                f"{stats['max_rss_kb'] / 1e3:.1f}",
+                f"{size / 1e6:.2f}",
+            )
+
+    Console().print(table)
+
+
+@cli.command()
+@click.argument("parent-folder", type=click.Path(exists=True))
+@click.argument("from-format", type=click.Choice(FORMATS))
+@click.argument("n-keywords", type=int)
+@click.option("--arrow", is_flag=True, help="load as arrow tables without pandas")
+def load(parent_folder: str, from_format: str, n_keywords: int, arrow: bool):
+    """load all keywords and keep them in memory"""
+    dll = DownloadedLoader(parent_folder=Path(parent_folder), from_format=from_format)
+    load_method = dll.load_table if arrow else dll
+
+    t0 = time.perf_counter()
+    dataframes = [load_method(pp) for pp in path_params(n_keywords)]
+    seconds = time.perf_counter() - t0
+
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(
+        json.dumps({"seconds": seconds, "max_rss_kb": max_rss_kb, "n": len(dataframes)})
+    )
+
+
+if __name__ == "__main__":
+    cli()
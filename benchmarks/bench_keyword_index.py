@@ -0,0 +1,72 @@
+"""Benchmark the sharded keyword index against the monolithic metadata.json
+
+For each keyword count, we measure the time to build and serialize the
+index, and the bytes a client downloads to look up a keyword.
+
+```sh
+poetry run python benchmarks/bench_keyword_index.py --n-keywords 1000 --n-keywords 10000
+```
+"""
+import json
+import time
+from typing import List
+
+import click
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+from synthetic import metadata_entries
+
+from sm_trendy.aggregate.index import KeywordIndex
+
+
+def size(content) -> int:
+    return len(json.dumps(content, separators=(",", ":")).encode("utf-8"))
+
+
+@click.command()
+@click.option("--n-keywords", type=int, multiple=True, default=[1000, 10000, 50000])
+@click.option("--n-queries", type=int, default=100)
+def main(n_keywords: List[int], n_queries: int):
+    table = Table(title="Keyword index")
+    for c in [
+        "keywords",
+        "build (s)",
+        "metadata.json (KB)",
+        "search.json (KB)",
+        "shards",
+        "lookup payload (KB)",
+    ]:
+        table.add_column(c, justify="right")
+
+    rng = np.random.default_rng(42)
+    for n in n_keywords:
+        entries = metadata_entries(n)
+
+        t0 = time.perf_counter()
+        ki = KeywordIndex(entries=entries)
+        shard_sizes = {k: size(v) for k, v in ki.shards.items()}
+        index_size = size(ki.manifest) + size(ki.search_index)
+        t_build = time.perf_counter() - t0
+
+        payloads = []
+        for i in rng.choice(len(entries), size=n_queries):
+            keyword, geo = entries[i]["keyword"], entries[i]["geo"]
+            # users type the first few characters of the keyword
+            shards = ki.lookup(keyword[:4], geo=geo)
+            payloads.append(index_size + sum(shard_sizes[s] for s in shards))
+
+        table.add_row(
+            str(n),
+            f"{t_build:.2f}",
+            f"{size(entries) / 1e3:.0f}",
+            f"{size(ki.search_index) / 1e3:.0f}",
+            str(len(shard_sizes)),
+            f"{np.median(payloads) / 1e3:.0f}",
+        )
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Time of `trendy create-manual-folders` before and after the
+concurrent scaffolding
+
+`--n-keywords` keyword folders are scaffolded in a temporary folder.
+`--upload-latency` seconds are added to each written `manual.json`, to
+mimic a `PUT` to S3. The legacy path writes the files one after the
+other, the new path writes them in `--max-workers` threads. The time
+of the zip bundle is reported separately.
+
+```sh
+poetry run python benchmarks/bench_manual_scaffold.py --n-keywords 2000 --upload-latency 0.02
+```
+"""
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+from synthetic import keywords
+
+import sm_trendy.manual.config as manual_config
+from sm_trendy.manual.config import SerpAPI2Manual
+from sm_trendy.use_serpapi.config import SerpAPIConfigBundle
+
+
+@click.command()
+@click.option("--n-keywords", type=int, default=2000)
+@click.option("--max-workers", type=int, default=16)
+@click.option("--upload-latency", type=float, default=0.02)
+def main(n_keywords: int, max_workers: int, upload_latency: float):
+    logger.remove()
+    write_object = manual_config.write_object
+
+    def slow_write_object(*args, **kwargs):
+        time.sleep(upload_latency)
+        return write_object(*args, **kwargs)
+
+    manual_config.write_object = slow_write_object
+
+    table = Table(title=f"{n_keywords} folders, {upload_latency} s per upload")
+    for c in ["path", "time (s)", "folders / s"]:
+        table.add_column(c, justify="right")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        config = {
+            "global": {"serpapi": {"date": "today 5-y", "cat": "0", "tz": "120"}},
+            "keywords": [
+                {"serpapi": {"geo": "DE", "q": k}} for k in keywords(n_keywords)
+            ],
+        }
+        (tmp / "config.json").write_text(json.dumps(config))
+        scb = SerpAPIConfigBundle(file_path=tmp / "config.json", serpapi_key="")
+
+        t0 = time.perf_counter()
+        for c in scb:
+            folder = c.path_params.path(parent_folder=tmp / "legacy")
+            folder.mkdir(parents=True, exist_ok=True)
+            time.sleep(upload_latency)
+            with open(folder / "manual.json", "w") as fp:
+                json.dump(c.path_params.model_dump(), fp)
+        seconds = time.perf_counter() - t0
+        table.add_row("sequential", f"{seconds:.2f}", f"{n_keywords / seconds:.0f}")
+
+        s2m = SerpAPI2Manual(manual_folder=tmp / "manual", max_workers=max_workers)
+        t0 = time.perf_counter()
+        s2m(scb)
+        seconds = time.perf_counter() - t0
+        table.add_row(
+            f"{max_workers} workers", f"{seconds:.2f}", f"{n_keywords / seconds:.0f}"
+        )
+
+        t0 = time.perf_counter()
+        body = SerpAPI2Manual.zip(SerpAPI2Manual.manual_configs(scb))
+        seconds = time.perf_counter() - t0
+        table.add_row(
+            f"zip bundle, {len(body) / 1024:.0f} KiB",
+            f"{seconds:.2f}",
+            f"{n_keywords / seconds:.0f}",
+        )
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Time of `trendy upload-manual` before and after the parallel ingestion
+
+A manual folder with `--n-keywords` exported `multiTimeline.csv` files
+is created. The legacy path reads `manual.json`, creates the source
+folder and parses the csv with pandas, one keyword after the other. The
+new path lists the ready folders once, and parses with pyarrow and
+saves in `--max-workers` threads. `--upload-latency` seconds are added
+to each save, to mimic the uploads to S3.
+
+```sh
+poetry run python benchmarks/bench_manual_upload.py --n-keywords 200 --upload-latency 0.05
+```
+"""
+import datetime
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import click
+import pandas as pd
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+from synthetic import keywords, weekly_series
+
+from sm_trendy.manual.config import SerpAPI2Manual
+from sm_trendy.manual.get_trends import ManualDownload
+from sm_trendy.use_serpapi.config import SerpAPIConfigBundle
+from sm_trendy.utilities.retry import RetryQueue
+from sm_trendy.utilities.schema import enforce_trend_schema
+from sm_trendy.utilities.storage import StoreDataFrame
+
+
+class LegacyManualTrend:
+    def __init__(self, path_params, manual_folder):
+        self.path_params = path_params
+        self.manual_folder = manual_folder
+
+    @property
+    def dataframe(self) -> pd.DataFrame:
+        temp_path = self.path_params.path(parent_folder=self.manual_folder)
+        temp_path.mkdir(parents=True, exist_ok=True)
+        with open(temp_path / "manual.json", "r") as fp:
+            manual_config = json.load(fp)
+        df = pd.read_csv(temp_path / "multiTimeline.csv", skiprows=2)
+        value_column = [c for c in df.columns if c != "Week"][0]
+        df.rename(
+            columns={"Week": "date", value_column: "extracted_value"}, inplace=True
+        )
+        for k, c in [("keyword", "query"), ("geo", "geo")]:
+            df[c] = manual_config[k]
+        df["timeframe"] = manual_config["timeframe"]
+        df["cat"] = manual_config["cat"]
+        return enforce_trend_schema(df)
+
+    @property
+    def metadata(self):
+        return {"path": self.path_params.model_dump()}
+
+
+def build_manual_folder(tmp: Path, n_keywords: int) -> SerpAPIConfigBundle:
+    config = {
+        "global": {
+            "serpapi": {"date": "today 5-y", "cat": "0", "tz": "120"},
+            "path": {"parent_folder": str(tmp / "data")},
+        },
+        "keywords": [{"serpapi": {"geo": "DE", "q": k}} for k in keywords(n_keywords)],
+    }
+    config_path = tmp / "config.json"
+    config_path.write_text(json.dumps(config))
+    scb = SerpAPIConfigBundle(file_path=config_path, serpapi_key="")
+
+    SerpAPI2Manual(manual_folder=tmp / "manual")(config_bundle=scb)
+    for i, c in enumerate(scb):
+        df = weekly_series(c.path_params.keyword, datetime.date(2018, 7, 29), seed=i)
+        lines = [
+            "Category: All categories",
+            "",
+            f"Week,{c.serpapi_params.q}: (Germany)",
+        ]
+        lines += [
+            f"{d:%Y-%m-%d},{v}" for d, v in zip(df["date"], df["extracted_value"])
+        ]
+        folder = c.path_params.path(parent_folder=tmp / "manual")
+        (folder / "multiTimeline.csv").write_text("\n".join(lines) + "\n")
+
+    return scb
+
+
+@click.command()
+@click.option("--n-keywords", type=int, default=200)
+@click.option("--max-workers", type=int, default=8)
+@click.option("--upload-latency", type=float, default=0.05)
+def main(n_keywords: int, max_workers: int, upload_latency: float):
+    logger.remove()
+    save = StoreDataFrame.save
+
+    def slow_save(self, trend_data, formats):
+        df = trend_data.dataframe
+        time.sleep(upload_latency * len(formats))
+        save(
+            self,
+            type("Trend", (), {"dataframe": df, "metadata": trend_data.metadata}),
+            formats,
+        )
+
+    StoreDataFrame.save = slow_save
+
+    table = Table(title=f"{n_keywords} keywords, {upload_latency} s per uploaded file")
+    for c in ["path", "time (s)", "keywords / s"]:
+        table.add_column(c, justify="right")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        scb = build_manual_folder(tmp, n_keywords)
+        today = datetime.date(2023, 7, 31)
+
+        t0 = time.perf_counter()
+        for c in scb:
+            StoreDataFrame(
+                target_folder=c.path_params.path(parent_folder=tmp / "legacy"),
+                snapshot_date=today,
+                deduplicate=True,
+            ).save(
+                LegacyManualTrend(c.path_params, tmp / "manual"),
+                formats=["csv", "parquet"],
+            )
+        seconds = time.perf_counter() - t0
+        table.add_row(
+            "sequential, pandas", f"{seconds:.2f}", f"{n_keywords / seconds:.1f}"
+        )
+
+        for workers in [1, max_workers]:
+            t0 = time.perf_counter()
+            mdl = ManualDownload(
+                parent_folder=tmp / f"data-{workers}",
+                snapshot_date=today,
+                manual_folder=tmp / "manual",
+            )
+            summary = RetryQueue(mdl, max_workers=workers)(scb)
+            seconds = time.perf_counter() - t0
+            assert summary["succeeded"] == n_keywords
+            table.add_row(
+                f"{workers} workers, pyarrow",
+                f"{seconds:.2f}",
+                f"{n_keywords / seconds:.1f}",
+            )
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Throughput of `PooledDownload` with the number of proxies
+
+The requests are simulated: each proxy answers after `--latency`
+seconds, and the dead proxies raise a proxy error. Each proxy allows
+one request every `--min-interval` seconds. The sequential path sends
+all requests through the first proxy with the same interval, as
+`download-pytrends` did with its single proxy. Nothing is written,
+`Download` is replaced by the simulated request.
+
+```sh
+poetry run python benchmarks/bench_proxy_pool.py --n-keywords 200 --n-proxies 1 --n-proxies 4 --n-proxies 16
+```
+"""
+import time
+from typing import List
+
+import click
+import requests
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+
+from sm_trendy.use_pytrends import get_trends
+from sm_trendy.use_pytrends.get_trends import PooledDownload
+from sm_trendy.use_pytrends.proxy import ProxyPool
+
+
+class SimulatedDownload:
+    latency = 0.05
+
+    def __init__(self, trends_service, **kwargs):
+        self.proxy = trends_service
+
+    def __call__(self, config):
+        time.sleep(self.latency)
+        if self.proxy.startswith("dead"):
+            raise requests.exceptions.ProxyError(self.proxy)
+
+
+class SimulatedConfig:
+    class trend_params:
+        keyword = "keyword"
+
+
+@click.command()
+@click.option("--n-keywords", type=int, default=200)
+@click.option("--n-proxies", type=int, multiple=True, default=[1, 4, 16])
+@click.option("--dead-fraction", type=float, default=0.25)
+@click.option("--latency", type=float, default=0.05)
+@click.option("--min-interval", type=float, default=0.2)
+def main(
+    n_keywords: int,
+    n_proxies: List[int],
+    dead_fraction: float,
+    latency: float,
+    min_interval: float,
+):
+    logger.remove()
+    SimulatedDownload.latency = latency
+    get_trends.Download = SimulatedDownload
+
+    table = Table(title=f"{n_keywords} keywords, {min_interval} s between requests")
+    for c in ["proxies", "dead", "path", "time (s)", "keywords / s"]:
+        table.add_column(c, justify="right")
+
+    t0 = time.perf_counter()
+    for _ in range(n_keywords):
+        time.sleep(latency + min_interval)
+    seconds = time.perf_counter() - t0
+    table.add_row(
+        "1", "0", "sequential", f"{seconds:.2f}", f"{n_keywords / seconds:.1f}"
+    )
+
+    for n in n_proxies:
+        n_dead = int(n * dead_fraction)
+        proxies = [f"dead-{i}" for i in range(n_dead)] + [
+            f"live-{i}" for i in range(n - n_dead)
+        ]
+        pdl = PooledDownload(
+            parent_folder=None,
+            snapshot_date=None,
+            proxy_pool=ProxyPool(
+                proxies, min_interval=min_interval, max_consecutive_failures=2
+            ),
+            trends_service_factory=lambda proxy: proxy,
+        )
+        t0 = time.perf_counter()
+        summary = pdl([SimulatedConfig()] * n_keywords)
+        seconds = time.perf_counter() - t0
+        table.add_row(
+            str(n),
+            str(n_dead),
+            f"pooled, {summary['failed']} failed",
+            f"{seconds:.2f}",
+            f"{n_keywords / seconds:.1f}",
+        )
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
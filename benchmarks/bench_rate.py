@@ -0,0 +1,114 @@
+"""Throughput and throttled requests of the fixed random wait of
+`download-serpapi` and of the `AdaptiveRateController`
+
+The upstream is simulated: it answers after `--latency` seconds, and
+throttles the requests above `--limit` requests per second, counted
+over a sliding window of one second. The fixed wait sleeps a random
+number of seconds between `--min-interval` and `--max-interval`, as
+`download-serpapi` did, and retries a throttled request after the
+same wait. The adaptive controller starts at `--max-interval`.
+
+```sh
+poetry run python benchmarks/bench_rate.py --n-requests 200 --limit 5
+```
+"""
+import random
+import time
+from collections import deque
+
+import click
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+
+from sm_trendy.utilities.rate import AdaptiveRateController, ThrottledError
+
+
+class Throttled(ThrottledError):
+    def __str__(self):
+        return "Request failed with error 429"
+
+
+class SimulatedUpstream:
+    def __init__(self, limit: float, latency: float):
+        self.limit = limit
+        self.latency = latency
+        self.window = deque()
+        self.throttled = 0
+
+    def __call__(self):
+        now = time.monotonic()
+        while self.window and self.window[0] <= now - 1:
+            self.window.popleft()
+        time.sleep(self.latency)
+        if len(self.window) >= self.limit:
+            self.throttled += 1
+            raise Throttled()
+        self.window.append(now)
+
+
+@click.command()
+@click.option("--n-requests", type=int, default=200)
+@click.option("--limit", type=float, default=5)
+@click.option("--latency", type=float, default=0.01)
+@click.option("--min-interval", type=float, default=0.01)
+@click.option("--max-interval", type=float, default=0.5)
+def main(
+    n_requests: int,
+    limit: float,
+    latency: float,
+    min_interval: float,
+    max_interval: float,
+):
+    logger.remove()
+    table = Table(title=f"{n_requests} requests, upstream limit {limit} requests / s")
+    for c in ["path", "time (s)", "requests / s", "throttled"]:
+        table.add_column(c, justify="right")
+
+    upstream = SimulatedUpstream(limit=limit, latency=latency)
+    t0 = time.perf_counter()
+    done = 0
+    while done < n_requests:
+        time.sleep(random.uniform(min_interval, max_interval))
+        try:
+            upstream()
+            done += 1
+        except Throttled:
+            pass
+    seconds = time.perf_counter() - t0
+    table.add_row(
+        "fixed random wait",
+        f"{seconds:.2f}",
+        f"{n_requests / seconds:.1f}",
+        str(upstream.throttled),
+    )
+
+    upstream = SimulatedUpstream(limit=limit, latency=latency)
+    rate_controller = AdaptiveRateController(
+        interval=max_interval,
+        min_interval=min_interval,
+        max_interval=max_interval * 10,
+        cooldown=max_interval * 10,
+    )
+    t0 = time.perf_counter()
+    done = 0
+    while done < n_requests:
+        try:
+            with rate_controller.request():
+                upstream()
+            done += 1
+        except Throttled:
+            pass
+    seconds = time.perf_counter() - t0
+    table.add_row(
+        "adaptive",
+        f"{seconds:.2f}",
+        f"{n_requests / seconds:.1f}",
+        str(upstream.throttled),
+    )
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Measure the in-memory and on-disk sizes of trend dataframes
+before and after enforcing the compact trend schema
+
+```sh
+poetry run python benchmarks/bench_schema.py --n-keywords 5000
+```
+"""
+import datetime
+import io
+import tempfile
+from pathlib import Path
+
+import click
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+from synthetic import keywords, weekly_series
+
+from sm_trendy.utilities.schema import enforce_trend_schema
+
+
+def disk_size(dataframe: pd.DataFrame, format: str) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f"data.{format}"
+        if format == "csv":
+            dataframe.to_csv(path, index=False)
+        else:
+            dataframe.to_parquet(path)
+        return path.stat().st_size
+
+
+@click.command()
+@click.option("--n-keywords", type=int, default=5000)
+def main(n_keywords: int):
+    start = datetime.date(2018, 7, 29)
+    frames = []
+    for i, k in enumerate(keywords(n_keywords)):
+        df = weekly_series(keyword=k, start=start, seed=i)
+        df["geo"], df["timeframe"], df["cat"] = "DE", "today 5-y", "0"
+        frames.append(df)
+
+    # frames as they are loaded from the csv files without a schema
+    raw = pd.read_csv(io.StringIO(pd.concat(frames).to_csv(index=False)))
+    compact = enforce_trend_schema(raw)
+
+    table = Table(title=f"Aggregation of {n_keywords} keywords ({len(raw)} rows)")
+    for c in ["", "memory (MB)", "csv (MB)", "parquet (MB)"]:
+        table.add_column(c, justify="right")
+
+    for name, df in [("before", raw), ("after", compact)]:
+        table.add_row(
+            name,
+            f"{df.memory_usage(deep=True).sum() / 1e6:.2f}",
+            f"{disk_size(df, 'csv') / 1e6:.2f}",
+            f"{disk_size(df, 'parquet') / 1e6:.2f}",
+        )
+
+    console = Console()
+    console.print(table)
+    console.print(pd.DataFrame({"before": raw.dtypes, "after": compact.dtypes}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Load test of `trendy serve` against a filesystem-backed data folder
+
+A folder with the aggregated json of `--n-keywords` synthetic keywords
+and their `metadata.json` is created, and the app is started with
+uvicorn in a background thread. Concurrent clients then request
+series, with a skewed popularity of the keywords, and searches.
+Use `--url` to load test a server that is already running on the
+data of `--parent-folder` instead.
+
+```sh
+poetry run python benchmarks/bench_serve.py --n-keywords 2000 --n-requests 5000
+```
+
+Requires `uvicorn`.
+"""
+import datetime
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import click
+import numpy as np
+import requests
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+from synthetic import metadata_entries, weekly_series
+
+from sm_trendy.aggregate.agg import AggAPIJSON
+from sm_trendy.utilities.config import PathParams
+from sm_trendy.utilities.storage import StoreJSON
+
+
+def build_folder(parent_folder: Path, n_keywords: int) -> List[Dict]:
+    """aggregated json and metadata of synthetic keywords"""
+    entries = metadata_entries(n_keywords)
+    apj = AggAPIJSON()
+    for i, e in enumerate(entries):
+        path_params = PathParams(
+            keyword=e["keyword"], cat=e["cat"], geo=e["geo"], timeframe=e["timeframe"]
+        )
+        StoreJSON(
+            target_folder=path_params.path(parent_folder=parent_folder),
+            snapshot_date="latest",
+        ).save(
+            records=apj.to_json_bytes(
+                weekly_series(
+                    keyword=e["keyword"], start=datetime.date(2018, 7, 29), seed=i
+                ),
+                sort_by="date",
+            ),
+            formats=["json"],
+        )
+
+    with open(parent_folder / "metadata.json", "w") as fp:
+        json.dump(entries, fp)
+
+    return entries
+
+
+def start_server(parent_folder: Path, port: int, cache_size: int) -> str:
+    import uvicorn
+
+    from sm_trendy.serve.app import create_app
+
+    config = uvicorn.Config(
+        create_app(parent_folder=parent_folder, cache_size=cache_size),
+        host="127.0.0.1",
+        port=port,
+        log_level="warning",
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    return f"http://127.0.0.1:{port}"
+
+
+@click.command()
+@click.option("--n-keywords", type=int, default=2000)
+@click.option("--n-requests", type=int, default=5000)
+@click.option("--concurrency", type=int, default=16)
+@click.option("--cache-size", type=int, default=1024)
+@click.option("--port", type=int, default=8765)
+@click.option("--url", type=str, default=None, help="Server that is already running")
+@click.option(
+    "--parent-folder",
+    type=click.Path(path_type=Path),
+    default=None,
+    help="Data folder to build, or of the running server",
+)
+def main(
+    n_keywords: int,
+    n_requests: int,
+    concurrency: int,
+    cache_size: int,
+    port: int,
+    url: Optional[str],
+    parent_folder: Optional[Path],
+):
+    logger.remove()
+
+    tmp = tempfile.TemporaryDirectory()
+    if parent_folder is None:
+        parent_folder = Path(tmp.name)
+    if url is None:
+        entries = build_folder(parent_folder, n_keywords=n_keywords)
+        url = start_server(parent_folder, port=port, cache_size=cache_size)
+    else:
+        with open(parent_folder / "metadata.json", "r") as fp:
+            entries = json.load(fp)
+
+    # a few keywords are much more popular than the others
+    rng = np.random.default_rng(42)
+    popularity = 1 / np.arange(1, len(entries) + 1)
+    picks = rng.choice(len(entries), size=n_requests, p=popularity / popularity.sum())
+
+    local = threading.local()
+
+    def request(i: int):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        e = entries[picks[i]]
+        if i % 10 == 0:
+            endpoint, params = "/search", {"q": e["keyword"][:4], "geo": e["geo"]}
+        else:
+            endpoint = "/series"
+            params = {
+                "keyword": e["keyword"],
+                "geo": e["geo"],
+                "timeframe": e["timeframe"],
+            }
+
+        t0 = time.perf_counter()
+        response = local.session.get(f"{url}{endpoint}", params=params)
+        return endpoint, response.status_code, time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(request, range(n_requests)))
+    seconds = time.perf_counter() - t0
+
+    table = Table(title=f"{n_requests} requests, {concurrency} clients, {url}")
+    for c in ["endpoint", "requests", "errors", "p50 (ms)", "p99 (ms)"]:
+        table.add_column(c, justify="right")
+    for endpoint in ["/series", "/search"]:
+        latencies = np.array([r[2] for r in results if r[0] == endpoint]) * 1e3
+        errors = sum(1 for r in results if r[0] == endpoint and r[1] != 200)
+        table.add_row(
+            endpoint,
+            str(len(latencies)),
+            str(errors),
+            f"{np.percentile(latencies, 50):.1f}",
+            f"{np.percentile(latencies, 99):.1f}",
+        )
+
+    console = Console()
+    console.print(table)
+    console.print(f"requests/second: {n_requests / seconds:.0f}")
+    console.print(f"server: {requests.get(f'{url}/health').json()}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Time of the similar keywords index, compared to pairwise correlations
+
+The pairwise path computes `np.corrcoef` for each pair of series in
+python, and is extrapolated from the first `--n-pairs` pairs.
+The incremental path recomputes the neighbours of 1% of the series.
+
+```sh
+poetry run python benchmarks/bench_similar.py --n-keywords 1000 --n-keywords 10000
+```
+"""
+import datetime
+import itertools
+import time
+from typing import List
+
+import click
+import numpy as np
+import pandas as pd
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+from synthetic import weekly_series
+
+from sm_trendy.aggregate.similar import SimilarSeries
+from sm_trendy.aggregate.stats import SeriesMatrix
+
+
+def timed(func):
+    t0 = time.perf_counter()
+    result = func()
+    return time.perf_counter() - t0, result
+
+
+@click.command()
+@click.option("--n-keywords", type=int, multiple=True, default=[1000])
+@click.option("--n-pairs", type=int, default=20000)
+@click.option("--k", type=int, default=10)
+def main(n_keywords: List[int], n_pairs: int, k: int):
+    logger.remove()
+
+    table = Table(title="Top-k correlated neighbours of 5-year weekly series")
+    for c in ["keywords", "path", "time (s)"]:
+        table.add_column(c, justify="right")
+
+    for n in n_keywords:
+        series = pd.concat(
+            [
+                weekly_series(
+                    keyword=f"coffee {i}", start=datetime.date(2018, 7, 29), seed=i
+                )[["date", "extracted_value"]].assign(series_id=f"s{i:06d}")
+                for i in range(n)
+            ],
+            ignore_index=True,
+        )
+        matrix = SeriesMatrix(series)
+        values = matrix.values
+
+        pairs = list(itertools.islice(itertools.combinations(range(n), 2), n_pairs))
+        seconds, _ = timed(
+            lambda: [np.corrcoef(values[i], values[j])[0, 1] for i, j in pairs]
+        )
+        table.add_row(
+            str(n),
+            "pairwise (extrapolated)",
+            f"{seconds / len(pairs) * n * (n - 1) / 2:.1f}",
+        )
+
+        ss = SimilarSeries(k=k)
+        seconds, previous = timed(lambda: ss(matrix))
+        table.add_row(str(n), "blocked", f"{seconds:.2f}")
+
+        changed = matrix.ids[::100].tolist()
+        seconds, _ = timed(lambda: ss(matrix, changed=changed, previous=previous))
+        table.add_row(str(n), "blocked, 1% changed", f"{seconds:.2f}")
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Time of `TrendStore.get_many` compared to the notebook recipe
+
+A folder with `--n-snapshots` daily csv snapshots of `--n-keywords`
+keywords is created. The notebook recipe builds the `PathParams`,
+lists the snapshots to find the latest one, and reads the csv of
+each keyword one after the other. `TrendStore` is timed cold, including
+the listing of the catalog, and warm, served from the cache.
+
+```sh
+poetry run python benchmarks/bench_store.py --n-keywords 200 --n-snapshots 5
+```
+"""
+import tempfile
+import time
+from pathlib import Path
+
+import click
+import pandas as pd
+from bench_export_db import build_folder
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+
+from sm_trendy.aggregate.agg import DownloadedLoader
+from sm_trendy.aggregate.store import TrendStore
+from sm_trendy.utilities.config import PathParams
+
+
+def notebook(parent_folder: Path, keywords: list[str]) -> pd.DataFrame:
+    dll = DownloadedLoader(parent_folder=parent_folder)
+    return pd.concat(
+        {
+            k: dll(
+                PathParams(keyword=k, cat="0", geo="DE", timeframe="today 5-y")
+            ).set_index("date")["extracted_value"]
+            for k in keywords
+        },
+        axis=1,
+    )
+
+
+def timed(func) -> float:
+    t0 = time.perf_counter()
+    func()
+    return time.perf_counter() - t0
+
+
+@click.command()
+@click.option("--n-keywords", type=int, default=200)
+@click.option("--n-snapshots", type=int, default=5)
+@click.option("--max-workers", type=int, default=8)
+def main(n_keywords: int, n_snapshots: int, max_workers: int):
+    logger.remove()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parent_folder = Path(tmp)
+        _, path_params = build_folder(
+            parent_folder, n_keywords=n_keywords, n_snapshots=n_snapshots
+        )
+        keywords = [p.keyword for p in path_params]
+        store = TrendStore(
+            parent_folder=parent_folder,
+            cache_size=n_keywords,
+            max_workers=max_workers,
+        )
+
+        table = Table(title=f"Wide frame of {n_keywords} keywords")
+        for c in ["path", "time (s)"]:
+            table.add_column(c, justify="right")
+        table.add_row(
+            "notebook recipe", f"{timed(lambda: notebook(parent_folder, keywords)):.3f}"
+        )
+        table.add_row(
+            "TrendStore, cold",
+            f"{timed(lambda: store.get_many(keywords, geo='DE')):.3f}",
+        )
+        table.add_row(
+            "TrendStore, warm",
+            f"{timed(lambda: store.get_many(keywords, geo='DE')):.3f}",
+        )
+
+        Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Local stand-in for SerpAPI and S3, for end-to-end benchmarks
+
+`/search` answers like the google trends engine of SerpAPI, modelled
+on `tests/data/use_serpapi/serpapi_coffee_results.json`: the dates
+and metadata of the fixture, with the query, geo and a synthetic weekly
+series of the requested keyword. Each request waits `latency` seconds,
+with a uniform jitter of +/- 50%, and a fraction `throttle_rate` of the
+requests is throttled with a 429.
+
+Every other path is a minimal in-memory S3 API, with path-style
+`PutObject`, `GetObject` and `HeadObject`, to be used with
+`AWS_ENDPOINT_URL_S3`. There is no listing, the benchmarks only
+write to S3.
+
+```python
+with FakeSerpAPI(fixture_path, latency=0.02, throttle_rate=0.05) as server:
+    SerpApiClient.BACKEND = server.url
+```
+"""
+import copy
+import datetime
+import hashlib
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+
+class FakeSerpAPI:
+    """
+    Threaded HTTP server of SerpAPI and S3
+
+    :param fixture_path: path of `serpapi_coffee_results.json`
+    :param latency: mean seconds before answering a search
+    :param throttle_rate: fraction of the searches answered with a 429
+    :param s3_latency: seconds before answering an S3 request
+    :param seed: seed of the jitter and of the throttling
+    """
+
+    def __init__(
+        self,
+        fixture_path: Path,
+        latency: float = 0.02,
+        throttle_rate: float = 0.0,
+        s3_latency: float = 0.0,
+        seed: int = 42,
+    ):
+        with open(fixture_path, "r") as fp:
+            self.template = json.load(fp)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.s3_latency = s3_latency
+        self.random = random.Random(seed)
+        self.objects: Dict[Tuple[str, str], bytes] = {}
+        self.searches = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self) -> "FakeSerpAPI":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path.startswith("/search"):
+                    self._reply(*server.search(parse_qs(urlsplit(self.path).query)))
+                else:
+                    self._reply(*server.s3("GET", self.path))
+
+            def do_HEAD(self):
+                self._reply(*server.s3("HEAD", self.path), head=True)
+
+            def do_PUT(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._reply(*server.s3("PUT", self.path, body))
+
+            def _reply(self, status: int, content_type: str, body: bytes, head=False):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if status == 200 and not self.path.startswith("/search"):
+                    self.send_header("ETag", f'"{hashlib.md5(body).hexdigest()}"')
+                    self.send_header(
+                        "Last-Modified",
+                        datetime.datetime.utcnow().strftime(
+                            "%a, %d %b %Y %H:%M:%S GMT"
+                        ),
+                    )
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _sleep(self, latency: float):
+        if latency > 0:
+            with self._lock:
+                jitter = self.random.uniform(0.5, 1.5)
+            time.sleep(latency * jitter)
+
+    def search(self, params: Dict[str, List[str]]) -> Tuple[int, str, bytes]:
+        """response of a google trends search"""
+        self._sleep(self.latency)
+        with self._lock:
+            self.searches += 1
+            throttled = self.random.random() < self.throttle_rate
+            self.throttled += throttled
+        if throttled:
+            body = {"error": "Too many requests"}
+            return 429, "application/json", json.dumps(body).encode("utf-8")
+
+        q = params.get("q", [""])[0]
+        geo = params.get("geo", [""])[0]
+        return 200, "application/json", json.dumps(self.results(q, geo)).encode("utf-8")
+
+    def results(self, q: str, geo: str) -> Dict:
+        """the fixture, with the query, geo and a synthetic series of `q`"""
+        results = copy.deepcopy(self.template)
+        seed = zlib.crc32(f"{q}|{geo}".encode("utf-8"))
+        results["search_metadata"]["id"] = f"{seed:024x}"
+        results["search_parameters"].update({"q": q, "geo": geo})
+
+        timeline = results["interest_over_time"]["timeline_data"]
+        rng = np.random.default_rng(seed)
+        week = np.arange(len(timeline))
+        values = rng.uniform(20, 60) + 20 * np.sin(
+            2 * np.pi * week / 52 + rng.uniform(0, 2 * np.pi)
+        )
+        values = np.clip(np.round(values + rng.uniform(-5, 5, len(week))), 0, 100)
+        values = (values * 100 / values.max()).round().astype(int)
+        for record, value in zip(timeline, values.tolist()):
+            record["values"] = [
+                {"query": q, "value": str(value), "extracted_value": value}
+            ]
+
+        return results
+
+    def s3(self, method: str, path: str, body: bytes = b"") -> Tuple[int, str, bytes]:
+        """minimal path-style S3 API"""
+        self._sleep(self.s3_latency)
+        bucket, _, key = unquote(urlsplit(path).path).lstrip("/").partition("/")
+
+        if method == "PUT":
+            with self._lock:
+                self.objects[(bucket, key)] = body
+            return 200, "application/xml", b""
+
+        data = self.objects.get((bucket, key))
+        if data is None:
+            return 404, "application/xml", b"<Error><Code>NoSuchKey</Code></Error>"
+        return 200, "binary/octet-stream", data
@@ -0,0 +1,143 @@
+"""Synthetic trend data for benchmarks
+
+The generated dataframes follow the layout of
+`SerpAPISingleTrend.dataframe`.
+"""
+import datetime
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+class SyntheticTrend:
+    """Minimal trend data object to be used with the storage classes
+
+    :param dataframe: trend dataframe
+    :param metadata: metadata of the trend
+    """
+
+    def __init__(self, dataframe: pd.DataFrame, metadata: Dict):
+        self.dataframe = dataframe
+        self.metadata = metadata
+
+
+def weekly_series(
+    keyword: str,
+    start: datetime.date,
+    n_weeks: int = 260,
+    seed: int = 42,
+    scale: float = 1.0,
+) -> pd.DataFrame:
+    """weekly series with seasonality and noise, similar to a today 5-y trend
+
+    The values only depend on the dates, so that overlapping windows
+    produce overlapping points.
+
+    :param keyword: the query
+    :param start: first week of the series
+    :param n_weeks: number of weekly points
+    :param seed: seed of the keyword
+    :param scale: rescaling factor applied by google
+    """
+    dates = pd.date_range(start, periods=n_weeks, freq="7D")
+    week_number = (dates - pd.Timestamp("2000-01-02")).days.values // 7
+    rng = np.random.default_rng(seed)
+    phase, level = rng.uniform(0, 2 * np.pi), rng.uniform(20, 60)
+    noise = np.random.default_rng(week_number + seed).uniform(-5, 5)
+    values = level + 20 * np.sin(2 * np.pi * week_number / 52 + phase) + noise
+    values = np.clip(np.round(values * scale), 0, 100).astype(int)
+
+    return pd.DataFrame(
+        {
+            "query": keyword,
+            "value": values.astype(str),
+            "extracted_value": values,
+            "date_range": [
+                f"{d:%b %-d} – {d + pd.Timedelta(days=6):%b %-d, %Y}" for d in dates
+            ],
+            "timestamp": (dates.astype("int64") // 10**9).astype(str),
+            "date": dates,
+        }
+    )
+
+
+def daily_snapshots(
+    keyword: str,
+    first_snapshot: datetime.date,
+    n_snapshots: int,
+    seed: int = 42,
+    rescale_probability: float = 0.05,
+) -> Dict[datetime.date, pd.DataFrame]:
+    """Daily snapshots of a today 5-y series
+
+    The window moves by one week every seven days, and google
+    rescales the series occasionally.
+
+    :param keyword: the query
+    :param first_snapshot: date of the first snapshot
+    :param n_snapshots: number of daily snapshots
+    :param seed: seed of the keyword
+    :param rescale_probability: probability of a rescaled snapshot
+    """
+    rng = np.random.default_rng(seed)
+    snapshots = {}
+    scale = 1.0
+    for i in range(n_snapshots):
+        if rng.uniform() < rescale_probability:
+            scale = rng.choice([0.8, 0.9, 1.1, 1.25])
+        snapshot_date = first_snapshot + datetime.timedelta(days=i)
+        start = (
+            first_snapshot
+            - datetime.timedelta(weeks=260)
+            + datetime.timedelta(weeks=i // 7)
+        )
+        snapshots[snapshot_date] = weekly_series(
+            keyword=keyword, start=start, seed=seed, scale=scale
+        )
+
+    return snapshots
+
+
+def keywords(n: int) -> List[str]:
+    """synthetic keywords"""
+    return [f"keyword {i}" for i in range(n)]
+
+
+def words(n: int, seed: int = 42) -> List[str]:
+    """pronounceable synthetic keywords of one or two words"""
+    rng = np.random.default_rng(seed)
+    syllables = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"]
+
+    def word():
+        return "".join(rng.choice(syllables, size=rng.integers(2, 4)))
+
+    return [word() if rng.uniform() < 0.6 else f"{word()} {word()}" for _ in range(n)]
+
+
+def metadata_entries(
+    n: int, geos: List[str] = ["DE", "US", "GB", "FR", "ES"], seed: int = 42
+) -> List[Dict]:
+    """entries as they are produced by `trendy agg-metadata`"""
+    base_url = "https://sm-google-trend-public.s3.eu-central-1.amazonaws.com/agg"
+    entries = []
+    for i, keyword in enumerate(words(n, seed=seed)):
+        geo = geos[i % len(geos)]
+        slug = keyword.replace(" ", "-")
+        path = (
+            f"keyword={slug}/cat=0/geo={geo.lower()}/timeframe=today-5-y"
+            "/format=json/snapshot_date=latest/data.json"
+        )
+        entries.append(
+            {
+                "keyword": keyword,
+                "cat": "0",
+                "geo": geo,
+                "timeframe": "today 5-y",
+                "path": f"{base_url}/{path}",
+                "q": keyword,
+                "s3": f"s3://sm-google-trend-public/agg/{path}",
+            }
+        )
+
+    return entries
@@ -1,54 +1,84 @@
 import datetime
-import re
-from typing import Any, Dict, List, Literal, Optional, Union
+import io
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from cloudpathlib import AnyPath
 from loguru import logger
 
+from sm_trendy.aggregate.pyramid import SeriesPyramid, sparkline_path
 from sm_trendy.use_serpapi.config import SerpAPIConfigBundle
 from sm_trendy.utilities.config import PathParams
-from sm_trendy.utilities.storage import StoreJSON
+from sm_trendy.utilities.metrics import METRICS
+from sm_trendy.utilities.schema import enforce_trend_schema, format_dates
+from sm_trendy.utilities.storage import (
+    StoreDeltaDataFrame,
+    StoreJSON,
+    list_snapshot_dates,
+    read_arrow_table,
+    resolve_data_path,
+    write_object,
+)
 
 
 class DownloadedLoader:
     """
     Load downloaded data as parquet
 
-    !!! warning
-        Currently, this class only downloads the latest snapshot.
+    The latest snapshot is loaded by default, pass `snapshot_date`
+    to load an earlier one.
 
-    !!! todo:
-        Allow downloading any snapshot(s)
+    Local `feather` and `parquet` files are memory-mapped. Use
+    [`load_table`][sm_trendy.aggregate.agg.DownloadedLoader.load_table]
+    for zero-copy access to the `feather` files as Arrow tables.
 
     :param parent_folder: parent folder of the downloaded dataset
     :param from_format: which format to load the data from
+    :param memory_map: whether to memory-map local `feather` and `parquet` files
     """
 
     def __init__(
         self,
         parent_folder: AnyPath,
-        from_format: Optional[Literal["csv", "parquet"]] = "csv",
+        from_format: Optional[Literal["csv", "parquet", "feather", "delta"]] = "csv",
+        memory_map: bool = True,
     ):
         self.from_format = from_format
         self.parent_folder = parent_folder
+        self.memory_map = memory_map
 
-    def _data_path(self, path_params: PathParams) -> AnyPath:
+    def _data_path(
+        self, path_params: PathParams, snapshot_date: Optional[str] = None
+    ) -> AnyPath:
         """
         build the full dataset path
 
         :param path_params: PathParams to calculate the path patterns
+        :param snapshot_date: iso format of the snapshot date,
+            the latest snapshot if not specified
         """
         data_folder = path_params.path(parent_folder=self.parent_folder)
 
-        if self.from_format == "csv":
+        if self.from_format in ("csv", "parquet", "feather"):
             format_path = data_folder / f"format={self.from_format}"
-            latest_snapshot = self._latest_snapshots(format_path)
+            if snapshot_date is None:
+                snapshot_date = self._latest_snapshots(format_path)
             path = (
                 format_path
-                / f"snapshot_date={latest_snapshot}"
+                / f"snapshot_date={snapshot_date}"
                 / f"data.{self.from_format}"
             )
+            path = resolve_data_path(path)
+        elif self.from_format == "delta":
+            format_path = data_folder / f"format={self.from_format}"
+            if snapshot_date is None:
+                snapshot_date = self._latest_snapshots(format_path)
+            path = format_path / f"snapshot_date={snapshot_date}"
         else:
             raise Exception(f"Not yet supported: reading from {self.from_format}")
 
@@ -56,43 +86,75 @@ class DownloadedLoader:
 
     def _load_as_dataframe(self, data_path: AnyPath) -> pd.DataFrame:
         """
-        Load the data file as pandas dataframe
+        Load the data file as pandas dataframe, following the
+        [`TREND_SCHEMA`][sm_trendy.utilities.schema.TREND_SCHEMA]
 
-        :param data_path: path to the data file
+        :param data_path: path to the data file,
+            or the snapshot folder for the `delta` format
         """
         if self.from_format == "csv":
-            df = pd.read_csv(data_path)
+            with METRICS.timer("read", "csv") as t:
+                data = data_path.read_bytes()
+                t.bytes = len(data)
+            with METRICS.timer("parse", "csv"):
+                return enforce_trend_schema(pd.read_csv(io.BytesIO(data)))
+        elif self.from_format in ("parquet", "feather"):
+            with METRICS.timer("read", self.from_format):
+                table = read_arrow_table(data_path, memory_map=self.memory_map)
+            with METRICS.timer("parse", self.from_format):
+                return enforce_trend_schema(table.to_pandas())
+        elif self.from_format == "delta":
+            with METRICS.timer("read", "delta"):
+                sdd = StoreDeltaDataFrame(target_folder=data_path.parent.parent)
+                df = sdd.load(snapshot_date=data_path.name.split("=")[-1])
+            with METRICS.timer("parse", "delta"):
+                return enforce_trend_schema(df)
         else:
             raise Exception(f"Not yet supported: reading from {self.from_format}")
 
-        return df
-
-    def __call__(self, path_params: PathParams) -> pd.DataFrame:
+    def __call__(
+        self, path_params: PathParams, snapshot_date: Optional[str] = None
+    ) -> pd.DataFrame:
         """
         load the data specified in a PathParams as pandas dataframe
 
         :param path_params: PathParams to calculate the path patterns
+        :param snapshot_date: iso format of the snapshot date,
+            the latest snapshot if not specified
         """
-        data_path = self._data_path(path_params=path_params)
+        data_path = self._data_path(
+            path_params=path_params, snapshot_date=snapshot_date
+        )
         df = self._load_as_dataframe(data_path)
 
         return df
 
-    @staticmethod
-    def _latest_snapshots(path: AnyPath):
-        path_subfolders = list(path.iterdir())
-        logger.debug(f"subfolders: {path_subfolders} in {path}")
+    def load_table(
+        self, path_params: PathParams, snapshot_date: Optional[str] = None
+    ) -> pa.Table:
+        """
+        load the data specified in a PathParams as Arrow table,
+        without conversion to pandas
+
+        :param path_params: PathParams to calculate the path patterns
+        :param snapshot_date: iso format of the snapshot date,
+            the latest snapshot if not specified
+        """
+        if self.from_format not in ("parquet", "feather"):
+            raise Exception(f"Can not load {self.from_format} as arrow table")
+
+        data_path = self._data_path(
+            path_params=path_params, snapshot_date=snapshot_date
+        )
 
-        re_sd = re.compile(r"snapshot_date=(\d{4}-\d{2}-\d{2})")
+        return read_arrow_table(data_path, memory_map=self.memory_map)
 
-        snapshot_dates = sum(
-            [re_sd.findall(i.name) for i in path_subfolders], []
-        )  # type: List[str]
-        logger.debug(f"snapshot_dates: {snapshot_dates}")
+    @staticmethod
+    def _latest_snapshots(path: AnyPath):
+        snapshot_dates = list_snapshot_dates(path)
+        logger.debug(f"snapshot_dates: {snapshot_dates} in {path}")
 
-        snapshot_dates_latest = sorted(
-            snapshot_dates, key=lambda x: datetime.date.fromisoformat(x)
-        )[-1]
+        snapshot_dates_latest = snapshot_dates[-1]
 
         return snapshot_dates_latest
 
@@ -105,6 +167,10 @@ class AggAPIJSON:
     cleans it up, and convert it to dictionary
     that is suitable for JSON format.
 
+    Use [`to_json_bytes`][sm_trendy.aggregate.agg.AggAPIJSON.to_json_bytes]
+    to serialize the records directly from the columns,
+    without building the list of dictionaries.
+
     :param fields: a dictionary that maps the original
         columns to the desired keys in the result
     """
@@ -122,15 +188,162 @@ class AggAPIJSON:
     def __call__(
         self, dataframe: pd.DataFrame, sort_by: Optional[str] = None
     ) -> List[Dict]:
-        df = dataframe.copy()
-        df = df[self.keep_columns]
-        df.rename(columns=self.fields, inplace=True)
-        records = df.to_dict(orient="records")
+        df = self._clean(dataframe=dataframe, sort_by=sort_by)
+
+        return df.to_dict(orient="records")
+
+    def to_json_bytes(
+        self, dataframe: pd.DataFrame, sort_by: Optional[str] = None
+    ) -> bytes:
+        """
+        Serialize the records as a JSON array of objects
+
+        :param dataframe: raw data
+        :param sort_by: key in the result to sort the records by
+        """
+        df = self._clean(dataframe=dataframe, sort_by=sort_by)
+
+        return df.to_json(orient="records").encode("utf-8")
+
+    def to_json_bytes_by(
+        self, dataframe: pd.DataFrame, by: str, sort_by: Optional[str] = None
+    ) -> Dict[str, bytes]:
+        """
+        Serialize the records of many series at once
+
+        The dataframe holds all series, identified by the column `by`.
+        The selection, renaming, sorting and serialization run once on
+        the whole dataframe, and the serialized records are then split
+        by series. The payload of each series is the same as
+        [`to_json_bytes`][sm_trendy.aggregate.agg.AggAPIJSON.to_json_bytes]
+        on the series alone.
+
+        :param dataframe: raw data of all series
+        :param by: column that identifies the series
+        :param sort_by: key in the result to sort the records by
+        """
+        order = [by]
+        if sort_by is not None:
+            order.append({v: k for k, v in self.fields.items()}[sort_by])
+        df = dataframe.sort_values(by=order, kind="stable", ignore_index=True)
+
+        keys = df[by].to_numpy()
+        if not len(keys):
+            return {}
+        boundaries = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(keys)]])
+
+        # the dates of each series are formatted as if it was alone
+        records = self._clean(dataframe=df, starts=starts).to_json(
+            orient="records", lines=True
+        )
+        records = records.splitlines()
+
+        return {
+            str(keys[s]): ("[" + ",".join(records[s:e]) + "]").encode("utf-8")
+            for s, e in zip(starts, ends)
+        }
+
+    def _clean(
+        self,
+        dataframe: pd.DataFrame,
+        sort_by: Optional[str] = None,
+        starts: Optional[np.ndarray] = None,
+    ) -> pd.DataFrame:
+        """select, rename and sort the columns,
+        and format the datetime columns as strings,
+        see [`format_dates`][sm_trendy.utilities.schema.format_dates]
+        for `starts`
+        """
+        df = dataframe[self.keep_columns].rename(columns=self.fields)
 
         if sort_by is not None:
-            records = sorted(records, key=lambda x: x[sort_by])
+            df = df.sort_values(by=sort_by, kind="stable", ignore_index=True)
+
+        for c in df.select_dtypes(include="datetime").columns:
+            df[c] = format_dates(df[c], starts=starts)
+
+        return df
+
+
+class AggCompactJSON:
+    """
+    Generate compact columnar json data for the website
+
+    Instead of one record per point, the query is stored once,
+    the dates as a start date plus a step, and the values as
+    a plain array.
+
+    ```json
+    {
+        "query": "curtain",
+        "start": "2018-07-29",
+        "unit": "D",
+        "step": 7,
+        "values": [14, 21, 12],
+        "below_one": []
+    }
+    ```
+
+    `unit` is `"D"` for dates and `"s"` for datetimes.
+    If the dates are not evenly spaced, `step` is replaced by `deltas`,
+    the differences between consecutive dates.
+    `below_one` holds the indices of the values reported as `"<1"`.
+
+    :param query_column: column of the query
+    :param date_column: column of the dates
+    :param value_column: column of the values
+    """
 
-        return records
+    def __init__(
+        self,
+        query_column: str = "query",
+        date_column: str = "date",
+        value_column: str = "extracted_value",
+    ):
+        self.query_column = query_column
+        self.date_column = date_column
+        self.value_column = value_column
+
+    def __call__(self, dataframe: pd.DataFrame) -> Dict:
+        df = dataframe.sort_values(by=self.date_column, kind="stable")
+
+        queries = df[self.query_column].unique()
+        if len(queries) > 1:
+            raise ValueError(f"Requires a single query, got {list(queries)}")
+
+        dates = pd.to_datetime(df[self.date_column]).values.astype("datetime64[s]")
+        unit = "D" if (dates == dates.astype("datetime64[D]")).all() else "s"
+        dates = dates.astype(f"datetime64[{unit}]")
+
+        payload = {
+            "query": str(queries[0]) if len(queries) else None,
+            "start": str(dates[0]).replace("T", " ") if len(dates) else None,
+            "unit": unit,
+        }
+
+        deltas = np.diff(dates).astype("int64")
+        if len(np.unique(deltas)) <= 1:
+            payload["step"] = int(deltas[0]) if len(deltas) else None
+        else:
+            payload["deltas"] = deltas.tolist()
+
+        payload["values"] = df[self.value_column].tolist()
+        if "below_one" in df.columns:
+            payload["below_one"] = np.flatnonzero(df["below_one"].values).tolist()
+        else:
+            payload["below_one"] = []
+
+        return payload
+
+    def to_json_bytes(self, dataframe: pd.DataFrame) -> bytes:
+        """
+        Serialize the compact payload
+
+        :param dataframe: raw data
+        """
+        return json.dumps(self(dataframe), separators=(",", ":")).encode("utf-8")
 
 
 class AggSerpAPIBundle:
@@ -144,12 +357,73 @@ class AggSerpAPIBundle:
         a. retrieve the data from each of the config
         b. convert the selected data to json
         c. save it to a new folder with the same path pattern.
+    3. If requested, compute the pyramids of all configs at once,
+        see [`SeriesPyramid`][sm_trendy.aggregate.pyramid.SeriesPyramid].
+
+    With `batched`, step 2 only loads the data. All configs are then
+    concatenated into one dataframe, and the `json` records of all
+    configs are serialized at once with
+    [`AggAPIJSON.to_json_bytes_by`][sm_trendy.aggregate.agg.AggAPIJSON.to_json_bytes_by],
+    which removes the pandas overhead of the per-config pipelines.
+    The published files are the same.
+
+    The `json-monthly` and `json-quarterly` formats hold the monthly and
+    quarterly means in the same shape as `json`. The sparklines of all
+    configs are saved in a single file, see
+    [`sparkline_path`][sm_trendy.aggregate.pyramid.sparkline_path],
+    to be embedded in the metadata.
+
+    :param parent_path: parent folder of the aggregated data
+    :param formats: which formats to publish, `json` for
+        [`AggAPIJSON`][sm_trendy.aggregate.agg.AggAPIJSON], `json-compact` for
+        [`AggCompactJSON`][sm_trendy.aggregate.agg.AggCompactJSON], and
+        `json-monthly` or `json-quarterly` for the pyramids
+    :param content_encoding: upload the json files precompressed
+        with `gzip` or `br`
+    :param cache_control: `Cache-Control` header of the json files on S3
+    :param sparklines: whether to save the sparklines of the configs
+    :param sparkline_size: number of points of the sparklines
+    :param batched: whether to aggregate all configs in a single dataframe
     """
 
-    def __init__(self, parent_path: AnyPath):
+    pyramid_formats = {"json-monthly": "monthly", "json-quarterly": "quarterly"}
+
+    def __init__(
+        self,
+        parent_path: AnyPath,
+        formats: Optional[
+            List[Literal["json", "json-compact", "json-monthly", "json-quarterly"]]
+        ] = None,
+        content_encoding: Optional[Literal["gzip", "br"]] = None,
+        cache_control: Optional[str] = None,
+        sparklines: bool = False,
+        sparkline_size: int = 32,
+        batched: bool = False,
+    ):
         self.parent_path = parent_path
+        if formats is None:
+            formats = ["json"]
+        self.formats = formats
+        self.content_encoding = content_encoding
+        self.cache_control = cache_control
+        self.sparklines = sparklines
+        self.sparkline_size = sparkline_size
+        self.batched = batched
+
+    @property
+    def with_pyramids(self) -> bool:
+        return self.sparklines or any(f in self.pyramid_formats for f in self.formats)
+
+    def load(
+        self, serpapi_config_path: AnyPath
+    ) -> Iterator[Tuple[PathParams, str, AnyPath, pd.DataFrame]]:
+        """
+        Load the latest downloaded data of each config in a serpapi config file
 
-    def __call__(self, serpapi_config_path: AnyPath):
+        :param serpapi_config_path: path of the serpapi config file
+        :return: path params, snapshot date, target folder
+            and raw dataframe of each config
+        """
         # ReCreate the bundle config for SerpAPI
         scb = SerpAPIConfigBundle(file_path=serpapi_config_path, serpapi_key="")
         scb_parent_folder = scb.global_config["path"]["parent_folder"]
@@ -160,49 +434,231 @@ class AggSerpAPIBundle:
         # Loop through the serpapi configs
         logger.info(f"  Looping through {len(scb)} configs")
         for c in scb:
-            logger.debug(f"  Aggregating {c}")
+            logger.debug(f"  Loading {c}")
             # Path of the raw downloaded data
             c_path = c.path_params.path(parent_folder=scb_parent_folder)
             # Raw dataframe
             c_df = dll_k(c.path_params)
+            c_snapshot_date = dll_k._latest_snapshots(c_path / "format=csv")
+            c_k_target_path = c.path_params.path(parent_folder=self.parent_path)
+
+            yield c.path_params, c_snapshot_date, c_k_target_path, c_df
+
+    def __call__(self, serpapi_config_path: AnyPath):
+        inputs = []
+        for c_path_params, c_snapshot_date, c_k_target_path, c_df in self.load(
+            serpapi_config_path
+        ):
+            logger.debug(f"  Aggregating {c_path_params}")
+            if self.batched or self.with_pyramids:
+                inputs.append((c_path_params, c_snapshot_date, c_k_target_path, c_df))
+            if self.batched:
+                continue
 
             # aggregate
-            c_agg_json = AggAPIJSON()
-            c_records = c_agg_json(dataframe=c_df, sort_by="date")
+            c_payloads = {}
+            if "json" in self.formats:
+                with METRICS.timer("serialise", "json") as t:
+                    c_agg_json = AggAPIJSON()
+                    c_payloads["json"] = c_agg_json.to_json_bytes(
+                        dataframe=c_df, sort_by="date"
+                    )
+                    t.bytes = len(c_payloads["json"])
+            if "json-compact" in self.formats:
+                with METRICS.timer("serialise", "json-compact") as t:
+                    c_agg_compact_json = AggCompactJSON()
+                    c_payloads["json-compact"] = c_agg_compact_json.to_json_bytes(
+                        dataframe=c_df
+                    )
+                    t.bytes = len(c_payloads["json-compact"])
 
             # save snapshot
-            c_snapshot_date = dll_k._latest_snapshots(c_path / "format=csv")
-            c_k_target_path = c.path_params.path(parent_folder=self.parent_path)
+            self._store_payloads(
+                snapshot_date=c_snapshot_date,
+                target_folder=c_k_target_path,
+                payloads=c_payloads,
+            )
+
+        if not inputs:
+            return
+
+        series = self._concat(inputs)
+        if self.batched:
+            self._aggregate_batched(series=series, inputs=inputs)
+        if self.with_pyramids:
+            self._aggregate_pyramids(
+                serpapi_config_path=serpapi_config_path, series=series, inputs=inputs
+            )
+
+    @staticmethod
+    def _concat(
+        inputs: List[Tuple[PathParams, str, AnyPath, pd.DataFrame]]
+    ) -> pd.DataFrame:
+        """long dataframe of all configs, with the partition
+        of each config in `series_id`
+
+        :param inputs: path params, snapshot date, target folder
+            and raw dataframe of each config
+        """
+        # concatenating the arrays avoids the union of the categories
+        series = pd.DataFrame(
+            {
+                c: np.concatenate([c_df[c].to_numpy() for _, _, _, c_df in inputs])
+                for c in ["query", "date", "extracted_value"]
+            }
+        ).astype({"query": str})
+        series["series_id"] = pd.Categorical(
+            np.repeat(
+                [c_path_params.partition for c_path_params, _, _, _ in inputs],
+                [len(c_df) for _, _, _, c_df in inputs],
+            )
+        )
+
+        return series
+
+    def _aggregate_batched(
+        self,
+        series: pd.DataFrame,
+        inputs: List[Tuple[PathParams, str, AnyPath, pd.DataFrame]],
+    ) -> None:
+        """serialize the formats of all configs at once and save them
+
+        :param series: long dataframe of all configs
+        :param inputs: path params, snapshot date, target folder
+            and raw dataframe of each config
+        """
+        logger.info(f"  Aggregating {len(inputs)} configs in batch")
+        payloads = defaultdict(dict)
+        if "json" in self.formats:
+            # a single measurement for all configs
+            with METRICS.timer("serialise", "json-batched") as t:
+                for series_id, body in (
+                    AggAPIJSON()
+                    .to_json_bytes_by(dataframe=series, by="series_id", sort_by="date")
+                    .items()
+                ):
+                    payloads[series_id]["json"] = body
+                    t.bytes += len(body)
+
+        for c_path_params, c_snapshot_date, c_k_target_path, c_df in inputs:
+            c_payloads = payloads.get(c_path_params.partition, {})
+            if "json-compact" in self.formats:
+                with METRICS.timer("serialise", "json-compact") as t:
+                    c_payloads["json-compact"] = AggCompactJSON().to_json_bytes(
+                        dataframe=c_df
+                    )
+                    t.bytes = len(c_payloads["json-compact"])
+            self._store_payloads(
+                snapshot_date=c_snapshot_date,
+                target_folder=c_k_target_path,
+                payloads=c_payloads,
+            )
+
+    def _aggregate_pyramids(
+        self,
+        serpapi_config_path: AnyPath,
+        series: pd.DataFrame,
+        inputs: List[Tuple[PathParams, str, AnyPath, pd.DataFrame]],
+    ) -> None:
+        """compute the pyramids of all configs at once and save them
+
+        :param serpapi_config_path: path of the serpapi config file
+        :param series: long dataframe of all configs
+        :param inputs: path params, snapshot date, target folder
+            and raw dataframe of each config
+        """
+        logger.info(f"  Computing pyramids of {len(inputs)} configs")
+        levels = SeriesPyramid(sparkline_size=self.sparkline_size)(series)
+
+        payloads = defaultdict(dict)
+        for c_format, c_level in self.pyramid_formats.items():
+            if c_format not in self.formats:
+                continue
+            with METRICS.timer("serialise", c_format) as t:
+                for series_id, body in SeriesPyramid.to_json_bytes(
+                    levels[c_level]
+                ).items():
+                    payloads[series_id][c_format] = body
+                    t.bytes += len(body)
+
+        for c_path_params, c_snapshot_date, c_k_target_path, _ in inputs:
+            self._store_payloads(
+                snapshot_date=c_snapshot_date,
+                target_folder=c_k_target_path,
+                payloads=payloads.get(c_path_params.partition, {}),
+            )
+
+        if self.sparklines:
+            target_path = sparkline_path(
+                parent_path=self.parent_path, serpapi_config_path=serpapi_config_path
+            )
+            logger.debug(f"Saving sparklines to {target_path} ...")
+            if isinstance(target_path, Path):
+                target_path.parent.mkdir(parents=True, exist_ok=True)
+            write_object(
+                target_path=target_path,
+                body=json.dumps(
+                    SeriesPyramid.to_lists(levels["sparkline"]),
+                    separators=(",", ":"),
+                ).encode("utf-8"),
+                content_type="application/json",
+                content_encoding=self.content_encoding,
+                cache_control=self.cache_control,
+            )
+
+    def _store_payloads(
+        self, snapshot_date: str, target_folder: AnyPath, payloads: Dict[str, bytes]
+    ) -> None:
+        """save the payloads of a config for the snapshot date, and as latest
+
+        :param snapshot_date: iso format of the snapshot date
+        :param target_folder: where to save the data
+        :param payloads: serialized json per format
+        """
+        for c_format, c_records in payloads.items():
             logger.debug(
-                f"Saving data to {c_k_target_path} with snapshot {c_snapshot_date}..."
+                f"Saving {c_format} to {target_folder} "
+                f"with snapshot {snapshot_date}..."
             )
             self._store_json(
-                snapshot_date=datetime.date.fromisoformat(c_snapshot_date),
-                target_folder=c_k_target_path,
+                snapshot_date=datetime.date.fromisoformat(snapshot_date),
+                target_folder=target_folder,
                 records=c_records,
+                format=c_format,
             )
 
             # save a copy as latest
-            logger.debug(f"Saving data to {c_k_target_path} with snapshot latest ...")
+            logger.debug(
+                f"Saving {c_format} to {target_folder} with snapshot latest ..."
+            )
             self._store_json(
-                snapshot_date="latest", target_folder=c_k_target_path, records=c_records
+                snapshot_date="latest",
+                target_folder=target_folder,
+                records=c_records,
+                format=c_format,
             )
 
     def _store_json(
         self,
         snapshot_date: Union[datetime.date, Literal["latest"]],
         target_folder: AnyPath,
-        records: List[Dict],
+        records: Union[List[Dict], bytes],
+        format: Literal[
+            "json", "json-compact", "json-monthly", "json-quarterly"
+        ] = "json",
     ) -> None:
         """
         Save the `records` as json files inside the folder `target_folder`
 
         :param snapshot_date: a specific snapshot date to use used as a folder name
         :param target_folder: where to save the data
-        :param records: data records to be saved
+        :param records: data records to be saved, or the serialized json
+        :param format: the format partition to save to
         """
         store_json = StoreJSON(
             target_folder=target_folder,
             snapshot_date=snapshot_date,
+            content_encoding=self.content_encoding,
+            cache_control=self.cache_control,
         )
-        store_json.save(records=records, formats=["json"])
+        store_json.save(records=records, formats=[format])
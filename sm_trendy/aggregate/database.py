@@ -0,0 +1,313 @@
+import datetime
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Set, Tuple
+
+import pandas as pd
+from cloudpathlib import AnyPath
+from loguru import logger
+
+from sm_trendy.aggregate.agg import DownloadedLoader
+from sm_trendy.use_serpapi.config import SerpAPIConfigBundle
+from sm_trendy.utilities.config import PathParams
+from sm_trendy.utilities.schema import format_dates
+from sm_trendy.utilities.storage import list_snapshot_dates
+
+SERIES_COLUMNS = ["keyword", "cat", "geo", "timeframe"]
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS trends (
+        keyword TEXT NOT NULL,
+        cat TEXT NOT NULL,
+        geo TEXT NOT NULL,
+        timeframe TEXT NOT NULL,
+        snapshot_date DATE NOT NULL,
+        date TIMESTAMP NOT NULL,
+        value INTEGER,
+        below_one BOOLEAN
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_trends_series
+    ON trends (keyword, geo, timeframe, snapshot_date, date)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS snapshots (
+        keyword TEXT NOT NULL,
+        cat TEXT NOT NULL,
+        geo TEXT NOT NULL,
+        timeframe TEXT NOT NULL,
+        snapshot_date DATE NOT NULL,
+        n_rows INTEGER,
+        loaded_at TIMESTAMP,
+        PRIMARY KEY (keyword, cat, geo, timeframe, snapshot_date)
+    )
+    """,
+    """
+    CREATE VIEW IF NOT EXISTS latest_trends AS
+    SELECT t.*
+    FROM trends t
+    JOIN (
+        SELECT keyword, cat, geo, timeframe, MAX(snapshot_date) AS snapshot_date
+        FROM snapshots
+        GROUP BY keyword, cat, geo, timeframe
+    ) l
+    USING (keyword, cat, geo, timeframe, snapshot_date)
+    """,
+]
+"""tables, indexes and views of the exported database"""
+
+
+class ExportDatabase:
+    """
+    Export the downloaded trends into a single local database file,
+    for ad-hoc analysis with SQL
+
+    | table | content |
+    |---|---|
+    | `trends` | one row per point, with `keyword`, `cat`, `geo`, `timeframe`, `snapshot_date`, `date`, `value` and `below_one` |
+    | `snapshots` | the snapshots loaded into `trends`, with their number of rows |
+    | `latest_trends` | view of the latest snapshot of each series in `trends` |
+
+    `trends` is indexed on `(keyword, geo, timeframe, snapshot_date, date)`.
+
+    The export is incremental: the snapshot catalog of the downloaded
+    data is compared to the `snapshots` table, and only the missing
+    snapshots are loaded, in transactions that also register them in
+    `snapshots`, so that an interrupted export resumes where it stopped. With
+    `snapshots="latest"`, only the latest snapshot of each series is
+    kept, older ones are removed when a newer one is loaded.
+
+    The files are read concurrently, as they are usually on S3.
+
+    !!! note
+        The `duckdb` backend requires the optional package `duckdb`.
+
+    :param database_path: path of the local database file
+    :param backend: `sqlite`, or `duckdb`
+    :param from_format: which format of the downloaded data to load
+    :param snapshots: load only the `latest` snapshot, or `all` of them
+    :param max_workers: number of concurrent reads
+    """
+
+    def __init__(
+        self,
+        database_path: Path,
+        backend: Literal["sqlite", "duckdb"] = "sqlite",
+        from_format: Literal["csv", "parquet", "feather", "delta"] = "csv",
+        snapshots: Literal["latest", "all"] = "latest",
+        max_workers: int = 8,
+    ):
+        if backend not in ("sqlite", "duckdb"):
+            raise ValueError(f"Not yet supported: backend {backend}")
+        self.database_path = database_path
+        self.backend = backend
+        self.from_format = from_format
+        self.snapshots = snapshots
+        self.max_workers = max_workers
+
+    def connect(self):
+        """connection to the database, with the schema created"""
+        if self.backend == "duckdb":
+            try:
+                import duckdb
+            except ImportError as e:
+                raise ImportError(
+                    "The duckdb backend requires duckdb, "
+                    "install it with `pip install duckdb`"
+                ) from e
+            con = duckdb.connect(str(self.database_path))
+        else:
+            con = sqlite3.connect(str(self.database_path))
+            con.execute("PRAGMA journal_mode = WAL")
+            con.execute("PRAGMA synchronous = NORMAL")
+
+        for statement in SCHEMA:
+            con.execute(statement)
+        con.commit()
+
+        return con
+
+    @contextmanager
+    def _transaction(self, con):
+        if self.backend == "duckdb":
+            con.begin()
+        try:
+            yield
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+
+    def catalog(
+        self, serpapi_config_paths: List[AnyPath]
+    ) -> List[Tuple[PathParams, AnyPath, str]]:
+        """
+        Snapshots of the downloaded data of all configs
+
+        :param serpapi_config_paths: paths of the serpapi config files
+        :return: path params, parent folder of the downloaded
+            data and snapshot date of each snapshot
+        """
+        catalog = []
+        for serpapi_config_path in serpapi_config_paths:
+            scb = SerpAPIConfigBundle(file_path=serpapi_config_path, serpapi_key="")
+            parent_folder = AnyPath(scb.global_config["path"]["parent_folder"])
+            for c in scb:
+                snapshot_dates = list_snapshot_dates(
+                    c.path_params.path(parent_folder=parent_folder)
+                    / f"format={self.from_format}"
+                )
+                if self.snapshots == "latest":
+                    snapshot_dates = snapshot_dates[-1:]
+                catalog.extend(
+                    (c.path_params, parent_folder, d) for d in snapshot_dates
+                )
+
+        return catalog
+
+    @staticmethod
+    def loaded(con) -> Set[Tuple[str, str, str, str, str]]:
+        """series and snapshot dates in the `snapshots` table"""
+        rows = con.execute(
+            "SELECT keyword, cat, geo, timeframe, CAST(snapshot_date AS TEXT) "
+            "FROM snapshots"
+        ).fetchall()
+
+        return {tuple(str(v) for v in r) for r in rows}
+
+    def __call__(self, serpapi_config_paths: List[AnyPath]) -> Dict[str, int]:
+        """
+        Load the missing snapshots
+
+        :param serpapi_config_paths: paths of the serpapi config files
+        :return: number of snapshots and rows loaded
+        """
+        con = self.connect()
+        try:
+            loaded = self.loaded(con)
+            missing = [
+                (path_params, parent_folder, snapshot_date)
+                for path_params, parent_folder, snapshot_date in self.catalog(
+                    serpapi_config_paths
+                )
+                if self._key(path_params, snapshot_date) not in loaded
+            ]
+            logger.info(
+                f"Loading {len(missing)} snapshots into {self.database_path}, "
+                f"{len(loaded)} already loaded"
+            )
+
+            summary = {"snapshots": 0, "rows": 0}
+            chunk_size = self.max_workers * 4
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for start in range(0, len(missing), chunk_size):
+                    chunk = missing[start : start + chunk_size]
+                    frames = executor.map(lambda m: self._read(*m), chunk)
+                    snapshots = [
+                        (path_params, snapshot_date, df)
+                        for (path_params, _, snapshot_date), df in zip(chunk, frames)
+                        if df is not None
+                    ]
+                    with self._transaction(con):
+                        for path_params, snapshot_date, df in snapshots:
+                            self._insert(con, path_params, snapshot_date, df)
+                    summary["snapshots"] += len(snapshots)
+                    summary["rows"] += sum(len(df) for _, _, df in snapshots)
+        finally:
+            con.close()
+
+        logger.info(f"Loaded {summary}")
+        return summary
+
+    @staticmethod
+    def _key(path_params: PathParams, snapshot_date: str) -> Tuple[str, ...]:
+        return (
+            path_params.keyword,
+            path_params.cat,
+            path_params.geo,
+            path_params.timeframe,
+            snapshot_date,
+        )
+
+    def _read(
+        self, path_params: PathParams, parent_folder: AnyPath, snapshot_date: str
+    ) -> Optional[pd.DataFrame]:
+        """rows of a snapshot, `None` if it can not be read"""
+        dll = DownloadedLoader(
+            parent_folder=parent_folder, from_format=self.from_format
+        )
+        try:
+            df = dll(path_params, snapshot_date=snapshot_date)
+        except Exception as e:
+            logger.error(f"can not load {path_params} {snapshot_date}: {e}")
+            return None
+
+        return pd.DataFrame(
+            {
+                "keyword": path_params.keyword,
+                "cat": path_params.cat,
+                "geo": path_params.geo,
+                "timeframe": path_params.timeframe,
+                "snapshot_date": snapshot_date,
+                "date": df["date"].values,
+                "value": df["extracted_value"].astype("int64").values,
+                "below_one": (
+                    df["below_one"].values
+                    if "below_one" in df.columns
+                    else pd.Series(False, index=df.index).values
+                ),
+            }
+        )
+
+    def _insert(
+        self,
+        con,
+        path_params: PathParams,
+        snapshot_date: str,
+        rows: pd.DataFrame,
+    ):
+        """insert the rows of a snapshot and register it in `snapshots`"""
+        key = self._key(path_params, snapshot_date)
+        series_filter = " AND ".join(f"{c} = ?" for c in SERIES_COLUMNS)
+        if self.snapshots == "latest":
+            # keep only the latest snapshot of the series
+            delete_filter = series_filter
+            delete_params = key[:-1]
+        else:
+            delete_filter = f"{series_filter} AND snapshot_date = ?"
+            delete_params = key
+
+        for table in ["trends", "snapshots"]:
+            con.execute(f"DELETE FROM {table} WHERE {delete_filter}", delete_params)
+
+        if self.backend == "duckdb":
+            con.register("_rows", rows)
+            con.execute(
+                "INSERT INTO trends "
+                "SELECT keyword, cat, geo, timeframe, CAST(snapshot_date AS DATE), "
+                "date, value, below_one FROM _rows"
+            )
+            con.unregister("_rows")
+        else:
+            con.executemany(
+                "INSERT INTO trends VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                zip(
+                    *[rows[c].tolist() for c in SERIES_COLUMNS + ["snapshot_date"]],
+                    format_dates(rows["date"]).tolist(),
+                    rows["value"].tolist(),
+                    rows["below_one"].astype(int).tolist(),
+                ),
+            )
+
+        con.execute(
+            "INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                *key,
+                len(rows),
+                datetime.datetime.utcnow().isoformat(sep=" ", timespec="seconds"),
+            ),
+        )
@@ -0,0 +1,179 @@
+import json
+from collections import defaultdict
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Set
+
+from cloudpathlib import AnyPath
+from loguru import logger
+from slugify import slugify
+
+from sm_trendy.utilities.storage import write_object
+
+
+class KeywordIndex:
+    """
+    Sharded and searchable index of the keywords for the website
+
+    Instead of one monolithic `metadata.json`, the entries are split
+    into shards per geo and per keyword prefix, so that clients only
+    download the shards a query needs.
+
+    ```
+    index_folder / "manifest.json"
+    index_folder / "search.json"
+    index_folder / "geo=de" / "prefix=cu" / "keywords.json"
+    ```
+
+    - `manifest.json` lists the shards, with their path and size.
+    - `search.json` maps the keyword prefixes and the trigrams of the
+      keywords to the shards that contain them.
+    - `keywords.json` holds the metadata entries of a shard.
+
+    A client that searches for `"curt"` in DE computes the trigrams
+    `"cur"` and `"urt"`, takes the shards listed for all trigrams
+    in `search.json`, keeps the `geo=de` shards, and scans them.
+
+    :param entries: metadata entries of the keywords, e.g.,
+        the ones of `trendy agg-metadata`, with `keyword` and `geo`
+    :param prefix_length: number of characters in the keyword prefix
+        used for sharding
+    """
+
+    def __init__(self, entries: List[Dict], prefix_length: int = 2):
+        self.entries = entries
+        self.prefix_length = prefix_length
+
+    @staticmethod
+    def normalize(keyword: str) -> str:
+        """normalize keywords and queries for search"""
+        return slugify(keyword, separator=" ")
+
+    @staticmethod
+    def trigrams(text: str) -> Set[str]:
+        """trigrams of the normalized text,
+        the text itself if shorter than three characters
+        """
+        if len(text) < 3:
+            return {text} if text else set()
+        return {text[i : i + 3] for i in range(len(text) - 2)}
+
+    def prefix(self, keyword: str) -> str:
+        prefix = slugify(self.normalize(keyword)[: self.prefix_length])
+        return prefix or "_"
+
+    def shard_id(self, entry: Dict) -> str:
+        geo = slugify(entry["geo"] or "") or "_"
+        return f"geo={geo}/prefix={self.prefix(entry['keyword'])}"
+
+    @cached_property
+    def shards(self) -> Dict[str, List[Dict]]:
+        """entries grouped by shard"""
+        shards = defaultdict(list)
+        for entry in self.entries:
+            shards[self.shard_id(entry)].append(entry)
+
+        return dict(sorted(shards.items()))
+
+    @cached_property
+    def manifest(self) -> Dict:
+        """list of shards with their sizes"""
+        return {
+            "prefix_length": self.prefix_length,
+            "shards": [
+                {"id": shard_id, "path": f"{shard_id}/keywords.json", "n": len(v)}
+                for shard_id, v in self.shards.items()
+            ],
+        }
+
+    @cached_property
+    def search_index(self) -> Dict[str, Dict[str, List[int]]]:
+        """prefix and trigram lookup tables
+
+        The shards are referred to by their position in the manifest,
+        to keep the file small.
+        """
+        shard_ids = list(self.shards.keys())
+        shard_positions = {s: i for i, s in enumerate(shard_ids)}
+
+        prefix = defaultdict(set)
+        trigram = defaultdict(set)
+        for entry in self.entries:
+            position = shard_positions[self.shard_id(entry)]
+            prefix[self.prefix(entry["keyword"])].add(position)
+            for t in self.trigrams(self.normalize(entry["keyword"])):
+                trigram[t].add(position)
+
+        return {
+            "prefix": {k: sorted(v) for k, v in sorted(prefix.items())},
+            "trigram": {k: sorted(v) for k, v in sorted(trigram.items())},
+        }
+
+    def lookup(self, query: str, geo: Optional[str] = None) -> List[str]:
+        """shards to be downloaded for a query, as a client would do
+
+        Queries shorter than three characters only match
+        the beginning of the keywords.
+
+        :param query: part of the keyword
+        :param geo: only keep shards of this geo
+        """
+        shard_ids = list(self.shards.keys())
+        normalized = self.normalize(query)
+
+        if not normalized:
+            positions = set(range(len(shard_ids)))
+        elif len(normalized) < 3:
+            query_prefix = slugify(normalized)
+            positions = set().union(
+                *[
+                    v
+                    for k, v in self.search_index["prefix"].items()
+                    if k.startswith(query_prefix) or query_prefix.startswith(k)
+                ]
+            )
+        else:
+            positions = set.intersection(
+                *[
+                    set(self.search_index["trigram"].get(g, []))
+                    for g in self.trigrams(normalized)
+                ]
+            )
+
+        shards = [shard_ids[i] for i in sorted(positions)]
+        if geo is not None:
+            shards = [s for s in shards if s.startswith(f"geo={slugify(geo)}/")]
+
+        return shards
+
+    def save(
+        self,
+        index_folder: AnyPath,
+        content_encoding: Optional[Literal["gzip", "br"]] = None,
+        cache_control: Optional[str] = None,
+    ):
+        """Save the shards, the manifest and the search index
+
+        :param index_folder: folder to hold the index files
+        :param content_encoding: compress the files with `gzip` or `br`
+        :param cache_control: `Cache-Control` header of the files on S3
+        """
+        files = {
+            f"{shard_id}/keywords.json": entries
+            for shard_id, entries in self.shards.items()
+        }
+        files["manifest.json"] = self.manifest
+        files["search.json"] = self.search_index
+
+        logger.info(f"Saving {len(files)} index files to {index_folder} ...")
+        for name, content in files.items():
+            target_path = index_folder / name
+            if isinstance(target_path, Path):
+                target_path.parent.mkdir(parents=True, exist_ok=True)
+            write_object(
+                target_path=target_path,
+                body=json.dumps(content, separators=(",", ":")).encode("utf-8"),
+                content_type="application/json",
+                content_encoding=content_encoding,
+                cache_control=cache_control,
+            )
@@ -0,0 +1,204 @@
+import json
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from cloudpathlib import AnyPath
+from loguru import logger
+from slugify import slugify
+
+from sm_trendy.utilities.schema import format_dates
+from sm_trendy.utilities.storage import decompress
+
+
+class SeriesPyramid:
+    """
+    Precomputed coarser resolutions of many trend series at once
+
+    The website zooms out of a series by showing monthly or quarterly
+    means, and shows a tiny sparkline next to each keyword. Instead of
+    resampling each series on the fly, the levels are computed here
+    with a single groupby over a long dataframe holding all series.
+
+    The input is a long dataframe with one row per point,
+
+    | series_id | query | date | extracted_value |
+    |---|---|---|---|
+    | keyword=curtain/cat=0/geo=de/timeframe=today-5-y | curtain | 2018-07-29 | 14 |
+
+    and the levels are
+
+    - `monthly`: mean of the values per calendar month,
+    - `quarterly`: mean of the values per calendar quarter,
+    - `sparkline`: the series cut into `sparkline_size` consecutive
+      buckets of (almost) equal length, with the rounded mean of each
+      bucket. Series shorter than `sparkline_size` are kept as is.
+
+    :param sparkline_size: number of points of the sparklines
+    :param id_column: column that identifies the series
+    :param query_column: column of the query
+    :param date_column: column of the dates
+    :param value_column: column of the values
+    """
+
+    levels = {"monthly": "M", "quarterly": "Q"}
+
+    def __init__(
+        self,
+        sparkline_size: int = 32,
+        id_column: str = "series_id",
+        query_column: str = "query",
+        date_column: str = "date",
+        value_column: str = "extracted_value",
+    ):
+        if sparkline_size < 1:
+            raise ValueError(f"sparkline_size should be positive: {sparkline_size}")
+        self.sparkline_size = sparkline_size
+        self.id_column = id_column
+        self.query_column = query_column
+        self.date_column = date_column
+        self.value_column = value_column
+
+    def __call__(self, dataframe: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        Compute all levels
+
+        :param dataframe: long dataframe of all series
+        :return: dataframes of the levels, with the columns
+            `series_id`, `query`, `date`, `value` for the resampled levels
+            and `series_id`, `position`, `value` for the sparklines
+        """
+        df = dataframe[
+            [self.id_column, self.query_column, self.date_column, self.value_column]
+        ].sort_values(by=[self.id_column, self.date_column], kind="stable")
+
+        levels = {
+            level: self.resample(df, freq=freq) for level, freq in self.levels.items()
+        }
+        levels["sparkline"] = self.sparkline(df)
+
+        return levels
+
+    def resample(self, dataframe: pd.DataFrame, freq: str) -> pd.DataFrame:
+        """mean of the values per calendar period, for all series
+
+        :param dataframe: long dataframe of all series
+        :param freq: pandas period frequency, e.g., `M` or `Q`
+        """
+        periods = pd.to_datetime(dataframe[self.date_column]).dt.to_period(freq)
+
+        df = (
+            dataframe.assign(**{self.date_column: periods.dt.start_time})
+            .groupby(
+                [self.id_column, self.query_column, self.date_column],
+                observed=True,
+                sort=True,
+            )[self.value_column]
+            .mean()
+            .round(2)
+            .reset_index()
+        )
+
+        return df.rename(
+            columns={
+                self.id_column: "series_id",
+                self.query_column: "query",
+                self.date_column: "date",
+                self.value_column: "value",
+            }
+        )
+
+    def sparkline(self, dataframe: pd.DataFrame) -> pd.DataFrame:
+        """fixed size sparklines of all series,
+        the dataframe should be sorted by date within each series
+
+        :param dataframe: long dataframe of all series
+        """
+        grouped = dataframe.groupby(self.id_column, observed=True, sort=False)
+        position = grouped.cumcount().values
+        length = grouped[self.value_column].transform("size").values
+        bucket = position * np.minimum(length, self.sparkline_size) // length
+
+        df = (
+            pd.DataFrame(
+                {
+                    "series_id": dataframe[self.id_column].values,
+                    "position": bucket,
+                    "value": dataframe[self.value_column].values.astype("float64"),
+                }
+            )
+            .groupby(["series_id", "position"], observed=True, sort=True)["value"]
+            .mean()
+            .round()
+            .astype("int64")
+            .reset_index()
+        )
+
+        return df
+
+    @staticmethod
+    def to_json_bytes(level: pd.DataFrame) -> Dict[str, bytes]:
+        """
+        Serialize a resampled level as one JSON array of records per series,
+        in the same shape as [`AggAPIJSON`][sm_trendy.aggregate.agg.AggAPIJSON]
+
+        :param level: resampled level, e.g., `monthly`
+        """
+        df = level.assign(date=format_dates(level["date"]))
+
+        return {
+            str(series_id): g[["query", "value", "date"]]
+            .to_json(orient="records")
+            .encode("utf-8")
+            for series_id, g in df.groupby("series_id", observed=True, sort=False)
+        }
+
+    @staticmethod
+    def to_lists(sparkline: pd.DataFrame) -> Dict[str, List[int]]:
+        """sparkline values per series
+
+        :param sparkline: the `sparkline` level
+        """
+        return {
+            str(k): v
+            for k, v in sparkline.groupby("series_id", observed=True, sort=False)[
+                "value"
+            ]
+            .agg(list)
+            .items()
+        }
+
+
+def sparkline_path(parent_path: AnyPath, serpapi_config_path: AnyPath) -> AnyPath:
+    """
+    Location of the sparklines of all configs in a serpapi config file,
+    saved by [`AggSerpAPIBundle`][sm_trendy.aggregate.agg.AggSerpAPIBundle]
+    and embedded in the metadata by `trendy agg-metadata`.
+
+    :param parent_path: parent folder of the aggregated data
+    :param serpapi_config_path: path of the serpapi config file
+    """
+    return parent_path / "sparklines" / f"{slugify(str(serpapi_config_path))}.json"
+
+
+def load_sparklines(
+    parent_path: AnyPath, serpapi_config_path: AnyPath
+) -> Dict[str, List[int]]:
+    """
+    Load the sparklines of a serpapi config file, keyed by
+    [`PathParams.partition`][sm_trendy.utilities.config.PathParams.partition].
+    An empty dictionary is returned if they were not computed.
+
+    :param parent_path: parent folder of the aggregated data
+    :param serpapi_config_path: path of the serpapi config file
+    """
+    path = sparkline_path(
+        parent_path=parent_path, serpapi_config_path=serpapi_config_path
+    )
+    try:
+        body = path.read_bytes()
+    except FileNotFoundError:
+        logger.warning(f"No sparklines found at {path}")
+        return {}
+
+    return json.loads(decompress(body))
@@ -0,0 +1,348 @@
+import datetime
+import json
+from typing import Dict, List, Literal, Optional, Tuple
+
+import numpy as np
+from cloudpathlib import AnyPath
+from loguru import logger
+from slugify import slugify
+
+from sm_trendy.aggregate.agg import AggSerpAPIBundle
+from sm_trendy.aggregate.stats import SeriesMatrix
+from sm_trendy.utilities.storage import StoreJSON, decompress
+
+Neighbours = Dict[str, List[Tuple[str, float]]]
+
+
+class SimilarSeries:
+    """
+    Top-k most correlated series of each series
+
+    The rows of a [`SeriesMatrix`][sm_trendy.aggregate.stats.SeriesMatrix]
+    are z-normalized into a dense float32 matrix `Z`, with the missing
+    points set to 0 and scaled so that the dot product of two complete
+    rows is their Pearson correlation. The correlations are computed
+    as `Z[block] @ Z.T` for blocks of `block_size` rows, so that the
+    full `n x n` matrix is never held in memory.
+
+    :param k: number of neighbours of each series
+    :param block_size: number of rows in each matrix product
+    """
+
+    def __init__(self, k: int = 10, block_size: int = 1024):
+        self.k = k
+        self.block_size = block_size
+
+    @staticmethod
+    def normalize(values: np.ndarray) -> np.ndarray:
+        """z-normalized rows scaled by the square root of the width,
+        missing points and constant rows are set to 0
+
+        :param values: matrix of the series, one series per row
+        """
+        values = values.astype("float32")
+        valid = ~np.isnan(values)
+        n_valid = valid.sum(axis=1, keepdims=True)
+        filled = np.where(valid, values, 0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = filled.sum(axis=1, keepdims=True) / n_valid
+            centered = np.where(valid, values - mean, 0)
+            std = np.sqrt((centered**2).sum(axis=1, keepdims=True) / n_valid)
+            z = np.where(std > 0, centered / std, 0)
+
+        return (z / np.sqrt(max(values.shape[1], 1))).astype("float32")
+
+    def top_k(
+        self, z: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Neighbours of the selected rows among all rows
+
+        :param z: normalized matrix
+        :param rows: positions of the rows to compute, all rows by default
+        :return: the correlations of the selected rows with all rows,
+            and the positions and correlations of the top-k neighbours,
+            sorted by decreasing correlation
+        """
+        if rows is None:
+            rows = np.arange(z.shape[0])
+        k = min(self.k, z.shape[0] - 1)
+
+        correlations = np.empty((len(rows), z.shape[0]), dtype="float32")
+        positions = np.empty((len(rows), max(k, 0)), dtype="int64")
+        scores = np.empty((len(rows), max(k, 0)), dtype="float32")
+        for start in range(0, len(rows), self.block_size):
+            block = rows[start : start + self.block_size]
+            c = z[block] @ z.T
+            correlations[start : start + len(block)] = c
+            if k <= 0:
+                continue
+
+            c = c.copy()
+            c[np.arange(len(block)), block] = -np.inf
+            top = np.argpartition(-c, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(c, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            positions[start : start + len(block)] = np.take_along_axis(
+                top, order, axis=1
+            )
+            scores[start : start + len(block)] = np.take_along_axis(
+                top_scores, order, axis=1
+            )
+
+        return correlations, positions, scores
+
+    def __call__(
+        self,
+        matrix: SeriesMatrix,
+        changed: Optional[List[str]] = None,
+        previous: Optional[Neighbours] = None,
+    ) -> Neighbours:
+        """
+        Neighbours of all series
+
+        If `changed` and `previous` are given, only the rows of the
+        changed series are recomputed. The lists of the other series
+        keep their previous neighbours that did not change, and are
+        merged with their correlations to the changed series, which
+        are read from the same matrix products. An unchanged series
+        can thus only gain a changed series as neighbour; a series that
+        was not in its previous top-k is picked up by a full recomputation.
+
+        :param matrix: matrix of the series
+        :param changed: ids of the series whose data changed
+        :param previous: neighbours from a previous run
+        """
+        ids = matrix.ids.tolist()
+        z = self.normalize(matrix.values)
+
+        if changed is None or previous is None:
+            rows = np.arange(len(ids))
+        else:
+            changed_ids = set(changed) | {i for i in ids if i not in previous}
+            rows = np.array([p for p, i in enumerate(ids) if i in changed_ids])
+        logger.debug(f"Computing neighbours of {len(rows)} / {len(ids)} series")
+
+        neighbours = {}
+        if len(rows):
+            correlations, positions, scores = self.top_k(z, rows=rows)
+            for r, p, s in zip(rows, positions, scores):
+                neighbours[ids[r]] = [
+                    (ids[q], round(float(v), 4)) for q, v in zip(p, s)
+                ]
+        else:
+            correlations = np.empty((0, len(ids)), dtype="float32")
+
+        if len(neighbours) == len(ids):
+            return neighbours
+
+        # update the unchanged series with their correlations to the changed ones
+        current = set(ids)
+        changed_ids = [ids[r] for r in rows]
+        recomputed = set(changed_ids)
+        for p, i in enumerate(ids):
+            if i in recomputed:
+                continue
+            candidates = [
+                (j, s) for j, s in previous[i] if j in current and j not in recomputed
+            ] + [
+                (j, round(float(correlations[c, p]), 4))
+                for c, j in enumerate(changed_ids)
+            ]
+            neighbours[i] = sorted(candidates, key=lambda x: -x[1])[: self.k]
+
+        return {i: neighbours[i] for i in ids}
+
+
+class AggSimilarKeywords:
+    """
+    Index of the most similar keywords of each keyword,
+    for "keywords trending like this one"
+
+    The latest downloaded series are grouped per geo and timeframe,
+    and the neighbours of each series are computed with
+    [`SimilarSeries`][sm_trendy.aggregate.similar.SimilarSeries].
+    One index is published for each group,
+
+    ```
+    parent_path / "similar" / "geo=de" / "timeframe=today-5-y"
+        / "format=json" / "snapshot_date=latest" / "data.json"
+    ```
+
+    ```json
+    {
+        "k": 10,
+        "series": ["keyword=curtain/cat=0/geo=de/timeframe=today-5-y", ...],
+        "snapshot_dates": ["2023-07-31", ...],
+        "neighbours": [[3, 7], ...],
+        "scores": [[0.93, 0.81], ...]
+    }
+    ```
+
+    where the series are identified by
+    [`PathParams.partition`][sm_trendy.utilities.config.PathParams.partition],
+    and the neighbours refer to the positions in `series`.
+
+    The index is updated incrementally: only the series whose
+    snapshot date differs from the one in the latest index are
+    recomputed, see [`SimilarSeries`][sm_trendy.aggregate.similar.SimilarSeries].
+    Groups without any change are not written again.
+
+    :param parent_path: parent folder of the aggregated data
+    :param k: number of neighbours of each keyword
+    :param block_size: number of rows in each matrix product
+    :param content_encoding: upload the json files precompressed
+        with `gzip` or `br`
+    :param cache_control: `Cache-Control` header of the json files on S3
+    """
+
+    def __init__(
+        self,
+        parent_path: AnyPath,
+        k: int = 10,
+        block_size: int = 1024,
+        content_encoding: Optional[Literal["gzip", "br"]] = None,
+        cache_control: Optional[str] = None,
+    ):
+        self.parent_path = parent_path
+        self.k = k
+        self.block_size = block_size
+        self.content_encoding = content_encoding
+        self.cache_control = cache_control
+
+    def target_folder(self, geo: str, timeframe: str) -> AnyPath:
+        return (
+            self.parent_path
+            / "similar"
+            / f"geo={slugify(geo)}"
+            / f"timeframe={slugify(timeframe)}"
+        )
+
+    def __call__(
+        self, serpapi_config_paths: List[AnyPath], full: bool = False
+    ) -> Dict[Tuple[str, str], Dict]:
+        """
+        Update the indexes of all groups
+
+        :param serpapi_config_paths: paths of the serpapi config files
+        :param full: recompute all series, ignoring the previous indexes
+        :return: the updated indexes, keyed by geo and timeframe
+        """
+        agg_bundle = AggSerpAPIBundle(parent_path=self.parent_path)
+        inputs = []
+        for serpapi_config_path in serpapi_config_paths:
+            logger.info(f"Loading {serpapi_config_path}")
+            inputs.extend(agg_bundle.load(serpapi_config_path))
+
+        groups = {}
+        for c_input in inputs:
+            c_path_params = c_input[0]
+            groups.setdefault(
+                (c_path_params.geo, c_path_params.timeframe), {}
+            ).setdefault(c_path_params.partition, c_input)
+
+        indexes = {}
+        for (geo, timeframe), g_inputs in sorted(groups.items()):
+            index = self.update(
+                geo=geo, timeframe=timeframe, inputs=list(g_inputs.values()), full=full
+            )
+            if index is not None:
+                indexes[(geo, timeframe)] = index
+
+        return indexes
+
+    def update(
+        self, geo: str, timeframe: str, inputs: List, full: bool = False
+    ) -> Optional[Dict]:
+        """
+        Update the index of a group
+
+        :param geo: geo of the group
+        :param timeframe: timeframe of the group
+        :param inputs: path params, snapshot date, target folder
+            and raw dataframe of each series in the group
+        :param full: recompute all series, ignoring the previous index
+        :return: the index, `None` if nothing changed
+        """
+        target_folder = self.target_folder(geo=geo, timeframe=timeframe)
+        snapshot_dates = {
+            c_path_params.partition: c_snapshot_date
+            for c_path_params, c_snapshot_date, _, _ in inputs
+        }
+
+        previous = None if full else self.load(target_folder)
+        if previous is not None and previous.get("k") != self.k:
+            logger.info(f"k changed in {target_folder}, recompute all series")
+            previous = None
+        changed = None
+        if previous is not None:
+            previous_snapshot_dates = dict(
+                zip(previous["series"], previous["snapshot_dates"])
+            )
+            changed = [
+                i
+                for i, d in snapshot_dates.items()
+                if previous_snapshot_dates.get(i) != d
+            ]
+            if not changed and set(previous["series"]) == set(snapshot_dates):
+                logger.info(f"No changes in {target_folder}, skip")
+                return None
+
+        logger.info(f"Updating {target_folder} ...")
+        matrix = SeriesMatrix(AggSerpAPIBundle._concat(inputs))
+        neighbours = SimilarSeries(k=self.k, block_size=self.block_size)(
+            matrix,
+            changed=changed,
+            previous=None if previous is None else self._neighbours(previous),
+        )
+
+        index = self._index(neighbours, snapshot_dates)
+        snapshot_date = datetime.date.fromisoformat(max(snapshot_dates.values()))
+        for c_snapshot_date in [snapshot_date, "latest"]:
+            store_json = StoreJSON(
+                target_folder=target_folder,
+                snapshot_date=c_snapshot_date,
+                content_encoding=self.content_encoding,
+                cache_control=self.cache_control,
+            )
+            store_json.save(
+                records=json.dumps(index, separators=(",", ":")).encode("utf-8"),
+                formats=["json"],
+            )
+
+        return index
+
+    def _index(self, neighbours: Neighbours, snapshot_dates: Dict[str, str]) -> Dict:
+        series = list(neighbours.keys())
+        positions = {i: p for p, i in enumerate(series)}
+
+        return {
+            "k": self.k,
+            "series": series,
+            "snapshot_dates": [snapshot_dates[i] for i in series],
+            "neighbours": [[positions[j] for j, _ in neighbours[i]] for i in series],
+            "scores": [[s for _, s in neighbours[i]] for i in series],
+        }
+
+    @staticmethod
+    def _neighbours(index: Dict) -> Neighbours:
+        series = index["series"]
+        return {
+            i: [(series[p], s) for p, s in zip(positions, scores)]
+            for i, positions, scores in zip(
+                series, index["neighbours"], index["scores"]
+            )
+        }
+
+    @staticmethod
+    def load(target_folder: AnyPath) -> Optional[Dict]:
+        """load the latest index of a group, `None` if it does not exist
+
+        :param target_folder: folder of the index of the group
+        """
+        path = target_folder / "format=json" / "snapshot_date=latest" / "data.json"
+        try:
+            return json.loads(decompress(path.read_bytes()))
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,389 @@
+import datetime
+import warnings
+from functools import cached_property
+from types import SimpleNamespace
+from typing import Dict, List, Literal, Optional
+
+import numpy as np
+import pandas as pd
+from cloudpathlib import AnyPath
+from loguru import logger
+
+from sm_trendy.aggregate.agg import AggSerpAPIBundle
+from sm_trendy.utilities.schema import format_dates
+from sm_trendy.utilities.storage import StoreDataFrame, StoreJSON
+
+
+class SeriesMatrix:
+    """
+    Dense matrix of many series, one row per series
+
+    The series are aligned on their last point: the last column holds
+    the latest value of every series, the column before the value one
+    step earlier, and so on. Shorter series are padded with `NaN` on
+    the left. This way, series downloaded on different days can be
+    compared at the same lags.
+
+    !!! note
+        The series should have the same resolution, e.g., be
+        weekly series of the same timeframe, without gaps.
+
+    :param dataframe: long dataframe of all series
+    :param id_column: column that identifies the series
+    :param date_column: column of the dates
+    :param value_column: column of the values
+    :param dtype: dtype of the values in the matrix
+    """
+
+    def __init__(
+        self,
+        dataframe: pd.DataFrame,
+        id_column: str = "series_id",
+        date_column: str = "date",
+        value_column: str = "extracted_value",
+        dtype: str = "float32",
+    ):
+        self.dataframe = dataframe
+        self.id_column = id_column
+        self.date_column = date_column
+        self.value_column = value_column
+        self.dtype = dtype
+
+    @cached_property
+    def _layout(self):
+        codes, ids = pd.factorize(self.dataframe[self.id_column], sort=True)
+        dates = self.dataframe[self.date_column].to_numpy(dtype="datetime64[ns]")
+        order = np.lexsort((dates, codes))
+        codes = codes[order]
+
+        lengths = np.bincount(codes, minlength=len(ids))
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        width = int(lengths.max()) if len(lengths) else 0
+        columns = width - lengths[codes] + np.arange(len(codes)) - starts[codes]
+
+        return SimpleNamespace(
+            ids=pd.Index(np.asarray(ids), name=self.id_column),
+            order=order,
+            rows=codes,
+            columns=columns,
+            shape=(len(ids), width),
+        )
+
+    @property
+    def ids(self) -> pd.Index:
+        """ids of the series, in the order of the rows"""
+        return self._layout.ids
+
+    @cached_property
+    def values(self) -> np.ndarray:
+        """values of the series, `NaN` padded on the left"""
+        layout = self._layout
+        values = np.full(layout.shape, np.nan, dtype=self.dtype)
+        values[layout.rows, layout.columns] = self.dataframe[
+            self.value_column
+        ].to_numpy(dtype=self.dtype)[layout.order]
+
+        return values
+
+    @cached_property
+    def dates(self) -> np.ndarray:
+        """dates of the values, `NaT` padded on the left"""
+        layout = self._layout
+        dates = np.full(layout.shape, np.datetime64("NaT"), dtype="datetime64[ns]")
+        dates[layout.rows, layout.columns] = self.dataframe[self.date_column].to_numpy(
+            dtype="datetime64[ns]"
+        )[layout.order]
+
+        return dates
+
+    @cached_property
+    def step(self) -> Optional[pd.Timedelta]:
+        """median spacing of consecutive points, e.g., 7 days for
+        weekly series, `None` if no series has two points"""
+        deltas = np.diff(self.dates, axis=1)
+        deltas = deltas[~np.isnat(deltas)]
+        if not len(deltas):
+            return None
+
+        return pd.Timedelta(int(np.median(deltas.astype("int64"))), unit="ns")
+
+
+class TrendStats:
+    """
+    Summary statistics of many weekly series, computed on a
+    [`SeriesMatrix`][sm_trendy.aggregate.stats.SeriesMatrix] at once
+
+    | column | description |
+    |---|---|
+    | `latest_date`, `latest_value` | last point of the series |
+    | `peak_date`, `peak_value` | highest point of the series, the earliest one if tied |
+    | `yoy_growth` | mean of the last 4 weeks relative to the same 4 weeks a year before, minus 1 |
+    | `momentum_4w` | mean of the last 4 weeks relative to the 4 weeks before, minus 1 |
+    | `momentum_12w` | mean of the last 12 weeks relative to the 12 weeks before, minus 1 |
+    | `seasonality_strength` | share of the variance explained by the average yearly profile, between 0 and 1 |
+
+    The relative changes are `NaN` if the reference mean is 0 or the
+    series is too short. For the seasonality, the last full years of
+    the series are cut into years, the mean of each year is removed,
+    and the yearly profile is the mean over the years for each week.
+    At least two years with data are required.
+
+    :param weeks_per_year: number of points in a year
+    """
+
+    def __init__(self, weeks_per_year: int = 52):
+        self.weeks_per_year = weeks_per_year
+
+    def __call__(self, matrix: SeriesMatrix) -> pd.DataFrame:
+        values = matrix.values
+        dates = matrix.dates
+        rows = np.arange(values.shape[0])
+        peak = np.where(np.isnan(values), -np.inf, values).argmax(axis=1)
+
+        stats = pd.DataFrame(
+            {
+                "latest_date": dates[:, -1],
+                "latest_value": values[:, -1],
+                "peak_date": dates[rows, peak],
+                "peak_value": values[rows, peak],
+                "yoy_growth": self.relative_change(
+                    self.window_mean(values, n=4),
+                    self.window_mean(values, n=4, lag=self.weeks_per_year),
+                ),
+                "momentum_4w": self.relative_change(
+                    self.window_mean(values, n=4), self.window_mean(values, n=4, lag=4)
+                ),
+                "momentum_12w": self.relative_change(
+                    self.window_mean(values, n=12),
+                    self.window_mean(values, n=12, lag=12),
+                ),
+                "seasonality_strength": self.seasonality_strength(values),
+            },
+            index=matrix.ids,
+        )
+        float_columns = stats.select_dtypes(include="floating").columns
+
+        return stats.astype({c: "float64" for c in float_columns}).round(4)
+
+    @staticmethod
+    def window_mean(values: np.ndarray, n: int, lag: int = 0) -> np.ndarray:
+        """mean of `n` consecutive points, ending `lag` points before the last one
+
+        :param values: right-aligned matrix of the series
+        :param n: number of points in the window
+        :param lag: number of points between the window and the end
+        """
+        width = values.shape[1]
+        if n + lag > width:
+            return np.full(values.shape[0], np.nan)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            return np.nanmean(values[:, width - lag - n : width - lag], axis=1)
+
+    @staticmethod
+    def relative_change(recent: np.ndarray, reference: np.ndarray) -> np.ndarray:
+        """`recent / reference - 1`, `NaN` if the reference is not positive"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(reference > 0, recent / reference - 1, np.nan)
+
+    def seasonality_strength(self, values: np.ndarray) -> np.ndarray:
+        """share of the variance explained by the average yearly profile
+
+        :param values: right-aligned matrix of the series
+        """
+        n_years = values.shape[1] // self.weeks_per_year
+        if n_years < 2:
+            return np.full(values.shape[0], np.nan)
+
+        years = values[:, -n_years * self.weeks_per_year :].reshape(
+            values.shape[0], n_years, self.weeks_per_year
+        )
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            detrended = years - np.nanmean(years, axis=2, keepdims=True)
+            residual = detrended - np.nanmean(detrended, axis=1, keepdims=True)
+            total = np.nanvar(detrended.reshape(values.shape[0], -1), axis=1)
+            unexplained = np.nanvar(residual.reshape(values.shape[0], -1), axis=1)
+
+        n_valid_years = (~np.isnan(years)).any(axis=2).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            strength = np.where(
+                (total > 0) & (n_valid_years >= 2), 1 - unexplained / total, np.nan
+            )
+
+        return np.clip(strength, 0, 1)
+
+
+class AggTrendStats:
+    """
+    Statistics table of all keywords in the aggregation config
+
+    The latest downloaded series of all configs are loaded, and the
+    statistics of [`TrendStats`][sm_trendy.aggregate.stats.TrendStats]
+    are computed for each timeframe at once. The statistics are defined
+    on weekly points, only the timeframes with weekly series, e.g.,
+    `today 5-y` or `today 12-m`, are included. Two tables are published
+    next to the aggregated data,
+
+    ```
+    parent_path / "stats" / "format=parquet" / "snapshot_date=2023-07-31" / "data.parquet"
+    parent_path / "stats" / "format=json" / "snapshot_date=latest" / "data.json"
+    parent_path / "top_movers" / "format=json" / "snapshot_date=latest" / "data.json"
+    ```
+
+    where the snapshot date is the latest snapshot of the series.
+    The top movers are the keywords with the highest positive
+    (`rising`) and the lowest negative (`falling`) 4-week momentum
+    in each geo and timeframe,
+
+    ```json
+    {"DE": {"today 5-y": {"rising": [...], "falling": [...]}}}
+    ```
+
+    :param parent_path: parent folder of the aggregated data
+    :param top_n: number of keywords in each top movers list
+    :param content_encoding: upload the json files precompressed
+        with `gzip` or `br`
+    :param cache_control: `Cache-Control` header of the json files on S3
+    """
+
+    def __init__(
+        self,
+        parent_path: AnyPath,
+        top_n: int = 10,
+        content_encoding: Optional[Literal["gzip", "br"]] = None,
+        cache_control: Optional[str] = None,
+    ):
+        self.parent_path = parent_path
+        self.top_n = top_n
+        self.content_encoding = content_encoding
+        self.cache_control = cache_control
+
+    def __call__(self, serpapi_config_paths: List[AnyPath]) -> pd.DataFrame:
+        stats = self.stats(serpapi_config_paths=serpapi_config_paths)
+        if stats.empty:
+            logger.warning("No series found, skip saving stats")
+            return stats
+
+        self.save(stats)
+
+        return stats
+
+    def stats(self, serpapi_config_paths: List[AnyPath]) -> pd.DataFrame:
+        """
+        Compute the statistics table
+
+        :param serpapi_config_paths: paths of the serpapi config files
+        """
+        agg_bundle = AggSerpAPIBundle(parent_path=self.parent_path)
+        inputs = []
+        for serpapi_config_path in serpapi_config_paths:
+            logger.info(f"Loading {serpapi_config_path}")
+            inputs.extend(agg_bundle.load(serpapi_config_path))
+
+        if not inputs:
+            return pd.DataFrame()
+
+        keywords = pd.DataFrame(
+            [
+                {
+                    "series_id": c_path_params.partition,
+                    "keyword": c_path_params.keyword,
+                    "cat": c_path_params.cat,
+                    "geo": c_path_params.geo,
+                    "timeframe": c_path_params.timeframe,
+                    "snapshot_date": c_snapshot_date,
+                }
+                for c_path_params, c_snapshot_date, _, _ in inputs
+            ]
+        ).drop_duplicates(subset="series_id")
+        series = AggSerpAPIBundle._concat(inputs)
+        timeframes = keywords.set_index("series_id")["timeframe"]
+
+        logger.info(f"Computing stats of {len(keywords)} series")
+        stats = []
+        for timeframe, g in series.groupby(
+            series["series_id"].map(timeframes).astype(str), sort=True
+        ):
+            matrix = SeriesMatrix(g)
+            if matrix.step != pd.Timedelta(weeks=1):
+                logger.warning(
+                    f"Skip stats of timeframe {timeframe}: "
+                    f"points are {matrix.step} apart, not weekly"
+                )
+                continue
+            stats.append(TrendStats()(matrix))
+
+        if not stats:
+            return pd.DataFrame()
+
+        return keywords.merge(pd.concat(stats), left_on="series_id", right_index=True)
+
+    def top_movers(
+        self, stats: pd.DataFrame
+    ) -> Dict[str, Dict[str, Dict[str, List[Dict]]]]:
+        """
+        Keywords with the highest positive and the lowest negative
+        4-week momentum per geo and timeframe
+
+        :param stats: the statistics table
+        """
+        columns = ["keyword", "series_id", "momentum_4w", "yoy_growth", "latest_value"]
+        movers = stats.dropna(subset=["momentum_4w"]).sort_values(
+            by=["momentum_4w", "series_id"], ascending=[False, True], kind="stable"
+        )
+
+        top_movers: Dict[str, Dict[str, Dict[str, List[Dict]]]] = {}
+        for (geo, timeframe), g in movers.groupby(["geo", "timeframe"], sort=True):
+            rising = g[g["momentum_4w"] > 0]
+            falling = g[g["momentum_4w"] < 0].iloc[::-1]
+            top_movers.setdefault(geo, {})[timeframe] = {
+                "rising": self._records(rising.head(self.top_n)[columns]),
+                "falling": self._records(falling.head(self.top_n)[columns]),
+            }
+
+        return top_movers
+
+    def save(self, stats: pd.DataFrame):
+        """
+        Save the statistics table as parquet and json,
+        and the top movers as json
+
+        :param stats: the statistics table
+        """
+        snapshot_date = datetime.date.fromisoformat(stats["snapshot_date"].max())
+        stats_folder = self.parent_path / "stats"
+
+        logger.info(f"Saving stats to {stats_folder} ...")
+        sdf = StoreDataFrame(target_folder=stats_folder, snapshot_date=snapshot_date)
+        sdf.save(
+            SimpleNamespace(
+                dataframe=stats.reset_index(drop=True),
+                metadata={"n_series": len(stats)},
+            ),
+            formats=["parquet"],
+        )
+
+        payloads = {
+            stats_folder: self._records(stats),
+            self.parent_path / "top_movers": self.top_movers(stats),
+        }
+        for target_folder, records in payloads.items():
+            for c_snapshot_date in [snapshot_date, "latest"]:
+                store_json = StoreJSON(
+                    target_folder=target_folder,
+                    snapshot_date=c_snapshot_date,
+                    content_encoding=self.content_encoding,
+                    cache_control=self.cache_control,
+                )
+                store_json.save(records=records, formats=["json"])
+
+    @staticmethod
+    def _records(dataframe: pd.DataFrame) -> List[Dict]:
+        """json compatible records, with `NaN` as `null` and iso dates"""
+        df = dataframe.copy()
+        for c in df.select_dtypes(include="datetime").columns:
+            df[c] = format_dates(df[c])
+
+        return df.astype(object).where(df.notna(), None).to_dict(orient="records")
@@ -0,0 +1,234 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from typing import Dict, List, Literal, Optional, Tuple, Union
+
+import pandas as pd
+from cloudpathlib import AnyPath
+from loguru import logger
+from slugify import slugify
+
+from sm_trendy.aggregate.agg import DownloadedLoader
+from sm_trendy.utilities.cache import LRUCache
+from sm_trendy.utilities.config import PathParams
+
+Snapshot = Optional[Union[datetime.date, str]]
+
+
+class TrendStore:
+    """
+    Query the downloaded trends without building paths by hand
+
+    ```python
+    store = TrendStore(parent_folder="s3://sm-google-trend/serpapi")
+    store.list_keywords(geo="DE")
+    store.get_series("phone case", geo="DE", timeframe="today 5-y")
+    store.get_many(["phone case", "curtain"], geo="DE", timeframe="today 5-y")
+    ```
+
+    The folders of the downloaded data are listed once into an
+    in-memory catalog of the snapshot dates of each series, see
+    [`catalog`][sm_trendy.aggregate.store.TrendStore.catalog], so
+    that finding a snapshot does not require listing S3. Call
+    [`refresh`][sm_trendy.aggregate.store.TrendStore.refresh]
+    to pick up new downloads.
+
+    The decoded series are kept in an LRU cache, and the series of
+    [`get_many`][sm_trendy.aggregate.store.TrendStore.get_many]
+    are read concurrently.
+
+    !!! note
+        The keywords, cat, geo and timeframe are slugified in
+        the folder names, e.g., `phone case` is `phone-case` in
+        the catalog. They can be passed either way to the queries.
+
+    :param parent_folder: parent folder of the downloaded data
+    :param from_format: which format of the downloaded data to read
+    :param cache_size: maximum number of decoded series in the cache
+    :param max_workers: number of concurrent reads
+    """
+
+    def __init__(
+        self,
+        parent_folder: AnyPath,
+        from_format: Literal["csv", "parquet", "feather", "delta"] = "csv",
+        cache_size: int = 256,
+        max_workers: int = 8,
+    ):
+        if not isinstance(parent_folder, AnyPath):
+            parent_folder = AnyPath(parent_folder)
+        self.parent_folder = parent_folder
+        self.from_format = from_format
+        self.max_workers = max_workers
+        self.cache = LRUCache(maxsize=cache_size)
+        self.loader = DownloadedLoader(
+            parent_folder=parent_folder, from_format=from_format
+        )
+
+    @cached_property
+    def catalog(self) -> Dict[str, List[str]]:
+        """snapshot dates of each series, keyed by
+        [`PathParams.partition`][sm_trendy.utilities.config.PathParams.partition]
+        """
+        pattern = (
+            f"keyword=*/cat=*/geo=*/timeframe=*/format={self.from_format}"
+            "/snapshot_date=*"
+        )
+        catalog: Dict[str, List[str]] = {}
+        for path in self.parent_folder.glob(pattern):
+            parts = path.relative_to(self.parent_folder).parts
+            if len(parts) != 6 or not parts[5].startswith("snapshot_date="):
+                continue
+            catalog.setdefault("/".join(parts[:4]), []).append(
+                parts[5].split("=", 1)[1]
+            )
+
+        logger.debug(f"{len(catalog)} series in {self.parent_folder}")
+
+        return {k: sorted(set(v)) for k, v in sorted(catalog.items())}
+
+    def refresh(self):
+        """list the downloaded data again and clear the cache"""
+        self.__dict__.pop("catalog", None)
+        self.cache.clear()
+
+    def list_keywords(
+        self,
+        keyword: Optional[str] = None,
+        cat: Optional[str] = None,
+        geo: Optional[str] = None,
+        timeframe: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Series in the catalog
+
+        :param keyword: only keywords that contain this text
+        :param cat: only this category
+        :param geo: only this geo
+        :param timeframe: only this timeframe
+        :return: one row per series, with the slugified `keyword`,
+            `cat`, `geo`, `timeframe`, the `latest_snapshot_date`
+            and the number of snapshots `n_snapshots`
+        """
+        columns = ["keyword", "cat", "geo", "timeframe"]
+        rows = [
+            dict(p.split("=", 1) for p in partition.split("/"))
+            | {
+                "latest_snapshot_date": snapshot_dates[-1],
+                "n_snapshots": len(snapshot_dates),
+            }
+            for partition, snapshot_dates in self.catalog.items()
+        ]
+        df = pd.DataFrame(
+            rows, columns=columns + ["latest_snapshot_date", "n_snapshots"]
+        )
+
+        if keyword is not None:
+            df = df.loc[df["keyword"].str.contains(slugify(keyword), regex=False)]
+        for column, value in zip(columns[1:], [cat, geo, timeframe]):
+            if value is not None:
+                df = df.loc[df[column] == slugify(value)]
+
+        return df.reset_index(drop=True)
+
+    def snapshot_date(self, path_params: PathParams, snapshot: Snapshot = None) -> str:
+        """
+        Resolve a snapshot of a series from the catalog
+
+        :param path_params: keyword, cat, geo and timeframe of the series
+        :param snapshot: date of the snapshot, the latest by default
+        :raises KeyError: if the series or the snapshot is not in the catalog
+        """
+        snapshot_dates = self.catalog.get(path_params.partition)
+        if not snapshot_dates:
+            raise KeyError(f"No {self.from_format} data for {path_params.partition}")
+
+        if snapshot is None or snapshot == "latest":
+            return snapshot_dates[-1]
+
+        if isinstance(snapshot, datetime.date):
+            snapshot = snapshot.isoformat()
+        if snapshot not in snapshot_dates:
+            raise KeyError(f"No snapshot {snapshot} for {path_params.partition}")
+
+        return snapshot
+
+    def get_series(
+        self,
+        keyword: str,
+        geo: str,
+        timeframe: str = "today 5-y",
+        cat: str = "0",
+        snapshot: Snapshot = None,
+    ) -> pd.DataFrame:
+        """
+        Downloaded series of a keyword, following the
+        [`TREND_SCHEMA`][sm_trendy.utilities.schema.TREND_SCHEMA]
+
+        :param keyword: the keyword
+        :param geo: geo of the series
+        :param timeframe: timeframe of the series
+        :param cat: category of the series
+        :param snapshot: date of the snapshot, the latest by default
+        :raises KeyError: if the series or the snapshot is not in the catalog
+        """
+        path_params = PathParams(keyword=keyword, cat=cat, geo=geo, timeframe=timeframe)
+        return self._get(
+            path_params, self.snapshot_date(path_params, snapshot=snapshot)
+        ).copy()
+
+    def get_many(
+        self,
+        keywords: List[str],
+        geo: str,
+        timeframe: str = "today 5-y",
+        cat: str = "0",
+        snapshot: Snapshot = None,
+        value_column: str = "extracted_value",
+    ) -> pd.DataFrame:
+        """
+        Downloaded series of several keywords as a wide dataframe,
+        with one column per keyword, indexed by date
+
+        The series that are not in the cache are read concurrently.
+        Keywords without data are skipped with a warning.
+
+        :param keywords: the keywords
+        :param geo: geo of the series
+        :param timeframe: timeframe of the series
+        :param cat: category of the series
+        :param snapshot: date of the snapshots, the latest by default
+        :param value_column: column of the series to use as values
+        """
+        requests: List[Tuple[str, PathParams, str]] = []
+        for keyword in keywords:
+            path_params = PathParams(
+                keyword=keyword, cat=cat, geo=geo, timeframe=timeframe
+            )
+            try:
+                snapshot_date = self.snapshot_date(path_params, snapshot=snapshot)
+            except KeyError as e:
+                logger.warning(f"Skip {keyword}: {e}")
+                continue
+            requests.append((keyword, path_params, snapshot_date))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            frames = list(executor.map(lambda r: self._get(*r[1:]), requests))
+
+        columns = {
+            keyword: df.set_index("date")[value_column]
+            for (keyword, _, _), df in zip(requests, frames)
+        }
+        if not columns:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name="date"))
+
+        return pd.concat(columns, axis=1).sort_index()
+
+    def _get(self, path_params: PathParams, snapshot_date: str) -> pd.DataFrame:
+        key = (path_params.partition, snapshot_date)
+        df = self.cache.get(key)
+        if df is None:
+            df = self.loader(path_params, snapshot_date=snapshot_date)
+            self.cache.put(key, df)
+
+        return df
@@ -1,8 +1,8 @@
 import datetime
 import json
 import os
-import random
-import time
+from pathlib import Path
+from typing import List, Optional
 
 import click
 from cloudpathlib import AnyPath, S3Path
@@ -14,77 +14,269 @@ from rich.prompt import Prompt
 import sm_trendy.use_pytrends.config as ptc
 import sm_trendy.use_pytrends.get_trends as ptg
 from sm_trendy.aggregate.agg import AggAPIJSON, AggSerpAPIBundle, DownloadedLoader
+from sm_trendy.aggregate.database import ExportDatabase
+from sm_trendy.aggregate.index import KeywordIndex
+from sm_trendy.aggregate.pyramid import load_sparklines
+from sm_trendy.aggregate.similar import AggSimilarKeywords
+from sm_trendy.aggregate.stats import AggTrendStats
 from sm_trendy.manual.config import SerpAPI2Manual
 from sm_trendy.manual.get_trends import ManualDownload
+from sm_trendy.serve.app import create_app
+from sm_trendy.use_pytrends.cookies import DEFAULT_COOKIE_CACHE_PATH, CookieCache
+from sm_trendy.use_pytrends.proxy import ProxyPool
 from sm_trendy.use_serpapi.config import SerpAPIConfigBundle
 from sm_trendy.use_serpapi.get_trends import SerpAPIDownload
 from sm_trendy.utilities.config import ConfigTable
-from sm_trendy.utilities.request import get_random_user_agent
-from sm_trendy.utilities.storage import StoreJSON
+from sm_trendy.utilities.metrics import METRICS
+from sm_trendy.utilities.profiling import Profiler
+from sm_trendy.utilities.rate import AdaptiveRateController
+from sm_trendy.utilities.retry import DeadLetterFile, RetryQueue
+from sm_trendy.utilities.storage import StoreJSON, write_object
 
 load_dotenv()
 
 
 @click.group(invoke_without_command=True)
+@click.option(
+    "--profile",
+    type=click.Choice(["cpu", "memory"]),
+    default=None,
+    help="Profile the command with cProfile (cpu) or tracemalloc (memory)",
+)
+@click.option(
+    "--profile-top",
+    type=int,
+    default=20,
+    show_default=True,
+    help="Number of functions or allocation sites in the profile reports",
+)
+@click.option(
+    "--profile-dir",
+    type=AnyPath,
+    default=Path("profiles"),
+    show_default=True,
+    help="Folder of the profiles of commands without a run report",
+)
 @click.pass_context
-def trendy(ctx):
+def trendy(
+    ctx, profile: Optional[str], profile_top: int, profile_dir: Optional[AnyPath]
+):
+    """Google trends downloads and aggregations
+
+    With `--profile`, the profile of the command is written next to its
+    run report, see [`Profiler`][sm_trendy.utilities.profiling.Profiler],
+    e.g., `trendy --profile cpu agg config.json`.
+    """
     if ctx.invoked_subcommand is None:
         click.echo("Hello {}".format(os.environ.get("USER", "")))
     else:
         click.echo("Loading Service: %s" % ctx.invoked_subcommand)
 
+    if profile is not None and ctx.invoked_subcommand is not None:
+        profiler = Profiler(mode=profile, top_n=profile_top, profile_dir=profile_dir)
+        profiler.start()
+        ctx.call_on_close(lambda: profiler.stop(command=ctx.invoked_subcommand))
+
 
 @trendy.command()
 @click.argument("config-file", type=click.Path(exists=True))
-def download_pytrends(config_file: AnyPath):
-    """Download trends based on the config file
+@click.option(
+    "--proxy",
+    "proxies",
+    type=str,
+    multiple=True,
+    help="Proxy to download through, can be repeated, "
+    "e.g., https://157.245.27.9:3128. A proxy or a proxy file is required",
+)
+@click.option(
+    "--proxy-file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="File with one proxy per line, replaces --proxy",
+)
+@click.option(
+    "--min-interval",
+    type=float,
+    default=30,
+    help="Minimum seconds between two requests through the same proxy",
+)
+@click.option(
+    "--max-interval",
+    type=float,
+    default=600,
+    help="Maximum seconds between two requests through a throttled proxy",
+)
+@click.option(
+    "--max-workers",
+    type=int,
+    default=None,
+    help="Number of concurrent workers, the number of proxies by default",
+)
+@click.option(
+    "--cookie-cache",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=DEFAULT_COOKIE_CACHE_PATH,
+    show_default=True,
+    help="File in which the google cookies are cached",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(1, 5),
+    default=1,
+    show_default=True,
+    help="Keywords sharing geo, timeframe and cat requested together, up to 5. "
+    "Batches save requests, but the values of the less searched keywords "
+    "of a batch lose precision",
+)
+def download_pytrends(
+    config_file: AnyPath,
+    proxies: List[str],
+    proxy_file: Optional[str],
+    min_interval: float,
+    max_interval: float,
+    max_workers: Optional[int],
+    cookie_cache: Path,
+    batch_size: int,
+):
+    """Download trends based on the config file,
+    concurrently through a pool of proxies, one
+    keyword in each request unless `--batch-size` is given
 
     :param config_file: location of a config file that contains
         the configurations and the keywords
+    :param proxies: proxies to download through
+    :param proxy_file: file with one proxy per line
+    :param min_interval: minimum seconds between two requests of a proxy
+    :param max_interval: maximum seconds between two requests of a proxy
+    :param max_workers: number of concurrent workers
+    :param cookie_cache: file in which the google cookies are cached
+    :param batch_size: number of keywords in a request, see
+        [`BatchTrend`][sm_trendy.use_pytrends.get_trends.BatchTrend]
     """
     click.echo(click.format_filename(config_file))
 
     cb = ptc.ConfigBundle(file_path=config_file)
 
+    if proxy_file is not None:
+        with open(proxy_file, "r") as fp:
+            proxies = [line.strip() for line in fp if line.strip()]
+    if not proxies:
+        raise click.UsageError("No proxy given, use --proxy or --proxy-file")
+
     today = datetime.date.today()
     global_request_params = cb.global_config["request"]
     parent_folder = cb.global_config["path"]["parent_folder"]
-    trends_service = ptg._TrendReq(
-        hl=global_request_params["hl"],
-        tz=global_request_params["tz"],
-        timeout=(10, 14),
-        requests_args={"headers": get_random_user_agent()},
-        proxies=["https://157.245.27.9:3128"],
-    )
 
-    dl = ptg.Download(
+    pdl = ptg.PooledDownload(
         parent_folder=parent_folder,
         snapshot_date=today,
-        trends_service=trends_service,
+        proxy_pool=ProxyPool(
+            list(proxies), min_interval=min_interval, max_interval=max_interval
+        ),
+        request_params=ptc.RequestParams(
+            hl=global_request_params["hl"],
+            tz=global_request_params["tz"],
+            timeout=(10, 14),
+        ),
+        max_workers=max_workers,
+        cookie_cache=CookieCache(path=cookie_cache),
+        batch_size=batch_size,
+    )
+    pdl(cb)
+
+
+MAX_ATTEMPTS_OPTION = click.option(
+    "--max-attempts",
+    type=int,
+    default=3,
+    help="Maximum attempts of a keyword that fails with a transient error",
+)
+RETRY_BACKOFF_OPTION = click.option(
+    "--retry-backoff",
+    type=float,
+    default=60,
+    help="Seconds before retrying a transient failure, doubled at each attempt",
+)
+KEYWORDS_FROM_OPTION = click.option(
+    "--keywords-from",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=None,
+    help="Only the keywords of a dead-letter file from a previous run",
+)
+
+RUN_REPORT_OPTION = click.option(
+    "--run-report/--no-run-report",
+    default=True,
+    help="Write the stage timings to _runs in the parent folder, as json and Prometheus text",
+)
+
+
+def dead_letter_option(default: str):
+    return click.option(
+        "--dead-letter",
+        type=click.Path(dir_okay=False, path_type=Path),
+        default=default,
+        show_default=True,
+        help="JSONL file of the keywords that still fail after the retries",
     )
-
-    wait_seconds_min_max = (30, 120)
-
-    for c in cb:
-        dl(c)
-        wait_seconds = random.randint(*wait_seconds_min_max)
-        logger.info(f"Waiting for {wait_seconds} seconds ...")
-        time.sleep(wait_seconds)
 
 
 @trendy.command()
 @click.argument("config-file", type=AnyPath)
-@click.argument("wait-seconds-min", type=int, default=5)
-@click.argument("wait-seconds-max", type=int, default=10)
+@click.argument("wait-seconds-min", type=float, default=5)
+@click.argument("wait-seconds-max", type=float, default=10)
+@click.option(
+    "--max-interval",
+    type=float,
+    default=600,
+    help="Maximum seconds between two requests when SerpAPI throttles",
+)
+@click.option(
+    "--cooldown",
+    type=float,
+    default=300,
+    help="Seconds without requests after repeated throttling",
+)
+@MAX_ATTEMPTS_OPTION
+@RETRY_BACKOFF_OPTION
+@dead_letter_option("dead_letter_serpapi.jsonl")
+@KEYWORDS_FROM_OPTION
+@RUN_REPORT_OPTION
 def download_serpapi(
-    config_file: AnyPath, wait_seconds_min: int, wait_seconds_max: int
+    config_file: AnyPath,
+    wait_seconds_min: float,
+    wait_seconds_max: float,
+    max_interval: float,
+    cooldown: float,
+    max_attempts: int,
+    retry_backoff: float,
+    dead_letter: Path,
+    keywords_from: Optional[Path],
+    run_report: bool,
 ):
     """Download trends based on the config file
 
+    The requests start with `wait_seconds_max` seconds in between,
+    speed up to `wait_seconds_min` while SerpAPI is healthy, and slow
+    down when it throttles, see
+    [`AdaptiveRateController`][sm_trendy.utilities.rate.AdaptiveRateController].
+
     :param config_file: location of a config file that contains
         the configurations and the keywords
+    :param wait_seconds_min: minimum seconds between two requests
+    :param wait_seconds_max: initial seconds between two requests
+    :param max_interval: maximum seconds between two requests
+    :param cooldown: seconds the circuit breaker stays open
+    :param max_attempts: maximum attempts of a keyword
+    :param retry_backoff: seconds before retrying a transient failure
+    :param dead_letter: file of the keywords that still fail
+    :param keywords_from: dead-letter file of the keywords to download,
+        instead of all keywords of the config file
+    :param run_report: whether to write the stage timings of the run, see
+        [`Metrics.write_report`][sm_trendy.utilities.metrics.Metrics.write_report]
     """
     click.echo(click.format_filename(config_file))
+    METRICS.reset()
 
     today = datetime.date.today()
 
@@ -93,66 +285,138 @@ def download_serpapi(
         logger.error("api_key is empty, please set the env var: " "SERPAPI_KEY")
 
     scb = SerpAPIConfigBundle(file_path=config_file, serpapi_key=api_key)
+    if keywords_from is not None:
+        scb.raw_configs["keywords"] = DeadLetterFile.load(keywords_from)
 
     parent_folder = scb.global_config["path"]["parent_folder"]
-    sdl = SerpAPIDownload(parent_folder=parent_folder, snapshot_date=today)
+    rate_controller = AdaptiveRateController(
+        interval=wait_seconds_max,
+        min_interval=wait_seconds_min,
+        max_interval=max_interval,
+        cooldown=cooldown,
+        name="serpapi",
+    )
+    sdl = SerpAPIDownload(
+        parent_folder=parent_folder,
+        snapshot_date=today,
+        rate_controller=rate_controller,
+    )
 
-    wait_seconds_min_max = (wait_seconds_min, wait_seconds_max)
+    rq = RetryQueue(
+        sdl,
+        max_attempts=max_attempts,
+        backoff=retry_backoff,
+        dead_letter=DeadLetterFile(dead_letter),
+    )
+    summary = rq(scb)
 
-    for c in scb:
-        try:
-            sdl(c)
-            wait_seconds = random.randint(*wait_seconds_min_max)
-            logger.info(f"Waiting for {wait_seconds} seconds ...")
-            time.sleep(wait_seconds)
-        except Exception as e:
-            logger.error("Can not download: \n" f"config: {c}\n" f" error: {e}")
+    if run_report:
+        METRICS.write_report(parent_folder, "download-serpapi", summary=summary)
 
 
 @trendy.command()
 @click.argument("config-file", type=AnyPath)
 @click.argument("manual-folder", type=AnyPath)
-def create_manual_folders(config_file: AnyPath, manual_folder: AnyPath):
+@click.option(
+    "--max-workers",
+    type=int,
+    default=16,
+    show_default=True,
+    help="Number of concurrent uploads",
+)
+@click.option(
+    "--zip-bundle",
+    type=AnyPath,
+    default=None,
+    help="Also write all folders to this zip file, e.g., /tmp/manual_folders.zip",
+)
+def create_manual_folders(
+    config_file: AnyPath,
+    manual_folder: AnyPath,
+    max_workers: int,
+    zip_bundle: Optional[AnyPath],
+):
     """Create folders based on the serpapi config
 
     :param config_file: location of a config file that contains
         the configurations and the keywords
+    :param max_workers: number of concurrent uploads
+    :param zip_bundle: where to also write all folders as a zip file
     """
     click.echo(click.format_filename(config_file))
 
     scb = SerpAPIConfigBundle(file_path=config_file, serpapi_key="")
     if not isinstance(manual_folder, AnyPath):
         manual_folder = AnyPath(manual_folder)
-    s2m = SerpAPI2Manual(manual_folder=manual_folder)
+    if zip_bundle is not None and not isinstance(zip_bundle, AnyPath):
+        zip_bundle = AnyPath(zip_bundle)
+    s2m = SerpAPI2Manual(manual_folder=manual_folder, max_workers=max_workers)
     logger.info(f"Create intermediate folders in {manual_folder} ...")
-    s2m(config_bundle=scb)
+    s2m(config_bundle=scb, zip_bundle=zip_bundle)
 
 
 @trendy.command()
 @click.argument("config-file", type=AnyPath)
 @click.argument("manual-folder", type=AnyPath)
-def upload_manual(config_file: AnyPath, manual_folder: AnyPath):
+@MAX_ATTEMPTS_OPTION
+@RETRY_BACKOFF_OPTION
+@dead_letter_option("dead_letter_manual.jsonl")
+@KEYWORDS_FROM_OPTION
+@click.option(
+    "--max-workers",
+    type=int,
+    default=8,
+    show_default=True,
+    help="Number of folders parsed and uploaded concurrently",
+)
+@RUN_REPORT_OPTION
+def upload_manual(
+    config_file: AnyPath,
+    manual_folder: AnyPath,
+    max_attempts: int,
+    retry_backoff: float,
+    dead_letter: Path,
+    keywords_from: Optional[Path],
+    max_workers: int,
+    run_report: bool,
+):
     """Download trends based on the config file
 
     :param config_file: location of a config file that contains
         the configurations and the keywords
+    :param max_attempts: maximum attempts of a keyword
+    :param retry_backoff: seconds before retrying a transient failure
+    :param dead_letter: file of the keywords that still fail
+    :param keywords_from: dead-letter file of the keywords to upload,
+        instead of all keywords of the config file
+    :param max_workers: number of folders parsed and uploaded concurrently
+    :param run_report: whether to write the stage timings of the run
     """
     click.echo(click.format_filename(config_file))
+    METRICS.reset()
 
     today = datetime.date.today()
 
     scb = SerpAPIConfigBundle(file_path=config_file, serpapi_key="")
+    if keywords_from is not None:
+        scb.raw_configs["keywords"] = DeadLetterFile.load(keywords_from)
 
     parent_folder = scb.global_config["path"]["parent_folder"]
     mdl = ManualDownload(
         parent_folder=parent_folder, snapshot_date=today, manual_folder=manual_folder
     )
 
-    for c in scb:
-        try:
-            mdl(c)
-        except Exception as e:
-            logger.error("Can not download: \n" f"config: {c}\n" f" error: {e}")
+    rq = RetryQueue(
+        mdl,
+        max_attempts=max_attempts,
+        backoff=retry_backoff,
+        dead_letter=DeadLetterFile(dead_letter),
+        max_workers=max_workers,
+    )
+    summary = rq(scb)
+
+    if run_report:
+        METRICS.write_report(parent_folder, "upload-manual", summary=summary)
 
 
 @trendy.command()
@@ -183,17 +447,69 @@ def validate_config(config_file: AnyPath, top_n: int):
             logger.error(f"Keyword: {c.serpapi_params.q} validation failed: {e}")
 
 
+CONTENT_ENCODING_OPTION = click.option(
+    "--content-encoding",
+    type=click.Choice(["gzip", "br"]),
+    default=None,
+    help="Upload the json files precompressed, with the Content-Encoding header",
+)
+CACHE_CONTROL_OPTION = click.option(
+    "--cache-control",
+    type=str,
+    default=None,
+    help="Cache-Control header of the json files, e.g., 'public, max-age=3600'",
+)
+
+
 @trendy.command()
 @click.argument("config-file", type=AnyPath)
-def agg(config_file: AnyPath):
+@click.option(
+    "--compact/--no-compact",
+    default=False,
+    help="Also publish the compact columnar json in format=json-compact",
+)
+@click.option(
+    "--pyramids/--no-pyramids",
+    default=False,
+    help=(
+        "Also publish the monthly and quarterly means in format=json-monthly "
+        "and format=json-quarterly, and the sparklines"
+    ),
+)
+@click.option(
+    "--batched/--no-batched",
+    default=False,
+    help="Aggregate all configs of a serpapi config file in a single dataframe",
+)
+@CONTENT_ENCODING_OPTION
+@CACHE_CONTROL_OPTION
+@RUN_REPORT_OPTION
+def agg(
+    config_file: AnyPath,
+    compact: bool,
+    pyramids: bool,
+    batched: bool,
+    content_encoding: Optional[str],
+    cache_control: Optional[str],
+    run_report: bool,
+):
     """Aggregate the downloaded results into single files
 
     For example, `s3://sm-google-trend/configs/aggregate_config.json`
 
     :param config_file: location of a config file that contains
         the configurations and the keywords
+    :param compact: whether to publish the compact columnar json
+    :param pyramids: whether to publish the monthly and quarterly means,
+        and the sparklines
+    :param batched: whether to aggregate all configs of a serpapi config
+        file in a single dataframe, which is faster for many keywords
+    :param content_encoding: compress the json files with gzip or br
+    :param cache_control: Cache-Control header of the json files
+    :param run_report: whether to write the stage timings of the run
     """
     click.echo(f"Aggregation config: {click.format_filename(str(config_file))}")
+    METRICS.reset()
     if not isinstance(config_file, AnyPath):
         config_file = AnyPath(config_file)
 
@@ -201,17 +517,226 @@ def agg(config_file: AnyPath):
         config = json.load(fp)
 
     parent_folder = AnyPath(config["global"]["path"]["parent_folder"])
-    agg_bundle = AggSerpAPIBundle(parent_path=parent_folder)
+    formats = ["json", "json-compact"] if compact else ["json"]
+    if pyramids:
+        formats += ["json-monthly", "json-quarterly"]
+    agg_bundle = AggSerpAPIBundle(
+        parent_path=parent_folder,
+        formats=formats,
+        content_encoding=content_encoding,
+        cache_control=cache_control,
+        sparklines=pyramids,
+        batched=batched,
+    )
 
     for k in config["keywords"]:
         keyword_configs = AnyPath(k["config"])
         logger.info(f"Aggregating {keyword_configs}")
         agg_bundle(serpapi_config_path=keyword_configs)
 
+    if run_report:
+        METRICS.write_report(
+            parent_folder, "agg", summary={"config_files": len(config["keywords"])}
+        )
+
+
+@trendy.command()
+@click.argument("config-file", type=AnyPath)
+@click.option(
+    "--top-n",
+    type=int,
+    default=10,
+    help="Number of keywords in the rising and falling top movers of each geo and timeframe",
+)
+@CONTENT_ENCODING_OPTION
+@CACHE_CONTROL_OPTION
+def agg_stats(
+    config_file: AnyPath,
+    top_n: int,
+    content_encoding: Optional[str],
+    cache_control: Optional[str],
+):
+    """Compute the statistics table of all keywords, e.g., growth and
+    momentum, and the top movers per geo and timeframe, next to the aggregated data
+
+    `config_file` should have the same format as aggregation config, e.g., `s3://sm-google-trend/configs/aggregate_config.json`
+
+    :param config_file: location of a config file that contains
+        the configurations and the keywords
+    :param top_n: number of keywords in the top movers
+    :param content_encoding: compress the json files with gzip or br
+    :param cache_control: Cache-Control header of the json files
+    """
+    click.echo(f"Aggregation config: {click.format_filename(str(config_file))}")
+    if not isinstance(config_file, AnyPath):
+        config_file = AnyPath(config_file)
+
+    with open(config_file, "r") as fp:
+        config = json.load(fp)
+
+    parent_folder = AnyPath(config["global"]["path"]["parent_folder"])
+    agg_trend_stats = AggTrendStats(
+        parent_path=parent_folder,
+        top_n=top_n,
+        content_encoding=content_encoding,
+        cache_control=cache_control,
+    )
+    agg_trend_stats(
+        serpapi_config_paths=[AnyPath(k["config"]) for k in config["keywords"]]
+    )
+
+
+@trendy.command()
+@click.argument("config-file", type=AnyPath)
+@click.option("--k", type=int, default=10, help="Number of neighbours of each keyword")
+@click.option(
+    "--block-size",
+    type=int,
+    default=1024,
+    help="Number of keywords in each block of the matrix products",
+)
+@click.option(
+    "--full/--incremental",
+    default=False,
+    help="Recompute all keywords instead of the ones with new snapshots",
+)
+@CONTENT_ENCODING_OPTION
+@CACHE_CONTROL_OPTION
+def agg_similar(
+    config_file: AnyPath,
+    k: int,
+    block_size: int,
+    full: bool,
+    content_encoding: Optional[str],
+    cache_control: Optional[str],
+):
+    """Build the index of the most similar keywords of each keyword,
+    based on the correlation of the latest series, per geo and timeframe
+
+    `config_file` should have the same format as aggregation config, e.g., `s3://sm-google-trend/configs/aggregate_config.json`
+
+    :param config_file: location of a config file that contains
+        the configurations and the keywords
+    :param k: number of neighbours of each keyword
+    :param block_size: number of keywords in each block of the matrix products
+    :param full: whether to recompute all keywords
+    :param content_encoding: compress the json files with gzip or br
+    :param cache_control: Cache-Control header of the json files
+    """
+    click.echo(f"Aggregation config: {click.format_filename(str(config_file))}")
+    if not isinstance(config_file, AnyPath):
+        config_file = AnyPath(config_file)
+
+    with open(config_file, "r") as fp:
+        config = json.load(fp)
+
+    parent_folder = AnyPath(config["global"]["path"]["parent_folder"])
+    agg_similar_keywords = AggSimilarKeywords(
+        parent_path=parent_folder,
+        k=k,
+        block_size=block_size,
+        content_encoding=content_encoding,
+        cache_control=cache_control,
+    )
+    agg_similar_keywords(
+        serpapi_config_paths=[AnyPath(c["config"]) for c in config["keywords"]],
+        full=full,
+    )
+
+
+@trendy.command()
+@click.argument("config-file", type=AnyPath)
+@click.argument("database-path", type=click.Path(dir_okay=False, path_type=Path))
+@click.option(
+    "--backend",
+    type=click.Choice(["sqlite", "duckdb"]),
+    default="sqlite",
+    help="duckdb requires the optional package duckdb",
+)
+@click.option(
+    "--snapshots",
+    type=click.Choice(["latest", "all"]),
+    default="latest",
+    help="Export only the latest snapshot of each keyword, or all of them",
+)
+@click.option(
+    "--from-format",
+    type=click.Choice(["csv", "parquet", "feather", "delta"]),
+    default="csv",
+    help="Which format of the downloaded data to load",
+)
+@click.option("--max-workers", type=int, default=8, help="Number of concurrent reads")
+def export_db(
+    config_file: AnyPath,
+    database_path: Path,
+    backend: str,
+    snapshots: str,
+    from_format: str,
+    max_workers: int,
+):
+    """Export the downloaded trends into a local SQLite or DuckDB file,
+    loading only the snapshots that are not in the file yet
+
+    `config_file` should have the same format as aggregation config, e.g., `s3://sm-google-trend/configs/aggregate_config.json`
+
+    :param config_file: location of a config file that contains
+        the configurations and the keywords
+    :param database_path: path of the local database file
+    :param backend: sqlite or duckdb
+    :param snapshots: export the latest snapshots, or all of them
+    :param from_format: which format of the downloaded data to load
+    :param max_workers: number of concurrent reads
+    """
+    click.echo(f"Aggregation config: {click.format_filename(str(config_file))}")
+    if not isinstance(config_file, AnyPath):
+        config_file = AnyPath(config_file)
+
+    with open(config_file, "r") as fp:
+        config = json.load(fp)
+
+    export_database = ExportDatabase(
+        database_path=database_path,
+        backend=backend,
+        from_format=from_format,
+        snapshots=snapshots,
+        max_workers=max_workers,
+    )
+    summary = export_database(
+        serpapi_config_paths=[AnyPath(c["config"]) for c in config["keywords"]]
+    )
+    click.echo(
+        f"Loaded {summary['snapshots']} snapshots, {summary['rows']} rows "
+        f"into {database_path}"
+    )
+
 
 @trendy.command()
 @click.argument("config-file", type=AnyPath)
-def agg_metadata(config_file: AnyPath):
+@click.option(
+    "--compact/--no-compact",
+    default=False,
+    help="Point to the compact columnar json in format=json-compact",
+)
+@click.option(
+    "--pyramids/--no-pyramids",
+    default=False,
+    help="Point to the monthly and quarterly means, and embed the sparklines",
+)
+@click.option(
+    "--index/--no-index",
+    default=True,
+    help="Also save a sharded and searchable keyword index in index/",
+)
+@CONTENT_ENCODING_OPTION
+@CACHE_CONTROL_OPTION
+def agg_metadata(
+    config_file: AnyPath,
+    compact: bool,
+    pyramids: bool,
+    index: bool,
+    content_encoding: Optional[str],
+    cache_control: Optional[str],
+):
     """Convert configs to a json file that our
     website can get a list of keywords and
     their corresponding path, for visualizations.
@@ -220,6 +745,16 @@ def agg_metadata(config_file: AnyPath):
 
     :param config_file: location of a config file that contains
         the configurations and the keywords
+    :param compact: whether to add the paths to the compact columnar json,
+        `compact_path` and `compact_s3`. Use it if the aggregation
+        was run with `--compact`.
+    :param pyramids: whether to add the paths to the monthly and quarterly
+        means, `monthly_path` and `quarterly_path`, and the `sparkline`.
+        Use it if the aggregation was run with `--pyramids`.
+    :param index: whether to save the keyword index, see
+        [`KeywordIndex`][sm_trendy.aggregate.index.KeywordIndex]
+    :param content_encoding: compress the metadata file with gzip or br
+    :param cache_control: Cache-Control header of the metadata file
     """
     click.echo(f"Using aggregation config: {click.format_filename(str(config_file))}")
 
@@ -245,6 +780,13 @@ def agg_metadata(config_file: AnyPath):
         logger.info(f"Parsing {keyword_configs}")
 
         scb = SerpAPIConfigBundle(file_path=keyword_configs, serpapi_key="")
+        sparklines = (
+            load_sparklines(
+                parent_path=parent_folder, serpapi_config_path=keyword_configs
+            )
+            if pyramids
+            else {}
+        )
 
         for c in scb:
             logger.debug(f"  Converting {c.path_params}")
@@ -261,20 +803,92 @@ def agg_metadata(config_file: AnyPath):
             )
 
             # Build Path Config
-            all_config.append(
-                {
-                    "keyword": c.extra_metadata.get("topic") or c.path_params.keyword,
-                    "cat": c.path_params.cat,
-                    "geo": c.path_params.geo,
-                    "timeframe": c.path_params.timeframe,
-                    "path": c_url,
-                    "q": c.path_params.keyword,
-                    "s3": str(c_s3_path),
-                }
-            )
+            c_config = {
+                "keyword": c.extra_metadata.get("topic") or c.path_params.keyword,
+                "cat": c.path_params.cat,
+                "geo": c.path_params.geo,
+                "timeframe": c.path_params.timeframe,
+                "path": c_url,
+                "q": c.path_params.keyword,
+                "s3": str(c_s3_path),
+            }
+            if compact:
+                c_config["compact_path"] = c.path_params.s3_access_point(
+                    base_url=s3_public_base_url,
+                    snapshot_date="latest",
+                    format="json-compact",
+                    filename="data.json",
+                )
+                c_config["compact_s3"] = str(
+                    c.path_params.s3_path(
+                        parent_folder=parent_folder,
+                        snapshot_date="latest",
+                        format="json-compact",
+                        filename="data.json",
+                    )
+                )
+            if pyramids:
+                for c_level in ["monthly", "quarterly"]:
+                    c_config[f"{c_level}_path"] = c.path_params.s3_access_point(
+                        base_url=s3_public_base_url,
+                        snapshot_date="latest",
+                        format=f"json-{c_level}",
+                        filename="data.json",
+                    )
+                c_config["sparkline"] = sparklines.get(c.path_params.partition)
+            all_config.append(c_config)
 
     # save all to a metadata.json file
     target_path = parent_folder / "metadata.json"
     logger.info(f"Saving metadata to {target_path} ...")
-    with target_path.open("w+") as fp:
-        json.dump(all_config, fp)
+    write_object(
+        target_path=target_path,
+        body=json.dumps(all_config).encode("utf-8"),
+        content_type="application/json",
+        content_encoding=content_encoding,
+        cache_control=cache_control,
+    )
+
+    if index:
+        keyword_index = KeywordIndex(entries=all_config)
+        keyword_index.save(
+            index_folder=parent_folder / "index",
+            content_encoding=content_encoding,
+            cache_control=cache_control,
+        )
+
+
+@trendy.command()
+@click.argument("parent-folder", type=AnyPath)
+@click.option("--host", type=str, default="127.0.0.1")
+@click.option("--port", type=int, default=8000)
+@click.option(
+    "--cache-size", type=int, default=1024, help="Number of files in the LRU cache"
+)
+@click.option(
+    "--ttl",
+    type=float,
+    default=300,
+    help="Seconds after which the cached files are read again",
+)
+def serve(parent_folder: AnyPath, host: str, port: int, cache_size: int, ttl: float):
+    """Serve the aggregated trends in PARENT_FOLDER with a FastAPI app,
+    see `sm_trendy.serve.app.create_app`
+
+    Requires `uvicorn`.
+
+    :param parent_folder: parent folder of the aggregated data
+    :param host: host to bind to
+    :param port: port to bind to
+    :param cache_size: number of files in the LRU cache
+    :param ttl: seconds after which the cached files are read again
+    """
+    try:
+        import uvicorn
+    except ImportError:
+        raise click.ClickException(
+            "trendy serve requires uvicorn, install it with `pip install uvicorn`"
+        )
+
+    app = create_app(parent_folder=parent_folder, cache_size=cache_size, ttl=ttl)
+    uvicorn.run(app, host=host, port=port)
@@ -1,39 +1,94 @@
+import io
 import json
-from typing import Any
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
 
-from cloudpathlib import AnyPath
+from cloudpathlib import AnyPath, S3Path
 from loguru import logger
 
 from sm_trendy.use_serpapi.config import SerpAPIConfigBundle
+from sm_trendy.utilities.storage import is_empty_folder, write_object
 
 
 class SerpAPI2Manual:
     """Convert SerpAPI config to Manual config,
     and saves the results as json files.
 
+    ```python
+    s2m = SerpAPI2Manual(manual_folder=S3Path("s3://sm-google-trend/manual"))
+    s2m(config_bundle=scb, zip_bundle=AnyPath("/tmp/manual_folders.zip"))
+    ```
+
+    The `manual.json` files are uploaded concurrently, one object
+    each, without listing or creating the folders on S3. With a
+    `zip_bundle`, all folders are also written to a single zip file,
+    to be handed to the people doing the manual downloads.
+
     :param manual_folder: intermediate folder to hold the
         downloaded csv and manual config
+    :param max_workers: number of concurrent uploads
     """
 
-    def __init__(self, manual_folder: AnyPath):
-        if manual_folder.exists():
-            assert (
-                len(list(manual_folder.iterdir())) == 0
-            ), "An empty folder is required"
+    def __init__(self, manual_folder: AnyPath, max_workers: int = 16):
+        assert is_empty_folder(manual_folder), "An empty folder is required"
 
         self.manual_folder = manual_folder
+        self.max_workers = max_workers
+
+    @staticmethod
+    def manual_configs(config_bundle: SerpAPIConfigBundle) -> Dict[str, Dict]:
+        """manual config of each folder, keyed by
+        [`PathParams.partition`][sm_trendy.utilities.config.PathParams.partition]
+        """
+        return {
+            c.path_params.partition: c.path_params.model_dump() for c in config_bundle
+        }
+
+    def _write(self, partition: str, manual_config: Dict):
+        c_temp_path = self.manual_folder / partition
+        if not isinstance(c_temp_path, S3Path):
+            c_temp_path.mkdir(parents=True, exist_ok=True)
+
+        logger.debug(f'Writing to {c_temp_path / "manual.json"} ...')
+        write_object(
+            c_temp_path / "manual.json", json.dumps(manual_config).encode("utf-8")
+        )
 
-    def __call__(self, config_bundle: SerpAPIConfigBundle):
+    def __call__(
+        self,
+        config_bundle: SerpAPIConfigBundle,
+        zip_bundle: Optional[AnyPath] = None,
+    ):
         """
         convert `SerpAPIConfigBundle` to a bunch of folders
         with manual config inside.
+
+        :param config_bundle: the serpapi configs
+        :param zip_bundle: where to also write all folders as a zip file
         """
+        manual_configs = self.manual_configs(config_bundle)
 
-        for c in config_bundle:
-            manual_config = c.path_params.model_dump()
-            c_temp_path = c.path_params.path(parent_folder=self.manual_folder)
-            c_temp_path.mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(lambda kv: self._write(*kv), manual_configs.items()))
+        logger.info(f"Created {len(manual_configs)} folders in {self.manual_folder}")
+
+        if zip_bundle is not None:
+            body = self.zip(manual_configs)
+            write_object(zip_bundle, body, content_type="application/zip")
+            logger.info(f"Written {len(body)} bytes to {zip_bundle}")
+
+    @staticmethod
+    def zip(manual_configs: Dict[str, Dict[str, Any]]) -> bytes:
+        """
+        Zip file of the folders, with a `manual.json` in each folder
+
+        :param manual_configs: manual config of each folder, see
+            [`manual_configs`][sm_trendy.manual.config.SerpAPI2Manual.manual_configs]
+        """
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for partition, manual_config in manual_configs.items():
+                zf.writestr(f"{partition}/manual.json", json.dumps(manual_config))
 
-            logger.debug(f'Writing to {c_temp_path / "manual.json"} ...')
-            with open(c_temp_path / "manual.json", "w") as fp:
-                json.dump(manual_config, fp)
+        return buffer.getvalue()
@@ -1,19 +1,81 @@
 import datetime
-import json
+import io
+import threading
 from functools import cached_property
-from typing import Dict
+from typing import Dict, List, Optional, Set
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from cloudpathlib import AnyPath
 from loguru import logger
 
-from sm_trendy.manual.config import SerpAPI2Manual
 from sm_trendy.utilities.config import PathParams
+from sm_trendy.utilities.metrics import METRICS
+from sm_trendy.utilities.schema import enforce_trend_schema
 from sm_trendy.utilities.storage import StoreDataFrame
 
+TIME_COLUMNS = ("Day", "Week", "Month")
+
+
+def read_multi_timeline(data: bytes) -> pd.DataFrame:
+    """
+    Parse a `multiTimeline.csv` exported from Google Trends with pyarrow
+
+    The lines above the header, e.g., `Category: All categories`,
+    are skipped. The header is the first line that starts with one
+    of `Day`, `Week` or `Month`, which becomes the `date` column.
+    The other columns, e.g., `curtain: (Germany)`, are kept as they
+    are, one for each keyword of the export.
+
+    :param data: content of the csv file
+    """
+    for i, line in enumerate(data.splitlines()[:20]):
+        first = line.split(b",", 1)[0].decode("utf-8-sig").strip()
+        if first in TIME_COLUMNS:
+            break
+    else:
+        raise ValueError(f"No {'/'.join(TIME_COLUMNS)} column in the header")
+
+    table = pacsv.read_csv(
+        io.BytesIO(data),
+        read_options=pacsv.ReadOptions(skip_rows=i),
+        convert_options=pacsv.ConvertOptions(
+            column_types={first: pa.timestamp("ns")},
+            timestamp_parsers=["%Y-%m-%d", "%Y-%m"],
+        ),
+    )
+    df = table.to_pandas()
+    df.rename(columns={df.columns[0]: "date"}, inplace=True)
+
+    return df
+
+
+def keyword_column(columns: List[str], keyword: str) -> str:
+    """
+    Column of a keyword in a multi-column export, e.g.,
+    `phone case: (Germany)` for `phone case`
+
+    :param columns: value columns of the export
+    :param keyword: the keyword
+    :raises ValueError: if the keyword is not in a multi-column export
+    """
+    if len(columns) == 1:
+        return columns[0]
+
+    for c in columns:
+        if c.rsplit(": (", 1)[0].strip().lower() == keyword.lower():
+            return c
+
+    raise ValueError(f"No column for {keyword} in {columns}")
+
 
 class ManualSingleTrend:
-    """get trend from manually downloaded file"""
+    """get trend from manually downloaded file
+
+    The keyword, cat, geo and timeframe are taken from
+    `path_params`, which is also what `manual.json` holds.
+    """
 
     def __init__(self, path_params: PathParams, manual_folder: AnyPath):
         self.path_params = path_params
@@ -22,33 +84,37 @@ class ManualSingleTrend:
     @cached_property
     def dataframe(self) -> pd.DataFrame:
         """
-        Build the dataframe
+        Build the dataframe, following the
+        [`TREND_SCHEMA`][sm_trendy.utilities.schema.TREND_SCHEMA]
         """
-
-        temp_path = self.path_params.path(parent_folder=self.manual_folder)
-        temp_path.mkdir(parents=True, exist_ok=True)
-
-        with open(temp_path / "manual.json", "r") as fp:
-            manual_config = json.load(fp)
-
-        df_downloaded = pd.read_csv(temp_path / "multiTimeline.csv", skiprows=2)
-        columns = df_downloaded.columns.tolist()
-        value_column = [c for c in columns if c != "Week"][0]
-
-        df_downloaded.rename(
-            columns={
-                "Week": "date",
-                value_column: "extracted_value",
-            },
-            inplace=True,
+        source_path = (
+            self.path_params.path(parent_folder=self.manual_folder)
+            / "multiTimeline.csv"
+        )
+        with METRICS.timer("read", "manual") as t:
+            data = source_path.read_bytes()
+            t.bytes = len(data)
+        with METRICS.timer("parse", "manual"):
+            return self._parse(data)
+
+    def _parse(self, data: bytes) -> pd.DataFrame:
+        """dataframe of the content of `multiTimeline.csv`"""
+        df_downloaded = read_multi_timeline(data)
+
+        value_column = keyword_column(
+            [c for c in df_downloaded.columns if c != "date"],
+            self.path_params.keyword,
+        )
+        df_downloaded = df_downloaded[["date", value_column]].rename(
+            columns={value_column: "extracted_value"}
         )
 
-        df_downloaded["query"] = manual_config["keyword"]
-        df_downloaded["geo"] = manual_config["geo"]
-        df_downloaded["timeframe"] = manual_config["timeframe"]
-        df_downloaded["cat"] = manual_config["cat"]
+        df_downloaded["query"] = self.path_params.keyword
+        df_downloaded["geo"] = self.path_params.geo
+        df_downloaded["timeframe"] = self.path_params.timeframe
+        df_downloaded["cat"] = self.path_params.cat
 
-        return df_downloaded
+        return enforce_trend_schema(df_downloaded)
 
     @cached_property
     def metadata(self) -> Dict[str, Dict]:
@@ -58,9 +124,24 @@ class ManualSingleTrend:
 class ManualDownload:
     """Download trend using config
 
+    ```python
+    mdl = ManualDownload(
+        parent_folder=parent_folder, snapshot_date=today, manual_folder=manual_folder
+    )
+    RetryQueue(mdl, max_workers=8)(scb)
+    ```
+
+    The folders with a `multiTimeline.csv` are found with a single
+    listing of `manual_folder`, see
+    [`ready`][sm_trendy.manual.get_trends.ManualDownload.ready].
+    A config without a downloaded file raises `FileNotFoundError`.
+    The instance is thread-safe, so that the folders can be parsed
+    and uploaded concurrently.
+
     :params parent_folder: parent folder for the data
     :param snapshot_date: snapshot date for the path
-    :param trends_service: trend service
+    :param manual_folder: folder of the manual downloads
+    :param deduplicate: skip saving data identical to the previous snapshot
     """
 
     def __init__(
@@ -68,20 +149,55 @@ class ManualDownload:
         parent_folder: AnyPath,
         snapshot_date: datetime.date,
         manual_folder: AnyPath,
+        deduplicate: bool = True,
     ):
+        if not isinstance(manual_folder, AnyPath):
+            manual_folder = AnyPath(manual_folder)
         self.parent_folder = parent_folder
         self.snapshot_date = snapshot_date
         self.manual_folder = manual_folder
+        self.deduplicate = deduplicate
+        self._ready: Optional[Set[str]] = None
+        self._ready_lock = threading.Lock()
+
+    @property
+    def ready(self) -> Set[str]:
+        """[`partitions`][sm_trendy.utilities.config.PathParams.partition]
+        with a `multiTimeline.csv`, listed once even if the
+        workers ask concurrently
+        """
+        if self._ready is not None:
+            return self._ready
+
+        with self._ready_lock:
+            if self._ready is None:
+                with METRICS.timer("list", "manual"):
+                    ready = {
+                        "/".join(path.relative_to(self.manual_folder).parts[:4])
+                        for path in self.manual_folder.glob(
+                            "keyword=*/cat=*/geo=*/timeframe=*/multiTimeline.csv"
+                        )
+                    }
+                logger.info(f"{len(ready)} folders ready in {self.manual_folder}")
+                self._ready = ready
+
+        return self._ready
 
     def __call__(self, config):
         """
         :param config: config for the keyword
         """
         path_params = config.path_params
+        if path_params.partition not in self.ready:
+            raise FileNotFoundError(
+                f"No multiTimeline.csv in {self.manual_folder}/{path_params.partition}"
+            )
         target_folder = path_params.path(parent_folder=self.parent_folder)
 
         sdf = StoreDataFrame(
-            target_folder=target_folder, snapshot_date=self.snapshot_date
+            target_folder=target_folder,
+            snapshot_date=self.snapshot_date,
+            deduplicate=self.deduplicate,
         )
         sst = ManualSingleTrend(
             path_params=path_params, manual_folder=self.manual_folder
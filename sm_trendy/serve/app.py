@@ -0,0 +1,264 @@
+import datetime
+import hashlib
+import json
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from cloudpathlib import AnyPath
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from loguru import logger
+
+from sm_trendy.aggregate.index import KeywordIndex
+from sm_trendy.utilities.cache import LRUCache
+from sm_trendy.utilities.config import PathParams
+from sm_trendy.utilities.storage import decompress
+
+
+class TrendReader:
+    """
+    Read the aggregated files, see
+    [`AggSerpAPIBundle`][sm_trendy.aggregate.agg.AggSerpAPIBundle],
+    with the decoded bodies and their ETag kept in an LRU cache
+
+    The files may be precompressed, they are decompressed once
+    when they enter the cache. As the `latest` snapshots are
+    overwritten by each aggregation, the cached files expire
+    after `ttl` seconds.
+
+    :param parent_folder: parent folder of the aggregated data
+    :param cache_size: maximum number of files in the cache
+    :param ttl: seconds after which the cached files are read again
+    """
+
+    def __init__(
+        self, parent_folder: AnyPath, cache_size: int = 1024, ttl: float = 300
+    ):
+        if not isinstance(parent_folder, AnyPath):
+            parent_folder = AnyPath(parent_folder)
+        self.parent_folder = parent_folder
+        self.cache = LRUCache(maxsize=cache_size, ttl=ttl)
+
+    def read(self, path: AnyPath) -> Tuple[bytes, str]:
+        """
+        Decoded body of a file and its ETag
+
+        :param path: path of the file
+        :raises FileNotFoundError: if the file does not exist
+        """
+        key = str(path)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        body = decompress(path.read_bytes())
+        cached = (body, f'"{hashlib.md5(body).hexdigest()}"')
+        self.cache.put(key, cached)
+
+        return cached
+
+    def series(
+        self,
+        path_params: PathParams,
+        format: Literal[
+            "json", "json-compact", "json-monthly", "json-quarterly"
+        ] = "json",
+        snapshot_date: str = "latest",
+    ) -> Tuple[bytes, str]:
+        """
+        Aggregated series of a keyword
+
+        :param path_params: keyword, cat, geo and timeframe of the series
+        :param format: the format partition to read from
+        :param snapshot_date: the snapshot partition to read from,
+            `latest` or an ISO date, e.g., `2023-07-31`
+        :raises ValueError: if `snapshot_date` is neither `latest`
+            nor an ISO date
+        """
+        if snapshot_date != "latest":
+            snapshot_date = datetime.date.fromisoformat(snapshot_date).isoformat()
+
+        return self.read(
+            path_params.s3_path(
+                parent_folder=self.parent_folder,
+                snapshot_date=snapshot_date,
+                format=format,
+                filename="data.json",
+            )
+        )
+
+    def read_json(self, path: AnyPath) -> Any:
+        """Decoded json content of a file, cached
+
+        :param path: path of the file
+        :raises FileNotFoundError: if the file does not exist
+        """
+        key = ("json", str(path))
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = json.loads(self.read(path)[0])
+            self.cache.put(key, cached)
+
+        return cached
+
+    def metadata(self) -> List[Tuple[str, Dict]]:
+        """entries of `metadata.json`, see `trendy agg-metadata`,
+        with their normalized keyword for search
+        """
+        path = self.parent_folder / "metadata.json"
+        key = ("search", str(path))
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = [
+                (KeywordIndex.normalize(e["keyword"]), e) for e in self.read_json(path)
+            ]
+            self.cache.put(key, cached)
+
+        return cached
+
+    def summary(self) -> List[Dict]:
+        """latest statistics table, see `trendy agg-stats`"""
+        return self.read_json(
+            self.parent_folder
+            / "stats"
+            / "format=json"
+            / "snapshot_date=latest"
+            / "data.json"
+        )
+
+
+def etag_response(
+    request: Request, body: bytes, media_type: str = "application/json"
+) -> Response:
+    """Response with an ETag, or `304 Not Modified` if
+    the client already holds the same body
+
+    :param request: the incoming request
+    :param body: serialized body of the response
+    :param media_type: content type of the body
+    """
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    return _etag_response(request=request, body=body, etag=etag, media_type=media_type)
+
+
+def _etag_response(
+    request: Request, body: bytes, etag: str, media_type: str = "application/json"
+) -> Response:
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [t.strip() for t in if_none_match.split(",")] or if_none_match == "*":
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return Response(content=body, media_type=media_type, headers={"ETag": etag})
+
+
+def create_app(
+    parent_folder: AnyPath,
+    cache_size: int = 1024,
+    ttl: float = 300,
+    gzip_minimum_size: int = 500,
+) -> FastAPI:
+    """
+    FastAPI app to read the aggregated trends
+
+    | endpoint | description |
+    |---|---|
+    | `GET /series` | aggregated series of a keyword, see the parameters of [`PathParams`][sm_trendy.utilities.config.PathParams] |
+    | `GET /search` | metadata entries whose keyword contains the query |
+    | `GET /summary` | rows of the statistics table |
+    | `GET /health` | number of files in the cache, and the hits and misses |
+
+    The responses carry an ETag, requests with a matching
+    `If-None-Match` header get `304 Not Modified`. Responses
+    larger than `gzip_minimum_size` bytes are gzipped for
+    clients that accept it.
+
+    :param parent_folder: parent folder of the aggregated data
+    :param cache_size: maximum number of files in the cache
+    :param ttl: seconds after which the cached files are read again
+    :param gzip_minimum_size: minimum size of the responses to be gzipped
+    """
+    reader = TrendReader(parent_folder=parent_folder, cache_size=cache_size, ttl=ttl)
+
+    app = FastAPI(title="trendy")
+    app.add_middleware(GZipMiddleware, minimum_size=gzip_minimum_size)
+    app.state.reader = reader
+
+    @app.get("/series")
+    def series(
+        request: Request,
+        keyword: str,
+        geo: str,
+        timeframe: str = "today 5-y",
+        cat: str = "0",
+        format: Literal[
+            "json", "json-compact", "json-monthly", "json-quarterly"
+        ] = "json",
+        snapshot_date: str = "latest",
+    ):
+        path_params = PathParams(keyword=keyword, cat=cat, geo=geo, timeframe=timeframe)
+        try:
+            body, etag = reader.series(
+                path_params=path_params, format=format, snapshot_date=snapshot_date
+            )
+        except ValueError:
+            raise HTTPException(
+                status_code=422,
+                detail=f"snapshot_date must be latest or a date, got {snapshot_date}",
+            )
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=404, detail=f"No {format} data for {path_params.partition}"
+            )
+
+        return _etag_response(request=request, body=body, etag=etag)
+
+    @app.get("/search")
+    def search(
+        request: Request, q: str = "", geo: Optional[str] = None, limit: int = 20
+    ):
+        try:
+            entries = reader.metadata()
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="No metadata.json")
+
+        query = KeywordIndex.normalize(q)
+        matches = [
+            e
+            for normalized, e in entries
+            if query in normalized
+            and (geo is None or (e.get("geo") or "").lower() == geo.lower())
+        ][:limit]
+
+        return etag_response(request=request, body=json.dumps(matches).encode("utf-8"))
+
+    @app.get("/summary")
+    def summary(
+        request: Request,
+        geo: Optional[str] = None,
+        keyword: Optional[str] = None,
+        limit: int = 100,
+    ):
+        try:
+            rows = reader.summary()
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="No statistics table")
+
+        rows = [
+            r
+            for r in rows
+            if (geo is None or (r.get("geo") or "").lower() == geo.lower())
+            and (keyword is None or r.get("keyword") == keyword)
+        ][:limit]
+
+        return etag_response(request=request, body=json.dumps(rows).encode("utf-8"))
+
+    @app.get("/health")
+    def health():
+        return {
+            "cache_size": len(reader.cache),
+            "cache_hits": reader.cache.hits,
+            "cache_misses": reader.cache.misses,
+        }
+
+    logger.info(f"Serving {parent_folder} with a cache of {cache_size} files")
+
+    return app
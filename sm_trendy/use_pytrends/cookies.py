@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from loguru import logger
+
+DEFAULT_COOKIE_CACHE_PATH = Path.home() / ".cache" / "sm_trendy" / "cookies.json"
+
+
+class CookieCache:
+    """
+    Google cookies cached on disk with their expiry, so that new
+    workers and new runs skip the cookie round-trip
+
+    The cookies are keyed by the proxy they were fetched through,
+
+    ```json
+    {
+        "https://157.245.27.9:3128": {
+            "cookies": {"NID": "..."},
+            "expires": 1706745600.0
+        }
+    }
+    ```
+
+    The file is read again at each lookup, and replaced atomically at
+    each update, so that several processes can share it. A cookie
+    without expiry is kept for `max_age` seconds.
+
+    :param path: path of the json file
+    :param max_age: maximum seconds a cookie is kept
+    """
+
+    def __init__(
+        self, path: Path = DEFAULT_COOKIE_CACHE_PATH, max_age: float = 7 * 86400
+    ):
+        self.path = Path(path)
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, "r") as fp:
+                return json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """
+        Cookies of a key, `None` if missing or expired
+
+        :param key: the proxy, or `direct`
+        """
+        with self._lock:
+            entry = self._load().get(key)
+        if entry is None or entry["expires"] <= time.time():
+            return None
+
+        return entry["cookies"]
+
+    def put(self, key: str, cookies: Dict[str, str], expires: Optional[float] = None):
+        """
+        Cache the cookies of a key
+
+        :param key: the proxy, or `direct`
+        :param cookies: the cookies
+        :param expires: epoch seconds at which the cookies expire
+        """
+        now = time.time()
+        expires = min(expires or now + self.max_age, now + self.max_age)
+        with self._lock:
+            entries = {k: v for k, v in self._load().items() if v["expires"] > now}
+            entries[key] = {"cookies": cookies, "expires": expires}
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as fp:
+                json.dump(entries, fp)
+            os.replace(tmp_path, self.path)
+
+        logger.debug(f"Cached cookies of {key} until {time.ctime(expires)}")
+
+    def clear(self):
+        with self._lock:
+            self.path.unlink(missing_ok=True)
@@ -1,41 +1,106 @@
-import contextlib
 import datetime
 import json
+import queue
+import threading
+import time
 from dataclasses import dataclass
 from functools import cached_property
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional, Union
+from typing import Any, Callable, Dict, Iterable, List, Literal, Optional, Tuple, Union
 
 import pandas as pd
 import requests
 from cloudpathlib import AnyPath
 from loguru import logger
-from pytrends.request import TrendReq
+from pytrends.request import BASE_TRENDS_URL, TrendReq
 
-from sm_trendy.use_pytrends.config import Config
+from sm_trendy.use_pytrends.config import Config, RequestParams
+from sm_trendy.use_pytrends.cookies import CookieCache
+from sm_trendy.use_pytrends.proxy import ProxyPool, classify_error
+from sm_trendy.utilities.rate import AdaptiveRateController
+from sm_trendy.utilities.request import get_random_user_agent, get_session
 from sm_trendy.utilities.storage import StoreDataFrame
 
 
-@contextlib.contextmanager
-def _requests_get_as_post():
-    requests.get, requests_get = requests.post, requests.get
-    try:
-        yield
-    finally:
-        requests.get = requests_get
-
-
 class _TrendReq(TrendReq):
-    """A fix to the original package
+    """A fix to the original package: the google cookie is fetched
+    with a POST request.
 
     Ref: [](https://github.com/GeneralMills/
     pytrends/pull/563#issuecomment-1466338941)
+
+    The cookie is fetched on a session of the instance, built with
+    [`get_session`][sm_trendy.utilities.request.get_session], so that
+    several instances can be used in threads. With a
+    [`CookieCache`][sm_trendy.use_pytrends.cookies.CookieCache], the
+    cookies are reused until they expire, across instances and runs.
+
+    :param cookie_cache: cache of the cookies, no cache by default
+    :param retry_params: retries of the cookie requests,
+        see [`get_session`][sm_trendy.utilities.request.get_session]
     """
 
-    def GetGoogleCookie(self):
-        # TODO: make sure to get rid of this dirty hack
-        with _requests_get_as_post():
-            return super().GetGoogleCookie()
+    COOKIE_URL = f"{BASE_TRENDS_URL}/explore/"
+
+    def __init__(
+        self,
+        *args,
+        cookie_cache: Optional[CookieCache] = None,
+        retry_params: Optional[Dict] = None,
+        **kwargs,
+    ):
+        self.session = get_session(retry_params=retry_params)
+        self.cookie_cache = cookie_cache
+        super().__init__(*args, **kwargs)
+
+    def GetGoogleCookie(self) -> Dict[str, str]:
+        """
+        Get the NID cookie, from the cache if available
+
+        On a proxy error, the proxy is removed from the list
+        if there are other proxies left.
+        """
+        while True:
+            requests_args = dict(self.requests_args)
+            if "proxies" not in requests_args:
+                requests_args["proxies"] = (
+                    {"https": self.proxies[self.proxy_index]}
+                    if len(self.proxies) > 0
+                    else {}
+                )
+            key = requests_args["proxies"].get("https") or "direct"
+
+            if self.cookie_cache is not None:
+                cookies = self.cookie_cache.get(key)
+                if cookies is not None:
+                    return cookies
+
+            try:
+                response = self.session.post(
+                    self.COOKIE_URL,
+                    params={"geo": self.hl[-2:]},
+                    timeout=self.timeout,
+                    **requests_args,
+                )
+            except requests.exceptions.ProxyError:
+                if "proxies" in self.requests_args or len(self.proxies) <= 1:
+                    logger.error(f"Proxy error on {key}, no more proxies available")
+                    raise
+                logger.warning(f"Proxy error on {key}, changing proxy")
+                self.proxies.remove(self.proxies[self.proxy_index])
+                self.proxy_index = self.proxy_index % len(self.proxies)
+                continue
+
+            nid = [c for c in response.cookies if c.name == "NID"]
+            cookies = {c.name: c.value for c in nid}
+            if self.cookie_cache is not None and cookies:
+                self.cookie_cache.put(
+                    key,
+                    cookies=cookies,
+                    expires=min((c.expires for c in nid if c.expires), default=None),
+                )
+
+            return cookies
 
 
 class SingleTrend:
@@ -101,6 +166,146 @@ class SingleTrend:
         }
 
 
+@dataclass
+class KeywordTrend:
+    """Trend of one keyword, split from a
+    [`BatchTrend`][sm_trendy.use_pytrends.get_trends.BatchTrend]
+
+    :param dataframe: the trend of the keyword
+    :param metadata: metadata of the request
+    """
+
+    dataframe: pd.DataFrame
+    metadata: Dict[str, Any]
+
+
+class BatchTrend:
+    """Get the trends of up to five keywords, in one country,
+    with a single request
+
+    ```python
+    bt = BatchTrend(
+        trends_service=_TrendReq(hl="en-US", tz=120),
+        keywords=["phone case", "curtain"],
+        geo="DE",
+    )
+    bt.trends["curtain"].dataframe
+    ```
+
+    !!! note
+        Google normalizes the values of a payload to the maximum
+        over all its keywords, so that the values of a keyword
+        depend on the other keywords of the batch. With `rescale`,
+        each keyword is rescaled to its own maximum, 100, as if it
+        was requested alone. The values of a keyword that is much
+        less searched than the others of its batch lose precision.
+
+    :param trends_service: pytrends TrendReq
+    :param keywords: keywords of the payload
+    :param geo: geo code such as `"DE"`
+    :param timeframe: the time frame of the trend, see pytrends
+    :param cat: category code, see pytrends for a list.
+    :param rescale: rescale each keyword to its own maximum
+    """
+
+    def __init__(
+        self,
+        trends_service: _TrendReq,
+        keywords: List[str],
+        geo: str,
+        timeframe: str = "today 5-y",
+        cat: int = 0,
+        rescale: bool = True,
+    ):
+        if not 0 < len(keywords) <= 5:
+            raise ValueError(f"A payload takes 1 to 5 keywords, got {len(keywords)}")
+        self.trends_service = trends_service
+        self.keywords = keywords
+        self.cat = cat
+        self.geo = geo
+        self.timeframe = timeframe
+        self.rescale = rescale
+
+        self.timestamp = datetime.datetime.now()
+
+    @cached_property
+    def dataframe(self) -> pd.DataFrame:
+        """the trends of all keywords, one column per keyword"""
+        logger.debug(f"building payload for {self.keywords} ...")
+        self.trends_service.build_payload(
+            self.keywords, cat=self.cat, timeframe=self.timeframe, geo=self.geo
+        )
+
+        logger.debug(f"Downloading trends for {self.keywords} ...")
+        return self.trends_service.interest_over_time()
+
+    @cached_property
+    def trends(self) -> Dict[str, KeywordTrend]:
+        """trend of each keyword, with the same columns as
+        [`SingleTrend`][sm_trendy.use_pytrends.get_trends.SingleTrend]
+        """
+        df = self.dataframe
+        shared_columns = [c for c in df.columns if c not in self.keywords]
+
+        trends = {}
+        for keyword in self.keywords:
+            if df.empty:
+                df_keyword = df
+            else:
+                df_keyword = df[
+                    [c for c in df.columns if c in shared_columns or c == keyword]
+                ].copy()
+                peak = df_keyword[keyword].max()
+                if self.rescale and peak > 0:
+                    df_keyword[keyword] = (
+                        (df_keyword[keyword] * 100 / peak).round().astype(int)
+                    )
+
+            trends[keyword] = KeywordTrend(
+                dataframe=df_keyword,
+                metadata={
+                    "timestamp": self.timestamp.isoformat(),
+                    "keyword": keyword,
+                    "geo": self.geo,
+                    "timeframe": self.timeframe,
+                    "cat": self.cat,
+                    "batch": self.keywords,
+                    "rescaled": self.rescale,
+                },
+            )
+
+        return trends
+
+
+def batch_configs(configs: Iterable[Config], batch_size: int = 5) -> List[List[Config]]:
+    """
+    Group the configs that share geo, timeframe and cat
+    into batches of `batch_size` keywords
+
+    Configs of the same keyword are kept in the same batch.
+    The batches follow the order of the configs.
+
+    :param configs: configs of the keywords
+    :param batch_size: maximum number of keywords in a batch
+    """
+    groups: Dict[Tuple, Dict[str, List[Config]]] = {}
+    for c in configs:
+        tp = c.trend_params
+        groups.setdefault((tp.geo, tp.timeframe, tp.cat), {}).setdefault(
+            tp.keyword, []
+        ).append(c)
+
+    batches = []
+    for by_keyword in groups.values():
+        keywords = list(by_keyword)
+        for i in range(0, len(keywords), batch_size):
+            batches.append(
+                [c for k in keywords[i : i + batch_size] for c in by_keyword[k]]
+            )
+
+    return batches
+
+
 class Download:
     """Download trend using config
 
@@ -137,6 +342,9 @@ class Download:
     :params parent_folder: parent folder for the data
     :param snapshot_date: snapshot date for the path
     :param trends_service: trend service
+    :param deduplicate: skip saving data identical to the previous snapshot
+    :param rate_controller: paces the requests, and adapts the rate
+        to the throttling of google, no pacing by default
     """
 
     def __init__(
@@ -144,28 +352,40 @@ class Download:
         parent_folder: AnyPath,
         snapshot_date: datetime.date,
         trends_service: _TrendReq,
+        deduplicate: bool = True,
+        rate_controller: Optional[AdaptiveRateController] = None,
     ):
         self.parent_folder = parent_folder
         self.snapshot_date = snapshot_date
         self.trends_service = trends_service
+        self.deduplicate = deduplicate
+        self.rate_controller = rate_controller
 
     def __call__(self, config: Config):
         """
         :param config: config for the keyword
         """
+        st = self.trend(config)
 
-        trend_params = config.trend_params
-        path_params = config.path_params
-        target_folder = path_params.path(parent_folder=self.parent_folder)
-        sdf = StoreDataFrame(
-            target_folder=target_folder, snapshot_date=self.snapshot_date
-        )
+        if self.rate_controller is not None:
+            with self.rate_controller.request():
+                st.dataframe
+
+        self.save(config, st)
 
+    def trend(self, config: Config) -> SingleTrend:
+        """the trend of a config, requested on `.dataframe`
+
+        :param config: config for the keyword
+        """
+        trend_params = config.trend_params
         logger.info(
-            f"keyword: {trend_params.keyword}\n" f"target_path: {target_folder}\n" "..."
+            f"keyword: {trend_params.keyword}\n"
+            f"target_path: {config.path_params.path(parent_folder=self.parent_folder)}\n"
+            "..."
         )
 
-        st = SingleTrend(
+        return SingleTrend(
             trends_service=self.trends_service,
             keyword=trend_params.keyword,
             geo=trend_params.geo,
@@ -173,5 +393,304 @@ class Download:
             cat=trend_params.cat,
         )
 
+    def save(self, config: Config, st: SingleTrend):
+        """save the trend of a config
+
+        :param config: config for the keyword
+        :param st: the trend from [`trend`][sm_trendy.use_pytrends.get_trends.Download.trend]
+        """
+        target_folder = config.path_params.path(parent_folder=self.parent_folder)
+        sdf = StoreDataFrame(
+            target_folder=target_folder,
+            snapshot_date=self.snapshot_date,
+            deduplicate=self.deduplicate,
+        )
         sdf.save(st, formats=["csv", "parquet"])
         logger.info(f"Saved to {target_folder}")
+
+
+class BatchDownload:
+    """Download the trends of a batch of configs with a single request
+
+    ```python
+    bdl = BatchDownload(
+        parent_folder=parent_folder,
+        snapshot_date=today,
+        trends_service=trends_service,
+    )
+
+    for batch in batch_configs(cb, batch_size=5):
+        bdl(batch)
+    ```
+
+    The trends are requested with a
+    [`BatchTrend`][sm_trendy.use_pytrends.get_trends.BatchTrend], and
+    the trend of each keyword is saved under its own path, as with
+    [`Download`][sm_trendy.use_pytrends.get_trends.Download].
+
+    :params parent_folder: parent folder for the data
+    :param snapshot_date: snapshot date for the path
+    :param trends_service: trend service
+    :param deduplicate: skip saving data identical to the previous snapshot
+    :param rate_controller: paces the requests, and adapts the rate
+        to the throttling of google, no pacing by default
+    :param rescale: rescale each keyword to its own maximum
+    """
+
+    def __init__(
+        self,
+        parent_folder: AnyPath,
+        snapshot_date: datetime.date,
+        trends_service: _TrendReq,
+        deduplicate: bool = True,
+        rate_controller: Optional[AdaptiveRateController] = None,
+        rescale: bool = True,
+    ):
+        self.parent_folder = parent_folder
+        self.snapshot_date = snapshot_date
+        self.trends_service = trends_service
+        self.deduplicate = deduplicate
+        self.rate_controller = rate_controller
+        self.rescale = rescale
+
+    def __call__(self, configs: List[Config]):
+        """
+        :param configs: configs of a batch, sharing geo,
+            timeframe and cat, see
+            [`batch_configs`][sm_trendy.use_pytrends.get_trends.batch_configs]
+        """
+        bt = self.trend(configs)
+
+        if self.rate_controller is not None:
+            with self.rate_controller.request():
+                bt.dataframe
+
+        self.save(configs, bt)
+
+    def trend(self, configs: List[Config]) -> BatchTrend:
+        """the trends of a batch, requested on `.dataframe`
+
+        :param configs: configs of a batch, sharing geo, timeframe and cat
+        """
+        trend_params = {
+            (c.trend_params.geo, c.trend_params.timeframe, c.trend_params.cat)
+            for c in configs
+        }
+        if len(trend_params) != 1:
+            raise ValueError(
+                f"The configs of a batch should share geo, timeframe and cat, "
+                f"got {trend_params}"
+            )
+        geo, timeframe, cat = trend_params.pop()
+        keywords = list(dict.fromkeys(c.trend_params.keyword for c in configs))
+
+        logger.info(f"keywords: {keywords}\n" f"geo: {geo}\n" "...")
+
+        return BatchTrend(
+            trends_service=self.trends_service,
+            keywords=keywords,
+            geo=geo,
+            timeframe=timeframe,
+            cat=cat,
+            rescale=self.rescale,
+        )
+
+    def save(self, configs: List[Config], bt: BatchTrend):
+        """save the trend of each keyword of a batch under its own path
+
+        :param configs: configs of the batch
+        :param bt: the trends from [`trend`][sm_trendy.use_pytrends.get_trends.BatchDownload.trend]
+        """
+        for c in configs:
+            target_folder = c.path_params.path(parent_folder=self.parent_folder)
+            sdf = StoreDataFrame(
+                target_folder=target_folder,
+                snapshot_date=self.snapshot_date,
+                deduplicate=self.deduplicate,
+            )
+            sdf.save(bt.trends[c.trend_params.keyword], formats=["csv", "parquet"])
+            logger.info(f"Saved to {target_folder}")
+
+
+class PooledDownload:
+    """Download trends concurrently through a pool of proxies
+
+    ```python
+    cb = ConfigBundle(file_path=config_file)
+    proxy_pool = ProxyPool(
+        ["https://157.245.27.9:3128", "https://10.0.0.1:3128"], min_interval=30
+    )
+
+    pdl = PooledDownload(
+        parent_folder=cb.global_config["path"]["parent_folder"],
+        snapshot_date=datetime.date.today(),
+        proxy_pool=proxy_pool,
+        request_params=RequestParams(**cb.global_config["request"]),
+    )
+    pdl(cb)
+    ```
+
+    Each worker takes the next config, acquires the best ready proxy
+    from [`ProxyPool`][sm_trendy.use_pytrends.proxy.ProxyPool] and
+    downloads the keyword with [`Download`][sm_trendy.use_pytrends.get_trends.Download].
+    With `batch_size > 1`, the configs are grouped with
+    [`batch_configs`][sm_trendy.use_pytrends.get_trends.batch_configs], and
+    each batch is downloaded with a single request, see
+    [`BatchDownload`][sm_trendy.use_pytrends.get_trends.BatchDownload].
+    The workers hold their own `_TrendReq` for each proxy, so that the
+    pytrends state is never shared between threads. A proxy is only held
+    for the google request, the data is saved after the proxy is given
+    back, so that neither its latency score nor its availability depend
+    on the storage. As each proxy has its own rate limit, the throughput
+    grows with the number of healthy proxies.
+
+    A config, or a batch, that fails because of its proxy, e.g., a 429
+    or a proxy error, is retried on another proxy, up to `max_attempts` times.
+
+    :param parent_folder: parent folder for the data
+    :param snapshot_date: snapshot date for the path
+    :param proxy_pool: the pool of proxies
+    :param request_params: hl, tz and timeout of the requests
+    :param max_workers: number of workers, the number of proxies by default
+    :param max_attempts: attempts of each config
+    :param deduplicate: skip saving data identical to the previous snapshot
+    :param trends_service_factory: builds the trend service of a proxy,
+        `_TrendReq` with a random user agent by default
+    :param cookie_cache: cache of the google cookies of the default
+        trend services, shared by the workers
+    :param batch_size: number of keywords in a request, up to 5
+    """
+
+    def __init__(
+        self,
+        parent_folder: AnyPath,
+        snapshot_date: datetime.date,
+        proxy_pool: ProxyPool,
+        request_params: Optional[RequestParams] = None,
+        max_workers: Optional[int] = None,
+        max_attempts: int = 3,
+        deduplicate: bool = True,
+        trends_service_factory: Optional[Callable[[str], _TrendReq]] = None,
+        cookie_cache: Optional[CookieCache] = None,
+        batch_size: int = 1,
+    ):
+        self.parent_folder = parent_folder
+        self.snapshot_date = snapshot_date
+        self.proxy_pool = proxy_pool
+        self.request_params = request_params or RequestParams()
+        self.max_workers = max_workers or len(proxy_pool)
+        self.max_attempts = max_attempts
+        self.deduplicate = deduplicate
+        self.trends_service_factory = (
+            trends_service_factory or self._default_trends_service
+        )
+        self.cookie_cache = cookie_cache
+        self.batch_size = batch_size
+
+    def _default_trends_service(self, proxy: str) -> _TrendReq:
+        return _TrendReq(
+            hl=self.request_params.hl,
+            tz=self.request_params.tz,
+            timeout=self.request_params.timeout,
+            requests_args={"headers": get_random_user_agent()},
+            proxies=[proxy],
+            cookie_cache=self.cookie_cache,
+        )
+
+    def __call__(self, configs: Iterable[Config]) -> Dict[str, int]:
+        """
+        Download all configs
+
+        :param configs: configs of the keywords
+        :return: number of downloaded and failed configs
+        """
+        tasks: queue.Queue = queue.Queue()
+        n_configs = 0
+        for batch in batch_configs(configs, batch_size=self.batch_size):
+            tasks.put((batch, 1))
+            n_configs += len(batch)
+        summary = {"downloaded": 0, "failed": 0}
+        lock = threading.Lock()
+
+        def worker():
+            trends_services: Dict[str, _TrendReq] = {}
+            while True:
+                try:
+                    batch, attempt = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                outcome = self._download(batch, trends_services)
+                with lock:
+                    if outcome == "downloaded":
+                        summary["downloaded"] += len(batch)
+                    elif outcome == "retry" and attempt < self.max_attempts:
+                        tasks.put((batch, attempt + 1))
+                    else:
+                        summary["failed"] += len(batch)
+
+        logger.info(
+            f"Downloading {n_configs} configs in {tasks.qsize()} requests "
+            f"with {self.max_workers} workers "
+            f"through {len(self.proxy_pool)} proxies ..."
+        )
+        t0 = time.monotonic()
+        threads = [
+            threading.Thread(target=worker, name=f"pytrends-{i}", daemon=True)
+            for i in range(self.max_workers)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        logger.info(f"{summary} in {time.monotonic() - t0:.0f} seconds")
+        for p in self.proxy_pool.summary():
+            logger.info(f"Proxy {p}")
+
+        return summary
+
+    def _download(
+        self, batch: List[Config], trends_services: Dict[str, _TrendReq]
+    ) -> Literal["downloaded", "retry", "failed"]:
+        keyword = ", ".join(dict.fromkeys(c.trend_params.keyword for c in batch))
+        proxy = None
+        try:
+            # the proxy is only held for the google request, not for the save
+            with self.proxy_pool.proxy() as proxy:
+                if proxy not in trends_services:
+                    trends_services[proxy] = self.trends_service_factory(proxy)
+                if self.batch_size > 1:
+                    downloader = BatchDownload(
+                        parent_folder=self.parent_folder,
+                        snapshot_date=self.snapshot_date,
+                        trends_service=trends_services[proxy],
+                        deduplicate=self.deduplicate,
+                    )
+                    trends = [(batch, downloader.trend(batch))]
+                else:
+                    downloader = Download(
+                        parent_folder=self.parent_folder,
+                        snapshot_date=self.snapshot_date,
+                        trends_service=trends_services[proxy],
+                        deduplicate=self.deduplicate,
+                    )
+                    trends = [(config, downloader.trend(config)) for config in batch]
+                for _, trend in trends:
+                    trend.dataframe
+        except Exception as e:
+            if classify_error(e) is None:
+                logger.error(f"Can not download {keyword}: {e}")
+                return "failed"
+            logger.warning(f"Can not download {keyword} through {proxy}: {e}")
+            # start over with a new session on this proxy
+            trends_services.pop(proxy, None)
+            return "retry"
+
+        try:
+            for config, trend in trends:
+                downloader.save(config, trend)
+        except Exception as e:
+            logger.error(f"Can not save {keyword}: {e}")
+            return "failed"
+
+        return "downloaded"
@@ -0,0 +1,314 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Literal, Optional
+
+import requests
+from loguru import logger
+from pytrends import exceptions
+
+from sm_trendy.utilities.rate import AdaptiveRateController, is_throttled
+
+
+class ProxyHealth:
+    """
+    Health of a proxy in a [`ProxyPool`][sm_trendy.use_pytrends.proxy.ProxyPool]
+
+    The latency and the error rate are exponentially weighted
+    moving averages over the requests sent through the proxy.
+
+    :param url: url of the proxy, e.g., `https://157.245.27.9:3128`
+    :param rate: rate controller of the proxy
+    """
+
+    def __init__(self, url: str, rate: AdaptiveRateController):
+        self.url = url
+        self.rate = rate
+        self.state: Literal["healthy", "probation", "evicted"] = "healthy"
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.throttles = 0
+        self.consecutive_failures = 0
+        self.evictions = 0
+        self.in_use = False
+        self.evicted_until = 0.0
+
+    @property
+    def score(self) -> float:
+        """lower is better, proxies that were not used yet come first"""
+        if self.latency is None:
+            return 0.0
+        return self.latency * (1 + 4 * self.error_rate)
+
+    def to_dict(self) -> Dict:
+        return {
+            "url": self.url,
+            "state": self.state,
+            "requests": self.requests,
+            "errors": self.errors,
+            "throttles": self.throttles,
+            "latency": None if self.latency is None else round(self.latency, 3),
+            "error_rate": round(self.error_rate, 3),
+            "requests_per_minute": round(60 * self.rate.rate, 2),
+        }
+
+
+class ProxyPool:
+    """
+    Pool of proxies with per-proxy rate limits and health scoring
+
+    ```python
+    pool = ProxyPool(["https://157.245.27.9:3128", "https://10.0.0.1:3128"])
+    with pool.proxy() as proxy:
+        ...
+    ```
+
+    [`acquire`][sm_trendy.use_pytrends.proxy.ProxyPool.acquire] hands out
+    the ready proxy with the best score, and blocks until one is ready.
+    A proxy is ready if it is not in use, and if its
+    [`AdaptiveRateController`][sm_trendy.utilities.rate.AdaptiveRateController]
+    allows a request: each proxy sends at most one request every
+    `min_interval` seconds, and slows down multiplicatively, down to
+    one request every `max_interval` seconds, when it is throttled (429).
+
+    A proxy is evicted when its error rate exceeds `max_error_rate`
+    after `min_requests` requests, or after `max_consecutive_failures`
+    failures in a row. An evicted proxy is put on probation after
+    `probation_seconds`, doubled at each eviction: a success makes it
+    healthy again, a failure evicts it again.
+
+    :param proxies: urls of the proxies
+    :param min_interval: minimum seconds between two requests of a proxy
+    :param max_interval: maximum seconds between two requests of a throttled proxy
+    :param max_error_rate: error rate above which a proxy is evicted
+    :param min_requests: number of requests before the error rate is used
+    :param max_consecutive_failures: failures in a row that evict a proxy
+    :param probation_seconds: seconds before an evicted proxy is tried again
+    :param alpha: weight of the latest request in the moving averages
+    """
+
+    def __init__(
+        self,
+        proxies: List[str],
+        min_interval: float = 30,
+        max_interval: float = 600,
+        max_error_rate: float = 0.5,
+        min_requests: int = 5,
+        max_consecutive_failures: int = 3,
+        probation_seconds: float = 600,
+        alpha: float = 0.2,
+    ):
+        if not proxies:
+            raise ValueError("proxies should not be empty")
+        self.proxies = {
+            url: ProxyHealth(
+                url,
+                rate=AdaptiveRateController(
+                    interval=min_interval,
+                    min_interval=min_interval,
+                    max_interval=max(max_interval, min_interval),
+                    failure_threshold=max_consecutive_failures,
+                    cooldown=probation_seconds,
+                    name=url,
+                ),
+            )
+            for url in dict.fromkeys(proxies)
+        }
+        self.min_interval = min_interval
+        self.max_error_rate = max_error_rate
+        self.min_requests = min_requests
+        self.max_consecutive_failures = max_consecutive_failures
+        self.probation_seconds = probation_seconds
+        self.alpha = alpha
+        self._condition = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self.proxies)
+
+    @property
+    def healthy(self) -> List[str]:
+        """urls of the proxies that are not evicted"""
+        with self._condition:
+            return [p.url for p in self.proxies.values() if p.state != "evicted"]
+
+    def _ready(self, now: float) -> Optional[ProxyHealth]:
+        for p in self.proxies.values():
+            if p.state == "evicted" and p.evicted_until <= now:
+                p.state = "probation"
+                logger.info(f"Proxy {p.url} is on probation")
+
+        ready = [
+            p
+            for p in self.proxies.values()
+            if p.state != "evicted" and not p.in_use and p.rate.ready(now)
+        ]
+        if not ready:
+            return None
+
+        return min(ready, key=lambda p: p.score)
+
+    def _wait_seconds(self, now: float) -> Optional[float]:
+        waits = [
+            max(
+                p.evicted_until if p.state == "evicted" else p.rate.next_request_at,
+                now,
+            )
+            - now
+            for p in self.proxies.values()
+            if not p.in_use
+        ]
+        return min(waits) if waits else None
+
+    def acquire(self, timeout: Optional[float] = None) -> ProxyHealth:
+        """
+        Take the ready proxy with the best score
+
+        :param timeout: maximum seconds to wait for a ready proxy
+        :raises TimeoutError: if no proxy is ready within `timeout`
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                proxy = self._ready(now)
+                if proxy is not None:
+                    proxy.in_use = True
+                    proxy.rate.reserve(now)
+                    return proxy
+
+                wait = self._wait_seconds(now)
+                if deadline is not None:
+                    if now >= deadline:
+                        raise TimeoutError("No proxy ready")
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self._condition.wait(timeout=wait)
+
+    def release(
+        self,
+        proxy: ProxyHealth,
+        latency: float,
+        outcome: Literal["success", "error", "throttled", "neutral"] = "success",
+    ):
+        """
+        Give a proxy back to the pool with the outcome of its request
+
+        :param proxy: the proxy from [`acquire`][sm_trendy.use_pytrends.proxy.ProxyPool.acquire]
+        :param latency: seconds taken by the request
+        :param outcome: `success`, `error`, `throttled` for 429, or
+            `neutral` for a failure unrelated to the proxy, e.g., a 400
+            for an invalid keyword, which only records the latency
+        """
+        with self._condition:
+            now = time.monotonic()
+            failed = outcome != "success"
+            proxy.in_use = False
+            proxy.latency = (
+                latency
+                if proxy.latency is None
+                else (1 - self.alpha) * proxy.latency + self.alpha * latency
+            )
+            if outcome == "neutral":
+                proxy.rate.failed()
+                self._condition.notify_all()
+                return
+
+            proxy.requests += 1
+            proxy.error_rate = (1 - self.alpha) * proxy.error_rate + self.alpha * failed
+
+            if not failed:
+                proxy.rate.success()
+                proxy.consecutive_failures = 0
+                if proxy.state == "probation":
+                    logger.info(f"Proxy {proxy.url} is healthy again")
+                    proxy.state = "healthy"
+                    proxy.error_rate = min(proxy.error_rate, self.max_error_rate / 2)
+            else:
+                proxy.errors += 1
+                proxy.consecutive_failures += 1
+                if outcome == "throttled":
+                    proxy.throttles += 1
+                    proxy.rate.throttled()
+                else:
+                    proxy.rate.failed()
+                if (
+                    proxy.state == "probation"
+                    or proxy.consecutive_failures >= self.max_consecutive_failures
+                    or (
+                        proxy.requests >= self.min_requests
+                        and proxy.error_rate > self.max_error_rate
+                    )
+                ):
+                    self._evict(proxy, now)
+
+            self._condition.notify_all()
+
+    def _evict(self, proxy: ProxyHealth, now: float):
+        proxy.evictions += 1
+        proxy.state = "evicted"
+        proxy.consecutive_failures = 0
+        seconds = self.probation_seconds * 2 ** min(proxy.evictions - 1, 6)
+        proxy.evicted_until = now + seconds
+        logger.warning(
+            f"Evicted proxy {proxy.url} for {seconds:.0f} seconds, "
+            f"error rate {proxy.error_rate:.2f}, "
+            f"{len(self.healthy)} healthy proxies left"
+        )
+
+    @contextmanager
+    def proxy(self, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Context manager that acquires a proxy, and releases it with
+        the latency and the outcome of the block, see
+        [`classify_error`][sm_trendy.use_pytrends.proxy.classify_error]
+
+        :param timeout: maximum seconds to wait for a ready proxy
+        """
+        proxy = self.acquire(timeout=timeout)
+        t0 = time.monotonic()
+        try:
+            yield proxy.url
+        except Exception as e:
+            outcome = classify_error(e)
+            self.release(
+                proxy,
+                latency=time.monotonic() - t0,
+                outcome="neutral" if outcome is None else outcome,
+            )
+            raise
+        else:
+            self.release(proxy, latency=time.monotonic() - t0)
+
+    def summary(self) -> List[Dict]:
+        """health of all proxies"""
+        with self._condition:
+            return [p.to_dict() for p in self.proxies.values()]
+
+
+def classify_error(error: Exception) -> Optional[Literal["error", "throttled"]]:
+    """
+    Outcome of a failed request for the health of its proxy
+
+    Only the errors that may come from the proxy count against it.
+    Other HTTP errors, e.g., a 400 for an invalid keyword, depend on
+    the request, and would evict healthy proxies.
+
+    :param error: the exception raised by the request
+    :return: `throttled` for 429, `error` for network errors, timeouts
+        and 5xx responses, `None` for errors unrelated to the proxy
+    """
+    if is_throttled(error):
+        return "throttled"
+    if isinstance(
+        error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+    ):
+        return "error"
+    if isinstance(
+        error, (exceptions.ResponseError, requests.exceptions.RequestException)
+    ):
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+        if isinstance(status_code, int) and status_code >= 500:
+            return "error"
+
+    return None
@@ -1,5 +1,6 @@
 import datetime
 import os
+import re
 from functools import cached_property
 from typing import Dict, Optional, Union
 
@@ -9,8 +10,35 @@ from loguru import logger
 from serpapi import GoogleSearch
 
 from sm_trendy.use_serpapi.config import SerpAPIConfig, SerpAPIParams
+from sm_trendy.utilities.metrics import METRICS
+from sm_trendy.utilities.rate import AdaptiveRateController, ThrottledError
+from sm_trendy.utilities.schema import enforce_trend_schema
 from sm_trendy.utilities.storage import StoreDataFrame, StoreJSON
 
+# error messages of SerpAPI, e.g., "Your account has run out of searches."
+# is answered with a 429 but will not succeed on retry
+QUOTA_ERROR = re.compile(r"run out of searches|searches .* exhausted", re.IGNORECASE)
+THROTTLED_ERROR = re.compile(
+    r"too many requests|rate limit|throughput limit", re.IGNORECASE
+)
+
+
+class SerpAPIError(Exception):
+    """Error answered by SerpAPI, e.g., an invalid api key
+
+    :param error: the error message of SerpAPI
+    :param status_code: HTTP status code of the response
+    """
+
+    def __init__(self, error: str, status_code: Optional[int] = None):
+        super().__init__(f"Request failed with error {error}")
+        self.error = error
+        self.status_code = status_code
+
+
+class SerpAPIThrottledError(SerpAPIError, ThrottledError):
+    """SerpAPI throttled the request"""
+
 
 class SerpAPISingleTrend:
     def __init__(
@@ -24,20 +52,48 @@ class SerpAPISingleTrend:
         api_params = self.serpapi_params
 
         search = GoogleSearch(api_params)
-        results = search.get_dict()
-
-        self._check_status(results["search_metadata"]["status"])
+        # as search.get_dict, but keeping the status code of the response
+        search.params_dict["output"] = "json"
+        response = search.get_response()
+        try:
+            results = response.json()
+        except ValueError:
+            response.raise_for_status()
+            raise
+
+        if "error" in results and "search_metadata" not in results:
+            raise self._error(results["error"], status_code=response.status_code)
+        self._check_status(
+            results["search_metadata"]["status"], status_code=response.status_code
+        )
 
         return results
 
-    def _check_status(self, status: str):
+    @staticmethod
+    def _error(error: str, status_code: Optional[int] = None) -> SerpAPIError:
+        """Exception of an error answered by SerpAPI, a
+        [`SerpAPIThrottledError`][sm_trendy.use_serpapi.get_trends.SerpAPIThrottledError]
+        for rate limits, but not for an exhausted quota
+
+        :param error: the error message of SerpAPI
+        :param status_code: HTTP status code of the response
+        """
+        if QUOTA_ERROR.search(error) is None and (
+            status_code == 429 or THROTTLED_ERROR.search(error) is not None
+        ):
+            return SerpAPIThrottledError(error, status_code=status_code)
+
+        return SerpAPIError(error, status_code=status_code)
+
+    def _check_status(self, status: str, status_code: Optional[int] = None):
         if not status == "Success":
-            raise Exception(f"Request failed with error {status}")
+            raise self._error(status, status_code=status_code)
 
     @cached_property
     def dataframe(self) -> pd.DataFrame:
         """
-        Build the dataframe
+        Build the dataframe, following the
+        [`TREND_SCHEMA`][sm_trendy.utilities.schema.TREND_SCHEMA]
 
         :param keyword: keyword to be searched
         """
@@ -55,7 +111,7 @@ class SerpAPISingleTrend:
 
         df["date"] = pd.to_datetime(df.timestamp.astype(int), unit="s", origin="unix")
 
-        return df
+        return enforce_trend_schema(df)
 
     @staticmethod
     def _flatten_record(record: Dict):
@@ -79,16 +135,24 @@ class SerpAPIDownload:
 
     :params parent_folder: parent folder for the data
     :param snapshot_date: snapshot date for the path
-    :param trends_service: trend service
+    :param deduplicate: skip saving data identical to the previous snapshot,
+        the raw json response is then not saved either, the search
+        metadata is kept in the `metadata.json` of the dataframe
+    :param rate_controller: paces the requests, and adapts the rate
+        to the throttling of SerpAPI, no pacing by default
     """
 
     def __init__(
         self,
         parent_folder: AnyPath,
         snapshot_date: datetime.date,
+        deduplicate: bool = True,
+        rate_controller: Optional[AdaptiveRateController] = None,
     ):
         self.parent_folder = parent_folder
         self.snapshot_date = snapshot_date
+        self.deduplicate = deduplicate
+        self.rate_controller = rate_controller
 
     def __call__(self, config: SerpAPIConfig):
         """
@@ -100,7 +164,9 @@ class SerpAPIDownload:
         target_folder = path_params.path(parent_folder=self.parent_folder)
 
         sdf = StoreDataFrame(
-            target_folder=target_folder, snapshot_date=self.snapshot_date
+            target_folder=target_folder,
+            snapshot_date=self.snapshot_date,
+            deduplicate=self.deduplicate,
         )
 
         logger.info(
@@ -113,10 +179,26 @@ class SerpAPIDownload:
             serpapi_params=api_params, extra_metadata=config.extra_metadata
         )
 
-        logger.debug("Saving raw json format ...")
-        sj = StoreJSON(target_folder=target_folder, snapshot_date=self.snapshot_date)
-        sj.save(records=sst.search_results, formats=["json"])
+        if self.rate_controller is not None:
+            with self.rate_controller.request():
+                with METRICS.timer("fetch", "serpapi"):
+                    sst.search_results
+        else:
+            with METRICS.timer("fetch", "serpapi"):
+                sst.search_results
+
+        with METRICS.timer("parse", "serpapi"):
+            sst.dataframe
 
         logger.debug("Saving dataframe ...")
-        sdf.save(sst, formats=["csv", "parquet"])
+        deduplicated = sdf.save(sst, formats=["csv", "parquet"])
+
+        if deduplicated:
+            logger.debug("Identical to the previous snapshot, skip raw json format")
+        else:
+            logger.debug("Saving raw json format ...")
+            sj = StoreJSON(
+                target_folder=target_folder, snapshot_date=self.snapshot_date
+            )
+            sj.save(records=sst.search_results, formats=["json"])
         logger.info(f"Saved to {target_folder}")
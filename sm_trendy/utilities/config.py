@@ -66,6 +66,13 @@ class PathParams(BaseModel):
             ]
         )
 
+    @property
+    def partition(self) -> str:
+        """relative path of the data, e.g.,
+        `keyword=curtain/cat=0/geo=de/timeframe=today-5-y`
+        """
+        return "/".join(f"{k}={v}" for k, v in self.path_schema.items())
+
     def path(self, parent_folder: AnyPath) -> AnyPath:
         """build the path under the parent folder
 
@@ -83,7 +90,9 @@ class PathParams(BaseModel):
         self,
         base_url: str,
         snapshot_date: Union[datetime.date, Literal["latest"]] = "latest",
-        format: Optional[Literal["json"]] = "json",
+        format: Optional[
+            Literal["json", "json-compact", "json-monthly", "json-quarterly"]
+        ] = "json",
         filename: Optional[str] = "data.json",
     ):
         """
@@ -111,7 +120,9 @@ class PathParams(BaseModel):
         self,
         parent_folder: AnyPath,
         snapshot_date: Union[datetime.date, Literal["latest"]] = "latest",
-        format: Optional[Literal["json"]] = "json",
+        format: Optional[
+            Literal["json", "json-compact", "json-monthly", "json-quarterly"]
+        ] = "json",
         filename: Optional[str] = "data.json",
     ) -> AnyPath:
         """build the path under the parent folder, for specific file name and format
@@ -0,0 +1,300 @@
+import bisect
+import datetime
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from cloudpathlib import AnyPath
+from loguru import logger
+
+# from 100 microseconds, for the local reads and writes, to 30 seconds
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+)
+
+
+class StageTiming:
+    """Measurement of a stage, set `bytes` to record the size
+    of the data that went through the stage"""
+
+    __slots__ = ("bytes",)
+
+    def __init__(self):
+        self.bytes = 0
+
+
+class StageMetrics:
+    """Counters, bytes and latency histogram of a stage
+
+    :param buckets: upper bounds of the histogram, in seconds
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.bucket_counts = [0] * (len(buckets) + 1)
+
+    def observe(self, seconds: float, n_bytes: int = 0, error: bool = False):
+        self.count += 1
+        self.errors += error
+        self.bytes += n_bytes
+        self.seconds += seconds
+        self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Quantile of the latency, interpolated linearly
+        inside the histogram buckets, as `histogram_quantile`
+        of Prometheus
+
+        :param q: the quantile, e.g., `0.99`
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.bucket_counts):
+            if n and cumulative + n >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return round(
+                    lower + (self.buckets[i] - lower) * (rank - cumulative) / n, 6
+                )
+            cumulative += n
+
+        return self.buckets[-1]
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 6),
+            "mean_seconds": round(self.seconds / self.count, 6) if self.count else None,
+            **{f"p{int(q * 100)}_seconds": self.quantile(q) for q in (0.5, 0.95, 0.99)},
+        }
+
+
+class Metrics:
+    """
+    Timings of the stages of a run, e.g., `fetch`, `parse`,
+    `serialise`, `upload`, `list` and `read`
+
+    ```python
+    with METRICS.timer("serialise", "csv") as t:
+        body = dataframe.to_csv(index=False).encode("utf-8")
+        t.bytes = len(body)
+    ```
+
+    Each stage is further split by `kind`, e.g., the file
+    format or the source of the data. The counters, bytes and
+    latency histograms are kept in memory, and written at the end
+    of a run as a json report and as a Prometheus text file, see
+    [`write_report`][sm_trendy.utilities.metrics.Metrics.write_report].
+    The metrics are thread-safe.
+
+    :param buckets: upper bounds of the latency histograms, in seconds
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """start a new run"""
+        with self._lock:
+            self.stages: Dict[Tuple[str, str], StageMetrics] = {}
+            self.started_at = datetime.datetime.now(datetime.timezone.utc)
+            self._t0 = time.perf_counter()
+            self.run_folder: Optional[AnyPath] = None
+
+    def observe(
+        self,
+        stage: str,
+        kind: str,
+        seconds: float,
+        n_bytes: int = 0,
+        error: bool = False,
+    ):
+        """
+        Record a measurement
+
+        :param stage: the stage, e.g., `upload`
+        :param kind: kind of data, e.g., `csv`
+        :param seconds: duration of the stage
+        :param n_bytes: size of the data
+        :param error: whether the stage failed
+        """
+        with self._lock:
+            if (stage, kind) not in self.stages:
+                self.stages[(stage, kind)] = StageMetrics(self.buckets)
+            self.stages[(stage, kind)].observe(seconds, n_bytes=n_bytes, error=error)
+
+    @contextmanager
+    def timer(self, stage: str, kind: str) -> Iterator[StageTiming]:
+        """
+        Context manager that records the duration of the block,
+        as an error if it raises
+
+        :param stage: the stage, e.g., `upload`
+        :param kind: kind of data, e.g., `csv`
+        """
+        timing = StageTiming()
+        t0 = time.perf_counter()
+        error = False
+        try:
+            yield timing
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(
+                stage,
+                kind,
+                time.perf_counter() - t0,
+                n_bytes=timing.bytes,
+                error=error,
+            )
+
+    def report(self, command: str, summary: Optional[Dict] = None) -> Dict:
+        """
+        Run report
+
+        :param command: the command of the run, e.g., `download-serpapi`
+        :param summary: summary of the run, e.g., the number of
+            downloaded keywords
+        """
+        with self._lock:
+            stages = [
+                {"stage": stage, "kind": kind, **m.to_dict()}
+                for (stage, kind), m in sorted(self.stages.items())
+            ]
+        return {
+            "command": command,
+            "started_at": self.started_at.isoformat(),
+            "duration_seconds": round(time.perf_counter() - self._t0, 3),
+            "summary": summary or {},
+            "stages": stages,
+        }
+
+    def to_prometheus(self, command: str) -> str:
+        """
+        Metrics in the Prometheus text format, e.g., for the
+        textfile collector of the node exporter
+
+        :param command: the command of the run, added as a label
+        """
+        lines = [
+            "# HELP trendy_stage_seconds Duration of the stages of a run.",
+            "# TYPE trendy_stage_seconds histogram",
+        ]
+        counters = {
+            "trendy_stage_errors_total": "Failed stages of a run.",
+            "trendy_stage_bytes_total": "Bytes that went through the stages of a run.",
+        }
+        counter_lines: Dict[str, list] = {k: [] for k in counters}
+
+        with self._lock:
+            for (stage, kind), m in sorted(self.stages.items()):
+                labels = f'command="{command}",stage="{stage}",kind="{kind}"'
+                cumulative = 0
+                for le, n in zip(self.buckets, m.bucket_counts):
+                    cumulative += n
+                    lines.append(
+                        f'trendy_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}'
+                    )
+                lines.append(
+                    f'trendy_stage_seconds_bucket{{{labels},le="+Inf"}} {m.count}'
+                )
+                lines.append(f"trendy_stage_seconds_sum{{{labels}}} {m.seconds:.6f}")
+                lines.append(f"trendy_stage_seconds_count{{{labels}}} {m.count}")
+                counter_lines["trendy_stage_errors_total"].append(
+                    f"trendy_stage_errors_total{{{labels}}} {m.errors}"
+                )
+                counter_lines["trendy_stage_bytes_total"].append(
+                    f"trendy_stage_bytes_total{{{labels}}} {m.bytes}"
+                )
+
+        for name, help_text in counters.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines += counter_lines[name]
+        lines += [
+            "# HELP trendy_run_duration_seconds Duration of the run.",
+            "# TYPE trendy_run_duration_seconds gauge",
+            f'trendy_run_duration_seconds{{command="{command}"}} '
+            f"{time.perf_counter() - self._t0:.3f}",
+            "# HELP trendy_run_timestamp_seconds Start of the run.",
+            "# TYPE trendy_run_timestamp_seconds gauge",
+            f'trendy_run_timestamp_seconds{{command="{command}"}} '
+            f"{self.started_at.timestamp():.0f}",
+        ]
+
+        return "\n".join(lines) + "\n"
+
+    def write_report(
+        self, output_folder: AnyPath, command: str, summary: Optional[Dict] = None
+    ) -> AnyPath:
+        """
+        Write the json report and the Prometheus text file of a run to
+
+        ```
+        output_folder / "_runs" / "command=download-serpapi" / "run=20230731T100000Z"
+        ```
+
+        :param output_folder: output folder of the run
+        :param command: the command of the run
+        :param summary: summary of the run
+        :return: the folder of the report
+        """
+        from sm_trendy.utilities.storage import write_object
+
+        if not isinstance(output_folder, AnyPath):
+            output_folder = AnyPath(output_folder)
+        folder = (
+            output_folder
+            / "_runs"
+            / f"command={command}"
+            / f"run={self.started_at:%Y%m%dT%H%M%SZ}"
+        )
+        if isinstance(folder, Path):
+            folder.mkdir(parents=True, exist_ok=True)
+
+        report = json.dumps(self.report(command, summary=summary), indent=2)
+        prometheus = self.to_prometheus(command)
+        write_object(folder / "report.json", report.encode("utf-8"))
+        write_object(
+            folder / "metrics.prom",
+            prometheus.encode("utf-8"),
+            content_type="text/plain; version=0.0.4",
+        )
+        logger.info(f"Run report written to {folder}")
+        self.run_folder = folder
+
+        return folder
+
+
+METRICS = Metrics()
@@ -0,0 +1,215 @@
+import cProfile
+import datetime
+import io
+import marshal
+import os
+import pstats
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Literal, Optional, Tuple
+
+from cloudpathlib import AnyPath
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+
+from sm_trendy.utilities.metrics import METRICS
+from sm_trendy.utilities.storage import write_object
+
+
+class Profiler:
+    """
+    Profile a command, either the CPU time with `cProfile`,
+    or the allocations with `tracemalloc`
+
+    ```python
+    profiler = Profiler(mode="cpu")
+    profiler.start()
+    ...
+    profiler.stop(command="agg")
+    ```
+
+    On stop, the results are written next to the run report of the
+    command, see
+    [`Metrics.write_report`][sm_trendy.utilities.metrics.Metrics.write_report],
+    or to `profile_dir / "command=agg" / "run=20230731T100000Z"`
+    if the command has no run report.
+
+    * `cpu`: `profile.pstats`, to be loaded with `pstats.Stats`
+      or `snakeviz`, and `profile.txt` with the top functions by
+      cumulative time.
+    * `memory`: `memory.txt` with the top allocation sites.
+
+    The hottest functions of `package` are printed to stderr.
+
+    !!! note
+        `cProfile` only profiles the main thread, the downloads
+        and uploads running in thread pools are not included.
+
+    :param mode: `cpu` or `memory`
+    :param top_n: number of functions or allocation sites in the reports
+    :param profile_dir: folder of the results of commands without
+        a run report
+    :param package: package of the functions in the printed summary
+    """
+
+    def __init__(
+        self,
+        mode: Literal["cpu", "memory"] = "cpu",
+        top_n: int = 20,
+        profile_dir: AnyPath = Path("profiles"),
+        package: str = "sm_trendy",
+    ):
+        if mode not in ("cpu", "memory"):
+            raise ValueError(f"mode {mode} is not supported")
+        self.mode = mode
+        self.top_n = top_n
+        self.profile_dir = profile_dir
+        self.package = package
+        self._profile: Optional[cProfile.Profile] = None
+
+    def start(self):
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self._previous_run_folder = METRICS.run_folder
+        if self.mode == "cpu":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            tracemalloc.start(25)
+
+    def _in_package(self, filename: str) -> bool:
+        return f"{os.sep}{self.package}{os.sep}" in filename
+
+    def _module_name(self, filename: str, lineno: int) -> str:
+        """e.g., `sm_trendy.aggregate.agg:429`"""
+        relative = filename.rsplit(f"{os.sep}{self.package}{os.sep}", 1)[-1]
+        module = ".".join([self.package] + relative[:-3].split(os.sep))
+        return f"{module}:{lineno}"
+
+    def _output_folder(self, command: str) -> AnyPath:
+        if METRICS.run_folder not in (None, self._previous_run_folder):
+            return METRICS.run_folder
+
+        profile_dir = self.profile_dir
+        if not isinstance(profile_dir, AnyPath):
+            profile_dir = AnyPath(profile_dir)
+        folder = (
+            profile_dir / f"command={command}" / f"run={self.started_at:%Y%m%dT%H%M%SZ}"
+        )
+        if isinstance(folder, Path):
+            folder.mkdir(parents=True, exist_ok=True)
+
+        return folder
+
+    def stop(self, command: str) -> AnyPath:
+        """
+        Stop profiling, write the results and print the summary
+
+        :param command: the profiled command, e.g., `agg`
+        :return: the folder of the results
+        """
+        if self.mode == "cpu":
+            self._profile.disable()
+        else:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, __file__),
+                ]
+            )
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        folder = self._output_folder(command)
+        if self.mode == "cpu":
+            rows = self._stop_cpu(folder)
+            table = Table(title=f"Hottest {self.package} functions (cpu)")
+            for column in ["function", "calls", "tottime (s)", "cumtime (s)"]:
+                table.add_column(column)
+        else:
+            rows = self._stop_memory(folder, snapshot, current=current, peak=peak)
+            table = Table(title=f"Largest {self.package} allocations (memory)")
+            for column in ["line", "size (KiB)", "blocks"]:
+                table.add_column(column)
+
+        for row in rows[: min(self.top_n, 10)]:
+            table.add_row(*row)
+        Console(stderr=True).print(table)
+        logger.info(f"Profile written to {folder}")
+
+        return folder
+
+    def _stop_cpu(self, folder: AnyPath) -> List[Tuple[str, ...]]:
+        stats = pstats.Stats(self._profile)
+        write_object(
+            folder / "profile.pstats",
+            marshal.dumps(stats.stats),
+            content_type="application/octet-stream",
+        )
+
+        stream = io.StringIO()
+        pstats.Stats(self._profile, stream=stream).sort_stats("cumulative").print_stats(
+            self.top_n
+        )
+        write_object(
+            folder / "profile.txt",
+            stream.getvalue().encode("utf-8"),
+            content_type="text/plain",
+        )
+
+        functions = sorted(
+            (
+                (ct, tt, nc, filename, lineno, name)
+                for (filename, lineno, name), (_, nc, tt, ct, _) in stats.stats.items()
+                if self._in_package(filename)
+            ),
+            reverse=True,
+        )
+
+        return [
+            (
+                f"{self._module_name(filename, lineno)}({name})",
+                str(nc),
+                f"{tt:.3f}",
+                f"{ct:.3f}",
+            )
+            for ct, tt, nc, filename, lineno, name in functions
+        ]
+
+    def _stop_memory(
+        self, folder: AnyPath, snapshot: tracemalloc.Snapshot, current: int, peak: int
+    ) -> List[Tuple[str, ...]]:
+        # attribute each allocation to the innermost frame of the package
+        sites = defaultdict(lambda: [0, 0])
+        for trace in snapshot.traces:
+            for frame in reversed(trace.traceback):
+                if self._in_package(frame.filename):
+                    sites[(frame.filename, frame.lineno)][0] += trace.size
+                    sites[(frame.filename, frame.lineno)][1] += 1
+                    break
+        package_sites = sorted(sites.items(), key=lambda kv: kv[1][0], reverse=True)
+
+        lines = [
+            f"current: {current / 1024:.1f} KiB",
+            f"peak: {peak / 1024:.1f} KiB",
+            "",
+            f"Top {self.top_n} allocations of {self.package}:",
+        ]
+        lines += [
+            f"{self._module_name(filename, lineno)}: "
+            f"size={size / 1024:.1f} KiB, count={count}"
+            for (filename, lineno), (size, count) in package_sites[: self.top_n]
+        ]
+        lines += ["", f"Top {self.top_n} allocations:"]
+        lines += [str(s) for s in snapshot.statistics("lineno")[: self.top_n]]
+        write_object(
+            folder / "memory.txt",
+            "\n".join(lines).encode("utf-8") + b"\n",
+            content_type="text/plain",
+        )
+
+        return [
+            (self._module_name(filename, lineno), f"{size / 1024:.1f}", str(count))
+            for (filename, lineno), (size, count) in package_sites
+        ]
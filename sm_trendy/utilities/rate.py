@@ -0,0 +1,244 @@
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Literal, Optional
+
+import requests
+from loguru import logger
+from pytrends import exceptions
+
+
+class ThrottledError(Exception):
+    """The upstream throttled the request, e.g., SerpAPI
+    answered with a rate limit error"""
+
+
+def is_throttled(error: Exception) -> bool:
+    """
+    Whether a failed request was throttled by the upstream:
+    a [`ThrottledError`][sm_trendy.utilities.rate.ThrottledError],
+    or a 429 from google or any other server
+
+    :param error: the exception raised by the request
+    """
+    if isinstance(error, (ThrottledError, exceptions.TooManyRequestsError)):
+        return True
+    response = getattr(error, "response", None)
+    if isinstance(error, requests.exceptions.HTTPError) and response is not None:
+        return response.status_code == 429
+
+    return False
+
+
+class AdaptiveRateController:
+    """
+    Request rate that adapts to the upstream with additive
+    increase and multiplicative decrease (AIMD)
+
+    ```python
+    rate_controller = AdaptiveRateController(interval=10, min_interval=2)
+    for c in configs:
+        with rate_controller.request():
+            download(c)
+    ```
+
+    Each success increases the rate by `increase` requests per second,
+    up to one request every `min_interval` seconds. Each throttled
+    request, see [`is_throttled`][sm_trendy.utilities.rate.is_throttled],
+    multiplies the rate by `decrease`, down to one request every
+    `max_interval` seconds, and delays the next request by a jittered
+    exponential backoff. The intervals between requests are jittered
+    by `jitter`, e.g., ±10%.
+
+    After `failure_threshold` throttled requests in a row, the circuit
+    opens: no request is sent for `cooldown` seconds. Then a single
+    request probes the upstream (half-open), the other callers wait for
+    its outcome. A success closes the circuit, a throttled request opens
+    it again. A probe that fails for another reason opens the circuit
+    without cooldown, and the next request probes again.
+
+    The controller is thread-safe, concurrent callers of
+    [`wait`][sm_trendy.utilities.rate.AdaptiveRateController.wait]
+    are given consecutive slots.
+
+    :param interval: initial seconds between two requests
+    :param min_interval: minimum seconds between two requests
+    :param max_interval: maximum seconds between two requests
+    :param increase: additive increase of the rate in requests per second,
+        a tenth of the initial rate by default
+    :param decrease: multiplicative decrease of the rate
+    :param jitter: relative jitter of the intervals
+    :param failure_threshold: throttled requests in a row that open the circuit
+    :param cooldown: seconds the circuit stays open
+    :param name: name of the controller in the logs
+    """
+
+    def __init__(
+        self,
+        interval: float = 10,
+        min_interval: float = 1,
+        max_interval: float = 600,
+        increase: Optional[float] = None,
+        decrease: float = 0.5,
+        jitter: float = 0.1,
+        failure_threshold: int = 5,
+        cooldown: float = 300,
+        name: str = "upstream",
+    ):
+        self.max_rate = 1 / min_interval if min_interval > 0 else math.inf
+        self.min_rate = 1 / max_interval
+        self.decrease = decrease
+        self.jitter = jitter
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.name = name
+
+        self.rate = min(
+            max(1 / interval if interval > 0 else math.inf, self.min_rate),
+            self.max_rate,
+        )
+        self.increase = self.rate / 10 if increase is None else increase
+        self.state: Literal["closed", "open", "half-open"] = "closed"
+        self.consecutive_throttles = 0
+        self.successes = 0
+        self.throttles = 0
+        self.next_request_at = 0.0
+        self.open_until = 0.0
+        self.probing = False
+        self._lock = threading.Lock()
+        self._probe_resolved = threading.Condition(self._lock)
+
+    @property
+    def interval(self) -> float:
+        """current seconds between two requests"""
+        return 1 / self.rate
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def ready(self, now: Optional[float] = None) -> bool:
+        """whether a request can be sent now"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.probing or (self.state == "open" and self.open_until > now):
+                return False
+            return self.next_request_at <= now
+
+    def reserve(self, now: Optional[float] = None) -> float:
+        """
+        Reserve the next slot
+
+        While a probe is in flight, blocks until its outcome is
+        recorded. The first caller after the cooldown is the probe.
+
+        :return: seconds to wait before sending the request
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.probing:
+                while self.probing:
+                    self._probe_resolved.wait()
+                now = time.monotonic()
+            start = max(now, self.next_request_at)
+            if self.state == "open":
+                start = max(start, self.open_until)
+                self.state = "half-open"
+                self.probing = True
+                logger.info(f"[{self.name}] circuit half-open, probing ...")
+            self.next_request_at = start + self._jittered(self.interval)
+
+            return start - now
+
+    def wait(self):
+        """sleep until the next slot"""
+        seconds = self.reserve()
+        if seconds > 0:
+            logger.info(
+                f"[{self.name}] waiting {seconds:.1f} seconds, "
+                f"rate {60 * self.rate:.2f} requests/minute"
+            )
+            time.sleep(seconds)
+
+    def success(self):
+        """record a successful request"""
+        with self._lock:
+            self.successes += 1
+            self.consecutive_throttles = 0
+            if self.state != "closed":
+                logger.info(f"[{self.name}] circuit closed")
+                self.state = "closed"
+            self.rate = min(self.rate + self.increase, self.max_rate)
+            self._resolve_probe()
+
+    def failed(self):
+        """record a request that failed for another reason than
+        throttling, e.g., an invalid keyword: the rate is unchanged,
+        a failed probe opens the circuit again, without cooldown, so
+        that the next request probes the upstream again"""
+        with self._lock:
+            if self.state == "half-open":
+                self.state = "open"
+                self.open_until = time.monotonic()
+            self._resolve_probe()
+
+    def _resolve_probe(self):
+        """wake up the callers waiting for the probe, under `_lock`"""
+        if self.probing:
+            self.probing = False
+            self._probe_resolved.notify_all()
+
+    def throttled(self):
+        """record a throttled request"""
+        with self._lock:
+            now = time.monotonic()
+            self.throttles += 1
+            self.consecutive_throttles += 1
+            self.rate = max(self.rate * self.decrease, self.min_rate)
+
+            backoff = min(
+                self.interval * 2 ** min(self.consecutive_throttles - 1, 10),
+                1 / self.min_rate,
+            )
+            self.next_request_at = max(
+                self.next_request_at,
+                now + random.uniform(self.interval, max(backoff, self.interval)),
+            )
+
+            if (
+                self.state == "half-open"
+                or self.consecutive_throttles >= self.failure_threshold
+            ):
+                self.state = "open"
+                self.open_until = now + self.cooldown
+                logger.warning(
+                    f"[{self.name}] circuit open for {self.cooldown:.0f} seconds "
+                    f"after {self.consecutive_throttles} throttled requests"
+                )
+            else:
+                logger.warning(
+                    f"[{self.name}] throttled, rate cut to "
+                    f"{60 * self.rate:.2f} requests/minute"
+                )
+            self._resolve_probe()
+
+    @contextmanager
+    def request(self) -> Iterator[None]:
+        """
+        Context manager that waits for the next slot, and records
+        the outcome of the block. Errors that are not throttling
+        do not change the rate, see
+        [`failed`][sm_trendy.utilities.rate.AdaptiveRateController.failed].
+        """
+        self.wait()
+        try:
+            yield
+        except BaseException as e:
+            if isinstance(e, Exception) and is_throttled(e):
+                self.throttled()
+            else:
+                self.failed()
+            raise
+        else:
+            self.success()
@@ -0,0 +1,271 @@
+import datetime
+import heapq
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Literal, Optional, Tuple
+
+import requests
+from loguru import logger
+
+from sm_trendy.use_serpapi.config import SerpAPIConfig
+from sm_trendy.utilities.rate import is_throttled
+
+Failure = Literal["transient", "permanent"]
+
+
+def classify_failure(error: Exception) -> Failure:
+    """
+    Whether a failed download is worth retrying
+
+    Throttled requests, see
+    [`is_throttled`][sm_trendy.utilities.rate.is_throttled],
+    network errors, timeouts and 5xx responses are transient.
+    Everything else, e.g., an invalid api key, an exhausted quota
+    of searches, a missing manual file or an unexpected response,
+    is permanent.
+
+    :param error: the exception raised by the download
+    """
+    if is_throttled(error):
+        return "transient"
+    if isinstance(
+        error,
+        (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            ConnectionError,
+            TimeoutError,
+        ),
+    ):
+        return "transient"
+    # requests errors hold the response, SerpAPI errors the status code
+    status_code = getattr(
+        getattr(error, "response", None),
+        "status_code",
+        getattr(error, "status_code", None),
+    )
+    if isinstance(status_code, int) and status_code >= 500:
+        return "transient"
+
+    return "permanent"
+
+
+class DeadLetterFile:
+    """
+    JSONL file of the keywords that still fail after the retries
+
+    Each line holds the serpapi params of the keyword, without the
+    api key, and the last error,
+
+    ```json
+    {"serpapi": {"q": "phone case", "geo": "DE", ...}, "error": "...", "error_type": "Exception", "failure": "transient", "attempts": 3, "failed_at": "2023-07-31T10:00:00+00:00"}
+    ```
+
+    so that a follow-up run downloads only the failures, see
+    [`load`][sm_trendy.utilities.retry.DeadLetterFile.load].
+    The file only exists if some keywords failed.
+
+    :param path: path of the JSONL file
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """remove the failures of a previous run"""
+        with self._lock:
+            self.path.unlink(missing_ok=True)
+            self.count = 0
+
+    def write(
+        self, config: SerpAPIConfig, error: Exception, failure: Failure, attempts: int
+    ):
+        """
+        Append a failed keyword
+
+        :param config: config of the keyword
+        :param error: the last exception raised by the download
+        :param failure: `transient` or `permanent`
+        :param attempts: number of attempts
+        """
+        record = {
+            "serpapi": config.serpapi_params.model_dump(
+                exclude_none=True, exclude={"api_key"}
+            ),
+            "error": str(error),
+            "error_type": type(error).__name__,
+            "failure": failure,
+            "attempts": attempts,
+            "failed_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as fp:
+                fp.write(json.dumps(record) + "\n")
+            self.count += 1
+
+    @staticmethod
+    def load(path: Path) -> List[Dict]:
+        """
+        Keyword configs of a dead-letter file, to replace the
+        `keywords` of a serpapi config file
+
+        ```python
+        scb = SerpAPIConfigBundle(file_path=config_file, serpapi_key=api_key)
+        scb.raw_configs["keywords"] = DeadLetterFile.load("dead_letter.jsonl")
+        ```
+
+        :param path: path of the JSONL file
+        """
+        with open(path, "r") as fp:
+            return [
+                {"serpapi": json.loads(line)["serpapi"]} for line in fp if line.strip()
+            ]
+
+
+class RetryQueue:
+    """
+    Run a download on each config, and retry the transient failures
+    later in the same run
+
+    ```python
+    rq = RetryQueue(
+        SerpAPIDownload(parent_folder=parent_folder, snapshot_date=today),
+        dead_letter=DeadLetterFile("dead_letter.jsonl"),
+    )
+    rq(scb)
+    ```
+
+    A config that fails with a transient error, see
+    [`classify_failure`][sm_trendy.utilities.retry.classify_failure],
+    goes back onto a delayed queue: it is retried after `backoff`
+    seconds, doubled at each attempt up to `max_backoff`, while
+    the other configs are downloaded. Configs that fail with a
+    permanent error, or after `max_attempts` attempts, are written
+    to the dead-letter file.
+
+    With `max_workers > 1`, the configs are processed in a thread pool,
+    e.g., to upload the manual downloads concurrently.
+
+    :param func: the download, called with each config
+    :param max_attempts: maximum attempts of a config
+    :param backoff: seconds before the first retry
+    :param max_backoff: maximum seconds before a retry
+    :param jitter: relative jitter of the delays
+    :param dead_letter: where to write the configs that still fail
+    :param max_workers: number of configs processed concurrently,
+        `func` should be thread-safe if more than one
+    """
+
+    def __init__(
+        self,
+        func: Callable[[SerpAPIConfig], Any],
+        max_attempts: int = 3,
+        backoff: float = 60,
+        max_backoff: float = 900,
+        jitter: float = 0.1,
+        dead_letter: Optional[DeadLetterFile] = None,
+        max_workers: int = 1,
+    ):
+        self.func = func
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.dead_letter = dead_letter
+        self.max_workers = max_workers
+
+    def delay(self, attempt: int) -> float:
+        """seconds before retrying a config that failed `attempt` times"""
+        seconds = min(self.backoff * 2 ** min(attempt - 1, 16), self.max_backoff)
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def __call__(self, configs: Iterable[SerpAPIConfig]) -> Dict[str, int]:
+        """
+        :param configs: configs of the keywords
+        :return: number of configs that `succeeded`, number
+            of `retries`, and number of configs that `failed`
+        """
+        if self.dead_letter is not None:
+            self.dead_letter.reset()
+
+        pending = deque(configs)
+        retries: List = []
+        running: Dict[Future, Tuple[int, SerpAPIConfig]] = {}
+        summary = {"succeeded": 0, "retries": 0, "failed": 0}
+        sequence = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or retries or running:
+                now = time.monotonic()
+                while len(running) < self.max_workers:
+                    if retries and retries[0][0] <= now:
+                        _, _, attempt, config = heapq.heappop(retries)
+                    elif pending:
+                        attempt, config = 1, pending.popleft()
+                    else:
+                        break
+                    running[executor.submit(self.func, config)] = (attempt, config)
+
+                if not running:
+                    ready_at, _, _, config = retries[0]
+                    logger.info(
+                        f"Waiting {ready_at - now:.0f} seconds to retry "
+                        f"{config.serpapi_params.q}"
+                    )
+                    time.sleep(ready_at - now)
+                    continue
+
+                done, _ = wait(
+                    running,
+                    timeout=max(retries[0][0] - now, 0) if retries else None,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    attempt, config = running.pop(future)
+                    e = future.exception()
+                    if e is None:
+                        summary["succeeded"] += 1
+                        continue
+
+                    failure = classify_failure(e)
+                    if failure == "transient" and attempt < self.max_attempts:
+                        delay = self.delay(attempt)
+                        logger.warning(
+                            f"Transient failure of {config.serpapi_params.q}, "
+                            f"attempt {attempt}/{self.max_attempts}, "
+                            f"retry in {delay:.0f} seconds: {e}"
+                        )
+                        heapq.heappush(
+                            retries,
+                            (time.monotonic() + delay, sequence, attempt + 1, config),
+                        )
+                        sequence += 1
+                        summary["retries"] += 1
+                        continue
+
+                    logger.error(
+                        "Can not download: \n"
+                        f"config: {config}\n"
+                        f" error ({failure}, {attempt} attempts): {e}"
+                    )
+                    summary["failed"] += 1
+                    if self.dead_letter is not None:
+                        self.dead_letter.write(
+                            config, error=e, failure=failure, attempts=attempt
+                        )
+
+        logger.info(f"Downloads: {summary}")
+        if summary["failed"] and self.dead_letter is not None:
+            logger.warning(
+                f"{summary['failed']} failed keywords written to {self.dead_letter.path}"
+            )
+
+        return summary
@@ -0,0 +1,111 @@
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+TREND_CATEGORY_COLUMNS = ["query", "geo", "timeframe", "cat", "date_range"]
+
+TREND_SCHEMA: Dict[str, str] = {
+    **{c: "category" for c in TREND_CATEGORY_COLUMNS},
+    "date": "datetime64[ns]",
+    "timestamp": "int64",
+    "extracted_value": "uint8",
+    "below_one": "bool",
+}
+"""dtypes of the columns in a trend dataframe
+
+Google reports values between 0 and 100, or `"<1"` for very low
+interest. We keep the values as `uint8`, with `"<1"` stored as 0 and
+flagged in `below_one`. The string representation `value` returned
+by SerpAPI is dropped as it is fully described by these two columns.
+"""
+
+
+def enforce_trend_schema(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """Convert a trend dataframe to the compact dtypes in
+    [`TREND_SCHEMA`][sm_trendy.utilities.schema.TREND_SCHEMA]
+
+    Columns not in the schema are kept as is, and columns
+    in the schema are optional. The conversion is idempotent,
+    so that frames loaded from disk can be passed in again.
+
+    :param dataframe: trend dataframe, e.g., from SerpAPI,
+        a manual download, or loaded from csv files.
+    """
+    df = dataframe.copy()
+
+    if "extracted_value" in df.columns:
+        df = _split_below_one(df)
+
+    for c in TREND_CATEGORY_COLUMNS:
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype(str).astype("category")
+
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"], format="ISO8601")
+
+    if "timestamp" in df.columns:
+        df["timestamp"] = pd.to_numeric(df["timestamp"]).astype(
+            TREND_SCHEMA["timestamp"]
+        )
+
+    return df
+
+
+def _split_below_one(df: pd.DataFrame) -> pd.DataFrame:
+    """convert `extracted_value` to uint8 with a separate `"<1"` flag"""
+    values = df["extracted_value"]
+
+    below_one = pd.Series(False, index=df.index)
+    if "below_one" in df.columns:
+        below_one |= df["below_one"].astype(bool)
+    if values.dtype == object:
+        below_one |= values.astype(str).str.strip() == "<1"
+    if "value" in df.columns:
+        below_one |= df["value"].astype(str).str.strip() == "<1"
+        df = df.drop(columns=["value"])
+
+    values = pd.to_numeric(values.where(~below_one, 0))
+    if ((values < 0) | (values > 100)).any():
+        raise ValueError("extracted_value should be between 0 and 100")
+
+    df["extracted_value"] = values.astype(TREND_SCHEMA["extracted_value"])
+    if "below_one" in df.columns:
+        df["below_one"] = below_one
+    else:
+        df.insert(df.columns.get_loc("extracted_value") + 1, "below_one", below_one)
+
+    return df
+
+
+def format_dates(dates: pd.Series, starts: Optional[np.ndarray] = None) -> pd.Series:
+    """Format datetimes as iso strings, the time is only
+    included if any of the datetimes is not at midnight.
+
+    :param dates: datetime series
+    :param starts: positions of the first rows of consecutive groups,
+        e.g., of the series of a bundle, to decide on the format of each
+        group separately. The whole series is a single group by default.
+    """
+    values = dates.values.astype("datetime64[s]")
+    midnight = values == values.astype("datetime64[D]")
+    if starts is None:
+        dates_only = midnight.all()
+    else:
+        dates_only = np.repeat(
+            np.logical_and.reduceat(midnight, starts),
+            np.diff(np.append(starts, len(values))),
+        )
+
+    if np.all(dates_only):
+        formatted = np.datetime_as_string(values, unit="D")
+    elif not np.any(dates_only):
+        formatted = np.char.replace(np.datetime_as_string(values, unit="s"), "T", " ")
+    else:
+        formatted = np.where(
+            dates_only,
+            np.datetime_as_string(values, unit="D"),
+            np.char.replace(np.datetime_as_string(values, unit="s"), "T", " "),
+        )
+
+    return pd.Series(formatted, index=dates.index, name=dates.name, dtype=object)
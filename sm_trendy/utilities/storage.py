@@ -1,12 +1,261 @@
+import base64
 import datetime
+import gzip
+import hashlib
+import io
 import json
+import re
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 from cloudpathlib import AnyPath, CloudPath, S3Path
 from loguru import logger
 
+from sm_trendy.utilities.metrics import METRICS
+
+RE_SNAPSHOT_DATE = re.compile(r"snapshot_date=(\d{4}-\d{2}-\d{2})")
+# first non-whitespace byte of a json object or array
+JSON_START = re.compile(rb"\s*[\[{]")
+
+
+def list_snapshot_dates(path: AnyPath) -> List[str]:
+    """List the snapshot dates found inside a format folder,
+    e.g., `target_folder / "format=csv"`
+
+    :param path: folder that holds the `snapshot_date=` subfolders
+    :return: iso formatted snapshot dates, sorted ascending
+    """
+    try:
+        with METRICS.timer("list", "snapshot_date"):
+            path_subfolders = list(path.iterdir())
+    except FileNotFoundError:
+        return []
+
+    snapshot_dates = sum(
+        [RE_SNAPSHOT_DATE.findall(i.name) for i in path_subfolders], []
+    )  # type: List[str]
+
+    return sorted(snapshot_dates, key=lambda x: datetime.date.fromisoformat(x))
+
+
+def is_empty_folder(folder: AnyPath) -> bool:
+    """Whether a folder is missing or empty, without listing it
+
+    On S3, at most one key is listed under the prefix of the folder.
+
+    :param folder: local or S3 folder
+    """
+    if isinstance(folder, S3Path):
+        prefix = folder.key.rstrip("/")
+        response = folder.client.client.list_objects_v2(
+            Bucket=folder.bucket, Prefix=f"{prefix}/" if prefix else "", MaxKeys=1
+        )
+        return response.get("KeyCount", 0) == 0
+
+    if not folder.exists():
+        return True
+    return next(iter(folder.iterdir()), None) is None
+
+
+def dataframe_content_hash(dataframe: pd.DataFrame) -> str:
+    """Compute a canonical content hash of a dataframe
+
+    The hash only depends on the column names, dtypes, index and values.
+    The order of the columns does not matter.
+
+    :param dataframe: dataframe to be hashed
+    :return: hex digest of the sha256 hash
+    """
+    df = dataframe[sorted(dataframe.columns, key=str)]
+
+    hasher = hashlib.sha256()
+    for c in df.columns:
+        hasher.update(f"{c}:{df[c].dtype};".encode("utf-8"))
+    hasher.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+
+    return hasher.hexdigest()
+
+
+def resolve_data_path(data_path: AnyPath) -> AnyPath:
+    """Resolve the data path of a snapshot.
+
+    A deduplicated snapshot has no data file but a pointer
+    to the snapshot holding the identical data, recorded
+    in its `metadata.json`, e.g.,
+
+    ```json
+    {"storage": {"content_hash": "...", "pointer": "2023-07-26"}}
+    ```
+
+    :param data_path: path to the data file, e.g.,
+        `target_folder / "format=csv" / "snapshot_date=2023-07-27" / "data.csv"`
+    :return: path to the file that actually holds the data
+    """
+    if data_path.exists():
+        return data_path
+
+    metadata_path = data_path.parent / "metadata.json"
+    if not metadata_path.exists():
+        raise FileNotFoundError(f"Neither data nor metadata exists: {data_path}")
+
+    with metadata_path.open("r") as fp:
+        metadata = json.load(fp)
+
+    pointer = metadata.get("storage", {}).get("pointer")
+    if pointer is None:
+        raise FileNotFoundError(f"Data file does not exist: {data_path}")
+
+    resolved = data_path.parent.parent / f"snapshot_date={pointer}" / data_path.name
+    logger.debug(f"Resolved pointer {data_path} -> {resolved}")
+
+    return resolved
+
+
+def read_arrow_table(data_path: AnyPath, memory_map: bool = True) -> pa.Table:
+    """Read a parquet or feather file as an Arrow table
+
+    Local feather files are memory-mapped, so that the
+    columns are accessed without copying or decoding.
+    Files on S3 are always read into memory.
+
+    :param data_path: path to the `data.parquet` or `data.feather` file
+    :param memory_map: whether to memory-map local files
+    """
+    if not isinstance(data_path, (Path, S3Path)):
+        data_path = AnyPath(data_path)
+
+    if data_path.suffix == ".feather":
+        if memory_map and isinstance(data_path, Path):
+            source = pa.memory_map(str(data_path), "r")
+        else:
+            source = pa.py_buffer(data_path.read_bytes())
+        return pa.ipc.open_file(source).read_all()
+    elif data_path.suffix == ".parquet":
+        if isinstance(data_path, S3Path):
+            return pq.read_table(pa.py_buffer(data_path.read_bytes()))
+        return pq.read_table(str(data_path), memory_map=memory_map)
+    else:
+        raise ValueError(f"Not an arrow compatible file: {data_path}")
+
+
+def compress(body: bytes, content_encoding: Optional[Literal["gzip", "br"]]) -> bytes:
+    """Compress the body for the given `Content-Encoding`
+
+    gzip is written without a timestamp, so that
+    identical content results in identical bytes and ETags.
+    brotli requires the optional package `brotli`.
+
+    :param body: bytes to be compressed
+    :param content_encoding: `gzip`, `br` or None for no compression
+    """
+    if content_encoding is None:
+        return body
+    elif content_encoding == "gzip":
+        return gzip.compress(body, mtime=0)
+    elif content_encoding == "br":
+        return _brotli().compress(body)
+    else:
+        raise ValueError(f"content_encoding {content_encoding} is not supported")
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError as e:
+        raise ImportError(
+            "brotli is required for br content encoding: pip install brotli"
+        ) from e
+    return brotli
+
+
+def decompress(body: bytes, content_encoding: Optional[str] = None) -> bytes:
+    """Decompress a body written by
+    [`write_object`][sm_trendy.utilities.storage.write_object]
+
+    If the `Content-Encoding` of the object is not given, gzip is
+    detected by the magic bytes, and json by its first non-whitespace
+    byte, `{` or `[`. Other bodies are decompressed with brotli.
+
+    :param body: raw bytes of the object
+    :param content_encoding: `Content-Encoding` of the object, e.g.,
+        from the S3 metadata, `gzip`, `br` or `identity`
+    """
+    if content_encoding is None:
+        if body[:2] == b"\x1f\x8b":
+            content_encoding = "gzip"
+        elif not body or JSON_START.match(body):
+            content_encoding = "identity"
+        else:
+            content_encoding = "br"
+
+    if content_encoding == "gzip":
+        return gzip.decompress(body)
+    elif content_encoding == "br":
+        return _brotli().decompress(body)
+    elif content_encoding == "identity":
+        return body
+    else:
+        raise ValueError(f"content_encoding {content_encoding} is not supported")
+
+
+def write_object(
+    target_path: AnyPath,
+    body: bytes,
+    content_type: str = "application/json",
+    content_encoding: Optional[Literal["gzip", "br"]] = None,
+    cache_control: Optional[str] = None,
+) -> str:
+    """Write bytes to a file, with HTTP headers on S3
+
+    On S3, the object is uploaded with `Content-Type`,
+    `Content-Encoding` and `Cache-Control`. The `Content-MD5`
+    is sent along, so that S3 verifies the body and the ETag
+    is the MD5 of the (compressed) content.
+    Local files only get the (compressed) content.
+
+    :param target_path: the target file full path
+    :param body: uncompressed bytes to be written
+    :param content_type: `Content-Type` of the object
+    :param content_encoding: compress the body with `gzip` or `br`
+    :param cache_control: `Cache-Control` of the object,
+        e.g., `public, max-age=3600`
+    :return: the strong ETag of the object
+    """
+    if content_encoding is not None:
+        with METRICS.timer("serialise", content_encoding) as t:
+            body = compress(body, content_encoding=content_encoding)
+            t.bytes = len(body)
+    md5 = hashlib.md5(body)
+    etag = f'"{md5.hexdigest()}"'
+
+    with METRICS.timer("upload", target_path.suffix.lstrip(".") or "object") as t:
+        t.bytes = len(body)
+        if isinstance(target_path, S3Path):
+            headers = {"ContentType": content_type}
+            if content_encoding is not None:
+                headers["ContentEncoding"] = content_encoding
+            if cache_control is not None:
+                headers["CacheControl"] = cache_control
+
+            target_path.client.client.put_object(
+                Bucket=target_path.bucket,
+                Key=target_path.key,
+                Body=body,
+                ContentMD5=base64.b64encode(md5.digest()).decode("ascii"),
+                **headers,
+            )
+        else:
+            with target_path.open("wb") as fp:
+                fp.write(body)
+
+    logger.debug(f"Written {len(body)} bytes to {target_path} (ETag: {etag})")
+
+    return etag
+
 
 class StoreDataFrame:
     """Save dataframe
@@ -26,14 +275,31 @@ class StoreDataFrame:
     / "geo=de" / "timeframe=today-5-y"
     ```
 
+    The dataframe is serialised in memory and uploaded as
+    a single object, see
+    [`write_object`][sm_trendy.utilities.storage.write_object].
+
+    With `deduplicate=True`, the content hash of the dataframe
+    is compared to the previous snapshot. If they are identical,
+    only `metadata.json` is written, with a pointer to the snapshot
+    that holds the data. Use [`resolve_data_path`][sm_trendy.utilities.storage.resolve_data_path]
+    to find the data file of a snapshot.
+
     :param target_folder: parent folder for the data.
         Note that subfolders will be created inside it.
     :param snapshot_date: the date when the data was produced.
         Please stick to UTC date.
+    :param deduplicate: skip writing data identical to the previous snapshot
     """
 
-    def __init__(self, target_folder: AnyPath, snapshot_date: datetime.date):
+    def __init__(
+        self,
+        target_folder: AnyPath,
+        snapshot_date: datetime.date,
+        deduplicate: bool = False,
+    ):
         self.target_folder = target_folder
+        self.deduplicate = deduplicate
 
         if not isinstance(snapshot_date, datetime.date):
             raise TypeError(
@@ -45,42 +311,107 @@ class StoreDataFrame:
     def save(
         self,
         trend_data: Any,
-        formats: Optional[List[Literal["parquet", "csv"]]],
-    ):
+        formats: Optional[List[Literal["parquet", "csv", "feather"]]],
+    ) -> bool:
         """
         Save the trend results
 
         :param trend_data: the object containing the dataframe and metadata
         :param formats: which formats to save as
+        :return: whether all formats were written as pointers
+            to a previous snapshot, see `deduplicate`
         """
         df = trend_data.dataframe
         metadata = trend_data.metadata
 
         format_dispatcher = {
-            "parquet": {
-                "method": self._save_parquet,
-                "path": self._file_path(format="parquet"),
-            },
-            "csv": {
-                "method": self._save_csv,
-                "path": self._file_path(format="csv"),
-            },
+            "parquet": {"method": self._save_parquet},
+            "csv": {"method": self._save_csv},
+            "feather": {"method": self._save_feather},
         }
+        for f in formats:
+            if f in format_dispatcher:
+                format_dispatcher[f]["path"] = self._file_path(format=f)
+
+        content_hash = dataframe_content_hash(df) if self.deduplicate else None
 
+        pointers = []
         for f in formats:
             try:
                 f_method = format_dispatcher[f]["method"]
                 f_path_data = format_dispatcher[f]["path"]["data"]  # type: ignore
                 f_path_metadata = format_dispatcher[f]["path"]["metadata"]  # type: ignore
 
-                f_method(dataframe=df, target_path=f_path_data)  # type: ignore
-                self._save_metadata(metadata=metadata, target_path=f_path_metadata)
+                if content_hash is None:
+                    f_metadata = metadata
+                    f_method(dataframe=df, target_path=f_path_data)  # type: ignore
+                else:
+                    f_storage = self._deduplicate(
+                        format=f, content_hash=content_hash, target_path=f_path_data
+                    )
+                    if "pointer" not in f_storage:
+                        f_method(dataframe=df, target_path=f_path_data)  # type: ignore
+                    f_metadata = {**metadata, "storage": f_storage}
+
+                self._save_metadata(metadata=f_metadata, target_path=f_path_metadata)
+                pointers.append("pointer" in f_metadata.get("storage", {}))
             except Exception as e:
                 logger.error(f"can not save format {f}: {e}")
+                pointers.append(False)
 
-        df = trend_data.dataframe
+        return bool(pointers) and all(pointers)
 
-    def _file_path(self, format: Literal["parquet", "csv"]) -> Dict[str, AnyPath]:
+    def _deduplicate(
+        self, format: str, content_hash: str, target_path: AnyPath
+    ) -> Dict[str, str]:
+        """Compare the content hash to the previous snapshot
+
+        :param format: the file format to be used
+        :param content_hash: content hash of the dataframe to be saved
+        :param target_path: the target file full path of the data
+        :return: storage metadata, with a `pointer` to the
+            snapshot that holds the data if the content is identical
+        """
+        storage = {"content_hash": content_hash}
+
+        snapshot_date = self.snapshot_date.isoformat()
+        snapshot_dates = list_snapshot_dates(self.target_folder / f"format={format}")
+        previous_dates = [d for d in snapshot_dates if d < snapshot_date]
+        if not previous_dates:
+            return storage
+
+        previous_metadata_path = (
+            self.target_folder
+            / f"format={format}"
+            / f"snapshot_date={previous_dates[-1]}"
+            / "metadata.json"
+        )
+        try:
+            with previous_metadata_path.open("r") as fp:
+                previous_storage = json.load(fp).get("storage", {})
+        except Exception as e:
+            logger.debug(
+                f"can not load previous metadata {previous_metadata_path}: {e}"
+            )
+            return storage
+
+        if previous_storage.get("content_hash") != content_hash:
+            return storage
+
+        storage["pointer"] = previous_storage.get("pointer", previous_dates[-1])
+        logger.info(
+            f"Identical to snapshot {storage['pointer']}, "
+            f"skip saving {format} data to {target_path}"
+        )
+        if snapshot_date in snapshot_dates and target_path.exists():
+            # remove data written by an earlier run on the same day
+            target_path.unlink()
+
+        return storage
+
+    def _file_path(
+        self, format: Literal["parquet", "csv", "feather"]
+    ) -> Dict[str, AnyPath]:
         """Compute the full path for the target file
         based on the format
 
@@ -104,14 +435,13 @@ class StoreDataFrame:
         :param dataframe: dataframe to be saved as file
         :param target_path: the target file full path
         """
-        if isinstance(target_path, S3Path):
-            target_path = str(target_path)
-            logger.debug(
-                "Converting S3Path to string for pandas compatability\n"
-                f"{type(target_path)}: {target_path}"
-            )
         logger.debug(f"Saving parquet format to {target_path} ...")
-        dataframe.to_parquet(target_path)
+        with METRICS.timer("serialise", "parquet") as t:
+            buffer = io.BytesIO()
+            dataframe.to_parquet(buffer)
+            body = buffer.getvalue()
+            t.bytes = len(body)
+        write_object(target_path, body, content_type="application/octet-stream")
 
     def _save_csv(self, dataframe: pd.DataFrame, target_path: AnyPath):
         """save a dataframe as csv
@@ -119,14 +449,30 @@ class StoreDataFrame:
         :param dataframe: dataframe to be saved as file
         :param target_path: the target file full path
         """
-        if isinstance(target_path, S3Path):
-            target_path = str(target_path)
-            logger.debug(
-                "Converting S3Path to string for pandas compatability\n"
-                f"{type(target_path)}: {target_path}"
-            )
         logger.debug(f"Saving csv format to {target_path} ...")
-        dataframe.to_csv(target_path, index=False)
+        with METRICS.timer("serialise", "csv") as t:
+            body = dataframe.to_csv(index=False).encode("utf-8")
+            t.bytes = len(body)
+        write_object(target_path, body, content_type="text/csv")
+
+    def _save_feather(self, dataframe: pd.DataFrame, target_path: AnyPath):
+        """save a dataframe as feather, i.e., Arrow IPC file
+
+        The file is not compressed so that it can be
+        memory-mapped without decoding.
+
+        :param dataframe: dataframe to be saved as file
+        :param target_path: the target file full path
+        """
+        logger.debug(f"Saving feather format to {target_path} ...")
+        with METRICS.timer("serialise", "feather") as t:
+            buffer = io.BytesIO()
+            feather.write_feather(
+                pa.Table.from_pandas(dataframe), buffer, compression="uncompressed"
+            )
+            body = buffer.getvalue()
+            t.bytes = len(body)
+        write_object(target_path, body, content_type="application/octet-stream")
 
     def _save_metadata(self, metadata: Dict, target_path: AnyPath):
         """save metadata as a json file
@@ -135,8 +481,296 @@ class StoreDataFrame:
         :param target_path:
         """
         logger.debug(f"Saving metadata to {target_path} ...")
-        with target_path.open("w+") as fp:
-            json.dump(metadata, fp, indent=2)
+        write_object(target_path, json.dumps(metadata, indent=2).encode("utf-8"))
+
+
+class StoreDeltaDataFrame:
+    """Save time series dataframes as a base series
+    plus per snapshot deltas
+
+    Consecutive snapshots of long-range series overlap almost
+    completely, apart from the rescaling by Google. Instead of
+    a full copy, we store the changes compared to a base snapshot
+
+    ```python
+    target_folder / "format=delta" / "snapshot_date=2023-07-26" / "base.parquet"
+    target_folder / "format=delta" / "snapshot_date=2023-07-27" / "delta.parquet"
+    target_folder / "format=delta" / "snapshot_date=2023-07-27" / "delta.json"
+    ```
+
+    `delta.parquet` holds the new and changed rows, while `delta.json`
+    holds the base snapshot date, the scale factor applied to the
+    `value_columns` of the base, and the keys removed from the base.
+    A new base is written if the delta grows beyond
+    `max_delta_ratio` of the rows.
+
+    ```python
+    sdd = StoreDeltaDataFrame(
+        target_folder=target_folder, snapshot_date=datetime.date(2023, 7, 27)
+    )
+    sdd.save(trend_data)
+    df = sdd.load(snapshot_date="2023-07-27")
+    ```
+
+    !!! note
+        Reconstructed dataframes are sorted by `key`
+        and come with a default index.
+
+    :param target_folder: parent folder for the data.
+        Note that subfolders will be created inside it.
+    :param snapshot_date: the date when the data was produced.
+        Only required for saving.
+    :param key: column that identifies a point in the series
+    :param value_columns: numeric columns that Google rescales
+    :param max_delta_ratio: write a new base if the fraction of
+        rows in the delta is larger than this value
+    """
+
+    format = "delta"
+
+    def __init__(
+        self,
+        target_folder: AnyPath,
+        snapshot_date: Optional[datetime.date] = None,
+        key: str = "date",
+        value_columns: Optional[List[str]] = None,
+        max_delta_ratio: float = 0.5,
+    ):
+        self.target_folder = target_folder
+
+        if not isinstance(snapshot_date, (datetime.date, type(None))):
+            raise TypeError(
+                f"snapshot_date provided is not date time: {type(snapshot_date)}"
+            )
+        else:
+            self.snapshot_date = snapshot_date
+
+        if value_columns is None:
+            value_columns = ["extracted_value"]
+        self.key = key
+        self.value_columns = value_columns
+        self.max_delta_ratio = max_delta_ratio
+
+    @property
+    def format_folder(self) -> AnyPath:
+        return self.target_folder / f"format={self.format}"
+
+    def _snapshot_folder(self, snapshot_date: str) -> AnyPath:
+        return self.format_folder / f"snapshot_date={snapshot_date}"
+
+    def save(self, trend_data: Any):
+        """
+        Save the trend results as a base or a delta
+
+        :param trend_data: the object containing the dataframe and metadata
+        """
+        if self.snapshot_date is None:
+            raise ValueError("snapshot_date is required for saving")
+
+        df = trend_data.dataframe
+        snapshot_date = self.snapshot_date.isoformat()
+        folder = self._snapshot_folder(snapshot_date)
+        if isinstance(folder, Path):
+            folder.mkdir(parents=True, exist_ok=True)
+
+        snapshot_dates = list_snapshot_dates(self.format_folder)
+        base_date = self._previous_base_date(
+            [d for d in snapshot_dates if d < snapshot_date]
+        )
+        delta, manifest = None, None
+        if base_date is not None:
+            base = self._read_parquet(self._snapshot_folder(base_date) / "base.parquet")
+            delta, manifest = self._diff(base=base, dataframe=df)
+
+        if delta is None or len(delta) > self.max_delta_ratio * len(df):
+            logger.debug(f"Saving base to {folder} ...")
+            self._write_parquet(df, folder / "base.parquet")
+            stale_files = ["delta.parquet", "delta.json"]
+        else:
+            manifest["base"] = base_date
+            logger.debug(
+                f"Saving delta of {len(delta)} rows to {folder} "
+                f"(base: {base_date}, scale: {manifest['scale']}) ..."
+            )
+            self._write_parquet(delta, folder / "delta.parquet")
+            write_object(
+                folder / "delta.json", json.dumps(manifest, indent=2).encode("utf-8")
+            )
+            stale_files = ["base.parquet"]
+
+        if snapshot_date in snapshot_dates:
+            # remove files written by an earlier run on the same day
+            for name in stale_files:
+                if (folder / name).exists():
+                    (folder / name).unlink()
+
+        write_object(
+            folder / "metadata.json",
+            json.dumps(trend_data.metadata, indent=2).encode("utf-8"),
+        )
+
+    def load(
+        self, snapshot_date: Optional[Union[datetime.date, str]] = None
+    ) -> pd.DataFrame:
+        """
+        Reconstruct the dataframe of a snapshot
+
+        :param snapshot_date: which snapshot to load, defaults to the latest
+        """
+        if snapshot_date is None:
+            snapshot_date = list_snapshot_dates(self.format_folder)[-1]
+        elif isinstance(snapshot_date, datetime.date):
+            snapshot_date = snapshot_date.isoformat()
+
+        folder = self._snapshot_folder(snapshot_date)
+        manifest = self._read_manifest(snapshot_date)
+        if manifest is None:
+            return self._read_parquet(folder / "base.parquet")
+
+        base = self._read_parquet(
+            self._snapshot_folder(manifest["base"]) / "base.parquet"
+        )
+        delta = self._read_parquet(folder / "delta.parquet")
+
+        return self._reconstruct(base=base, delta=delta, manifest=manifest)
+
+    def _previous_base_date(self, previous_dates: List[str]) -> Optional[str]:
+        """Find the base of the latest snapshot in `previous_dates`"""
+        if not previous_dates:
+            return None
+
+        manifest = self._read_manifest(previous_dates[-1])
+        if manifest is None:
+            return previous_dates[-1]
+
+        return manifest["base"]
+
+    def _read_manifest(self, snapshot_date: str) -> Optional[Dict]:
+        manifest_path = self._snapshot_folder(snapshot_date) / "delta.json"
+        if not manifest_path.exists():
+            return None
+
+        with manifest_path.open("r") as fp:
+            return json.load(fp)
+
+    def _diff(
+        self, base: pd.DataFrame, dataframe: pd.DataFrame
+    ) -> Tuple[Optional[pd.DataFrame], Optional[Dict]]:
+        """Compute the delta of `dataframe` compared to `base`
+
+        :return: new and changed rows, and the manifest;
+            `(None, None)` if no delta can be computed.
+        """
+        if (
+            self.key not in dataframe.columns
+            or list(base.columns) != list(dataframe.columns)
+            or base.dtypes.astype(str).tolist() != dataframe.dtypes.astype(str).tolist()
+        ):
+            logger.debug("Columns differ from the base, can not compute delta")
+            return None, None
+
+        b = self._decategorize(base).set_index(self.key)
+        n = self._decategorize(dataframe).set_index(self.key)
+        if not (b.index.is_unique and n.index.is_unique):
+            logger.debug(f"{self.key} is not unique, can not compute delta")
+            return None, None
+
+        common = n.index.intersection(b.index)
+        n_common = n.loc[common]
+
+        scale = 1.0
+        changed = self._changed(self._apply_scale(b.loc[common], scale), n_common)
+        estimated_scale = self._estimate_scale(b.loc[common], n_common)
+        if estimated_scale != scale:
+            estimated_changed = self._changed(
+                self._apply_scale(b.loc[common], estimated_scale), n_common
+            )
+            if estimated_changed.sum() < changed.sum():
+                scale, changed = estimated_scale, estimated_changed
+
+        new = n.index.difference(b.index)
+        removed = b.index.difference(n.index)
+
+        delta = pd.concat([n_common.loc[changed.values], n.loc[new]]).reset_index()
+        manifest = {
+            "scale": scale,
+            "removed": removed.astype(str).tolist(),
+            "columns": list(dataframe.columns),
+        }
+
+        return delta, manifest
+
+    def _reconstruct(
+        self, base: pd.DataFrame, delta: pd.DataFrame, manifest: Dict
+    ) -> pd.DataFrame:
+        b = self._decategorize(base).set_index(self.key)
+        b = b.loc[~b.index.astype(str).isin(manifest["removed"])]
+        b = self._apply_scale(b, manifest["scale"])
+
+        d = delta.set_index(self.key)
+        b = b.loc[~b.index.isin(d.index)]
+
+        df = pd.concat([b, d]).sort_index().reset_index()
+
+        # categories are not shared between snapshots
+        dtypes = {
+            c: "category" if isinstance(t, pd.CategoricalDtype) else t
+            for c, t in base.dtypes.items()
+        }
+
+        return df[manifest["columns"]].astype(dtypes)
+
+    @staticmethod
+    def _decategorize(dataframe: pd.DataFrame) -> pd.DataFrame:
+        """convert categorical columns to the dtype of their categories"""
+        return dataframe.astype(
+            {
+                c: dataframe[c].cat.categories.dtype
+                for c in dataframe.select_dtypes(include="category").columns
+            }
+        )
+
+    def _estimate_scale(self, base: pd.DataFrame, dataframe: pd.DataFrame) -> float:
+        """median ratio of the first value column on the overlapping points"""
+        v = self.value_columns[0]
+        b_v = pd.to_numeric(base[v], errors="coerce")
+        n_v = pd.to_numeric(dataframe[v], errors="coerce")
+        mask = (b_v > 0) & n_v.notna()
+        if not mask.any():
+            return 1.0
+
+        return round(float((n_v[mask] / b_v[mask]).median()), 6)
+
+    def _apply_scale(self, dataframe: pd.DataFrame, scale: float) -> pd.DataFrame:
+        if scale == 1.0:
+            return dataframe
+
+        df = dataframe.copy()
+        for v in self.value_columns:
+            df[v] = (df[v] * scale).round().astype(df[v].dtype)
+
+        return df
+
+    @staticmethod
+    def _changed(predicted: pd.DataFrame, dataframe: pd.DataFrame) -> pd.Series:
+        """rows that are not explained by the scaled base"""
+        equal = predicted.eq(dataframe) | (predicted.isna() & dataframe.isna())
+        return ~equal.all(axis=1)
+
+    @staticmethod
+    def _read_parquet(path: AnyPath) -> pd.DataFrame:
+        if isinstance(path, S3Path):
+            path = str(path)
+        return pd.read_parquet(path)
+
+    @staticmethod
+    def _write_parquet(dataframe: pd.DataFrame, path: AnyPath):
+        with METRICS.timer("serialise", "parquet") as t:
+            buffer = io.BytesIO()
+            dataframe.to_parquet(buffer)
+            body = buffer.getvalue()
+            t.bytes = len(body)
+        write_object(path, body, content_type="application/octet-stream")
 
 
 class StoreJSON:
@@ -157,18 +791,27 @@ class StoreJSON:
     / "geo=de" / "timeframe=today-5-y"
     ```
 
+    The json files can be uploaded precompressed, see
+    [`write_object`][sm_trendy.utilities.storage.write_object].
+
     :param target_folder: parent folder for the data.
         Note that subfolders will be created inside it.
     :param snapshot_date: the date when the data was produced.
         Please stick to UTC date.
+    :param content_encoding: compress the files with `gzip` or `br`
+    :param cache_control: `Cache-Control` header of the files on S3
     """
 
     def __init__(
         self,
         target_folder: AnyPath,
         snapshot_date: Union[datetime.date, Literal["latest"]],
+        content_encoding: Optional[Literal["gzip", "br"]] = None,
+        cache_control: Optional[str] = None,
     ):
         self.target_folder = target_folder
+        self.content_encoding = content_encoding
+        self.cache_control = cache_control
 
         if not isinstance(snapshot_date, (datetime.date, str)):
             raise TypeError(
@@ -180,7 +823,9 @@ class StoreJSON:
     def save(
         self,
         records: Any,
-        formats: Optional[List[Literal["json"]]] = ["json"],
+        formats: Optional[
+            List[Literal["json", "json-compact", "json-monthly", "json-quarterly"]]
+        ] = ["json"],
     ):
         """
         Save the trend results
@@ -192,11 +837,14 @@ class StoreJSON:
             formats = [formats]
 
         format_dispatcher = {
-            "json": {
-                "method": self._save_json,
-                "path": self._file_path(format="json"),
-            },
+            "json": {"method": self._save_json},
+            "json-compact": {"method": self._save_json},
+            "json-monthly": {"method": self._save_json},
+            "json-quarterly": {"method": self._save_json},
         }
+        for f in formats:
+            if f in format_dispatcher:
+                format_dispatcher[f]["path"] = self._file_path(format=f)
 
         for f in formats:
             try:
@@ -216,7 +864,9 @@ class StoreJSON:
         else:
             raise ValueError(f"snapshot_date {self.snapshot_date} is not supported")
 
-    def _file_path(self, format: Literal["json"]) -> Dict[str, AnyPath]:
+    def _file_path(
+        self, format: Literal["json", "json-compact", "json-monthly", "json-quarterly"]
+    ) -> Dict[str, AnyPath]:
         """Compute the full path for the target file
         based on the format
 
@@ -229,14 +879,25 @@ class StoreJSON:
         )
         if isinstance(folder, Path):
             folder.mkdir(parents=True, exist_ok=True)
-        return {"data": folder / f"data.{format}"}
+        return {"data": folder / "data.json"}
 
-    def _save_json(self, records: Dict, target_path: AnyPath):
+    def _save_json(self, records: Union[Dict, List, bytes], target_path: AnyPath):
         """save a dataframe as json
 
-        :param records: records to be saved as file
+        :param records: records to be saved as file,
+            bytes are considered as serialized json and written as is
         :param target_path: the target file full path
         """
         logger.debug(f"Saving json format to {target_path} ...")
-        with target_path.open("w+") as fp:
-            json.dump(records, fp)
+        if not isinstance(records, bytes):
+            with METRICS.timer("serialise", "json") as t:
+                records = json.dumps(records).encode("utf-8")
+                t.bytes = len(records)
+
+        write_object(
+            target_path=target_path,
+            body=records,
+            content_type="application/json",
+            content_encoding=self.content_encoding,
+            cache_control=self.cache_control,
+        )
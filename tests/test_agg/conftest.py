@@ -0,0 +1,18 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def agg_serpapi_config_path(tmp_path, data_directory):
+    with open(data_directory / "use_serpapi" / "test_serpapi_config.json", "r") as fp:
+        config = json.load(fp)
+
+    config["global"]["path"]["parent_folder"] = str(
+        data_directory / "aggregate" / "serpapi_downloaded"
+    )
+    config_path = tmp_path / "serpapi_config.json"
+    with open(config_path, "w") as fp:
+        json.dump(config, fp)
+
+    return config_path
@@ -1,10 +1,20 @@
+import datetime
 import json
 from pathlib import Path
+from types import SimpleNamespace
 
+import pandas as pd
 import pytest
 
-from sm_trendy.aggregate.agg import AggAPIJSON, DownloadedLoader
+from sm_trendy.aggregate.agg import (
+    AggAPIJSON,
+    AggCompactJSON,
+    AggSerpAPIBundle,
+    DownloadedLoader,
+)
+from sm_trendy.aggregate.pyramid import load_sparklines
 from sm_trendy.utilities.config import PathParams
+from sm_trendy.utilities.storage import StoreDataFrame
 
 
 @pytest.fixture
@@ -50,3 +60,164 @@ def test_agg_api_json(downloaded_data_reloaded, agg_api_json_records):
 
     for r, g in zip(agg_records, agg_api_json_records):
         assert r == g, f"generate {r} is not the same as expected {g}"
+
+
+def test_agg_api_json_bytes(downloaded_data_reloaded, agg_api_json_records):
+    apj = AggAPIJSON()
+    agg_json = apj.to_json_bytes(
+        downloaded_data_reloaded.sample(frac=1), sort_by="date"
+    )
+
+    assert json.loads(agg_json) == agg_api_json_records
+
+
+def test_agg_api_json_bytes_by(downloaded_data_reloaded):
+    apj = AggAPIJSON()
+    df = pd.concat(
+        [
+            downloaded_data_reloaded.assign(series_id="b"),
+            downloaded_data_reloaded.iloc[:3].assign(series_id="a"),
+        ]
+    ).sample(frac=1, random_state=42)
+
+    payloads = apj.to_json_bytes_by(df, by="series_id", sort_by="date")
+
+    assert payloads == {
+        "a": apj.to_json_bytes(downloaded_data_reloaded.iloc[:3], sort_by="date"),
+        "b": apj.to_json_bytes(downloaded_data_reloaded, sort_by="date"),
+    }
+
+
+def test_agg_api_json_bytes_by_mixed_timeframes(downloaded_data_reloaded):
+    apj = AggAPIJSON()
+    # hourly points, as in a `now 7-d` series
+    hourly = downloaded_data_reloaded.iloc[:3].assign(
+        date=pd.date_range("2023-07-30 10:00", periods=3, freq="H")
+    )
+    df = pd.concat(
+        [
+            downloaded_data_reloaded.assign(series_id="today 5-y"),
+            hourly.assign(series_id="now 7-d"),
+        ]
+    )
+
+    payloads = apj.to_json_bytes_by(df, by="series_id", sort_by="date")
+
+    assert payloads == {
+        "now 7-d": apj.to_json_bytes(hourly, sort_by="date"),
+        "today 5-y": apj.to_json_bytes(downloaded_data_reloaded, sort_by="date"),
+    }
+    assert json.loads(payloads["now 7-d"])[0]["date"] == "2023-07-30 10:00:00"
+    assert len(json.loads(payloads["today 5-y"])[0]["date"]) == len("2018-07-29")
+
+
+def test_agg_compact_json(downloaded_data_reloaded, agg_api_json_records):
+    acj = AggCompactJSON()
+    payload = acj(downloaded_data_reloaded.sample(frac=1))
+
+    assert payload["query"] == "phone case"
+    assert payload["start"] == agg_api_json_records[0]["date"]
+    assert payload["unit"] == "D"
+    assert payload["step"] == 7
+    assert payload["values"] == [r["value"] for r in agg_api_json_records]
+    assert json.loads(acj.to_json_bytes(downloaded_data_reloaded)) == payload
+
+
+def test_agg_compact_json_deltas(downloaded_data_reloaded):
+    payload = AggCompactJSON()(downloaded_data_reloaded.iloc[[0, 1, 3]])
+
+    assert "step" not in payload
+    assert payload["deltas"] == [7, 14]
+
+
+def test_agg_serpapi_bundle(tmp_path, agg_serpapi_config_path, agg_dll_path_params):
+    parent_path = tmp_path / "agg"
+    agg_bundle = AggSerpAPIBundle(
+        parent_path=parent_path, formats=["json", "json-compact"]
+    )
+    agg_bundle(serpapi_config_path=agg_serpapi_config_path)
+
+    for f in ["json", "json-compact"]:
+        for snapshot_date in ["2023-07-31", "latest"]:
+            path = agg_dll_path_params.s3_path(
+                parent_folder=parent_path,
+                snapshot_date=snapshot_date,
+                format=f,
+                filename="data.json",
+            )
+            assert path.exists()
+
+
+def test_agg_serpapi_bundle_batched(
+    tmp_path, agg_serpapi_config_path, agg_dll_path_params
+):
+    formats = ["json", "json-compact"]
+    for batched in [False, True]:
+        agg_bundle = AggSerpAPIBundle(
+            parent_path=tmp_path / f"batched={batched}",
+            formats=formats,
+            batched=batched,
+        )
+        agg_bundle(serpapi_config_path=agg_serpapi_config_path)
+
+    for f in formats:
+        paths = [
+            agg_dll_path_params.s3_path(
+                parent_folder=tmp_path / f"batched={batched}",
+                snapshot_date="latest",
+                format=f,
+                filename="data.json",
+            )
+            for batched in [False, True]
+        ]
+        assert paths[0].read_bytes() == paths[1].read_bytes()
+
+
+def test_agg_serpapi_bundle_pyramids(
+    tmp_path, agg_serpapi_config_path, agg_dll_path_params
+):
+    parent_path = tmp_path / "agg"
+    agg_bundle = AggSerpAPIBundle(
+        parent_path=parent_path,
+        formats=["json-monthly", "json-quarterly"],
+        sparklines=True,
+        sparkline_size=8,
+    )
+    agg_bundle(serpapi_config_path=agg_serpapi_config_path)
+
+    for f in ["json-monthly", "json-quarterly"]:
+        path = agg_dll_path_params.s3_path(
+            parent_folder=parent_path,
+            snapshot_date="latest",
+            format=f,
+            filename="data.json",
+        )
+        with open(path, "r") as fp:
+            records = json.load(fp)
+        assert set(records[0].keys()) == {"query", "value", "date"}
+
+    sparklines = load_sparklines(
+        parent_path=parent_path, serpapi_config_path=agg_serpapi_config_path
+    )
+    assert len(sparklines[agg_dll_path_params.partition]) == 8
+
+
+@pytest.mark.parametrize("from_format", ["parquet", "feather"])
+def test_downloaded_loader_arrow(
+    tmp_path, data_directory, agg_dll_path_params, downloaded_data_reloaded, from_format
+):
+    parent_folder = data_directory / "aggregate" / "serpapi_downloaded"
+
+    if from_format == "feather":
+        parent_folder = tmp_path / "serpapi_downloaded"
+        sdf = StoreDataFrame(
+            target_folder=agg_dll_path_params.path(parent_folder=parent_folder),
+            snapshot_date=datetime.date(2023, 7, 31),
+        )
+        trend_data = SimpleNamespace(dataframe=downloaded_data_reloaded, metadata={})
+        sdf.save(trend_data, formats=["feather"])
+
+    dll = DownloadedLoader(parent_folder=parent_folder, from_format=from_format)
+
+    pd.testing.assert_frame_equal(dll(agg_dll_path_params), downloaded_data_reloaded)
+    assert dll.load_table(agg_dll_path_params).num_rows == len(downloaded_data_reloaded)
@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+from sm_trendy.aggregate.database import ExportDatabase
+
+
+def test_export_database_all(tmp_path, agg_serpapi_config_path):
+    database_path = tmp_path / "trends.db"
+    export_database = ExportDatabase(database_path=database_path, snapshots="all")
+
+    summary = export_database(serpapi_config_paths=[agg_serpapi_config_path])
+    assert summary["snapshots"] == 6
+
+    con = sqlite3.connect(database_path)
+    assert con.execute("SELECT COUNT(*) FROM trends").fetchone()[0] == summary["rows"]
+    assert con.execute(
+        "SELECT DISTINCT snapshot_date FROM trends ORDER BY 1"
+    ).fetchall() == [("2023-07-26",), ("2023-07-27",), ("2023-07-31",)]
+    assert con.execute(
+        "SELECT DISTINCT snapshot_date FROM latest_trends"
+    ).fetchall() == [("2023-07-31",)]
+    assert ("idx_trends_series",) in con.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index'"
+    ).fetchall()
+    con.close()
+
+    # incremental: nothing left to load
+    assert export_database(serpapi_config_paths=[agg_serpapi_config_path]) == {
+        "snapshots": 0,
+        "rows": 0,
+    }
+
+
+def test_export_database_latest(tmp_path, agg_serpapi_config_path):
+    database_path = tmp_path / "trends.db"
+    ExportDatabase(database_path=database_path, snapshots="all")(
+        serpapi_config_paths=[agg_serpapi_config_path]
+    )
+
+    # older snapshots are removed once the latest one is loaded
+    con = sqlite3.connect(database_path)
+    con.execute("DELETE FROM trends WHERE snapshot_date = '2023-07-31'")
+    con.execute("DELETE FROM snapshots WHERE snapshot_date = '2023-07-31'")
+    con.commit()
+
+    summary = ExportDatabase(database_path=database_path, snapshots="latest")(
+        serpapi_config_paths=[agg_serpapi_config_path]
+    )
+    assert summary["snapshots"] == 2
+    assert con.execute(
+        "SELECT keyword, snapshot_date, COUNT(*) FROM trends GROUP BY 1, 2 ORDER BY 1"
+    ).fetchall() == [("curtain", "2023-07-31", 260), ("phone case", "2023-07-31", 260)]
+    con.close()
+
+
+def test_export_database_backend(tmp_path):
+    with pytest.raises(ValueError):
+        ExportDatabase(database_path=tmp_path / "trends.db", backend="postgres")
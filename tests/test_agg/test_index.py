@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from sm_trendy.aggregate.index import KeywordIndex
+
+
+@pytest.fixture
+def keyword_index_entries():
+    return [
+        {"keyword": keyword, "geo": geo, "q": keyword}
+        for keyword in ["curtain", "curtain rod", "coffee", "phone case", "Über"]
+        for geo in ["DE", "US"]
+    ]
+
+
+def test_keyword_index_shards(keyword_index_entries):
+    ki = KeywordIndex(entries=keyword_index_entries)
+
+    assert len(ki.shards["geo=de/prefix=cu"]) == 2
+    assert "geo=us/prefix=ub" in ki.shards
+    assert sum(s["n"] for s in ki.manifest["shards"]) == len(keyword_index_entries)
+
+
+@pytest.mark.parametrize(
+    "query,geo,expected",
+    [
+        ("curt", "DE", ["geo=de/prefix=cu"]),
+        ("rod", None, ["geo=de/prefix=cu", "geo=us/prefix=cu"]),
+        ("c", "us", ["geo=us/prefix=co", "geo=us/prefix=cu"]),
+        ("uber", "DE", ["geo=de/prefix=ub"]),
+        ("tea", None, []),
+    ],
+)
+def test_keyword_index_lookup(keyword_index_entries, query, geo, expected):
+    ki = KeywordIndex(entries=keyword_index_entries)
+
+    assert ki.lookup(query, geo=geo) == expected
+
+
+def test_keyword_index_save(tmp_path, keyword_index_entries):
+    ki = KeywordIndex(entries=keyword_index_entries)
+    ki.save(index_folder=tmp_path)
+
+    with open(tmp_path / "manifest.json", "r") as fp:
+        manifest = json.load(fp)
+
+    for shard in manifest["shards"]:
+        with open(tmp_path / shard["path"], "r") as fp:
+            assert len(json.load(fp)) == shard["n"]
+
+    assert (tmp_path / "search.json").exists()
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from sm_trendy.aggregate.pyramid import SeriesPyramid
+
+
+@pytest.fixture
+def pyramid_series():
+    dates = pd.date_range("2023-01-01", periods=10, freq="W-SUN")
+    short_dates = pd.date_range("2023-01-01", periods=3, freq="W-SUN")
+    return pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "series_id": "a",
+                    "query": "curtain",
+                    "date": dates[::-1],
+                    "extracted_value": list(range(10))[::-1],
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "series_id": "b",
+                    "query": "cushion",
+                    "date": short_dates,
+                    "extracted_value": [100, 50, 0],
+                }
+            ),
+        ],
+        ignore_index=True,
+    ).astype({"query": "category"})
+
+
+def test_series_pyramid_levels(pyramid_series):
+    levels = SeriesPyramid(sparkline_size=4)(pyramid_series)
+
+    monthly = levels["monthly"]
+    assert monthly.loc[monthly.series_id == "a", "value"].tolist() == [2.0, 6.5, 9.0]
+    assert monthly.loc[monthly.series_id == "a", "date"].tolist() == [
+        pd.Timestamp("2023-01-01"),
+        pd.Timestamp("2023-02-01"),
+        pd.Timestamp("2023-03-01"),
+    ]
+
+    quarterly = levels["quarterly"]
+    assert quarterly.value.tolist() == [4.5, 50.0]
+
+    sparklines = SeriesPyramid.to_lists(levels["sparkline"])
+    assert sparklines == {"a": [1, 4, 6, 8], "b": [100, 50, 0]}
+
+
+def test_series_pyramid_to_json_bytes(pyramid_series):
+    levels = SeriesPyramid()(pyramid_series)
+
+    payloads = SeriesPyramid.to_json_bytes(levels["quarterly"])
+
+    assert payloads["b"] == b'[{"query":"cushion","value":50.0,"date":"2023-01-01"}]'
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sm_trendy.aggregate.similar import AggSimilarKeywords, SimilarSeries
+from sm_trendy.aggregate.stats import SeriesMatrix
+
+
+def similar_series_matrix(values: np.ndarray) -> SeriesMatrix:
+    dates = pd.date_range("2023-01-01", periods=values.shape[1], freq="7D")
+    return SeriesMatrix(
+        pd.DataFrame(
+            {
+                "series_id": np.repeat(
+                    [f"s{i}" for i in range(len(values))], len(dates)
+                ),
+                "date": np.tile(dates, len(values)),
+                "extracted_value": values.ravel(),
+            }
+        )
+    )
+
+
+@pytest.fixture
+def similar_values():
+    rng = np.random.default_rng(42)
+    return rng.integers(0, 100, size=(7, 30)).astype(float)
+
+
+def test_similar_series(similar_values):
+    neighbours = SimilarSeries(k=3, block_size=2)(similar_series_matrix(similar_values))
+
+    correlations = np.corrcoef(similar_values)
+    np.fill_diagonal(correlations, -np.inf)
+    for i, row in enumerate(correlations):
+        expected = np.argsort(-row)[:3]
+        assert [j for j, _ in neighbours[f"s{i}"]] == [f"s{j}" for j in expected]
+        np.testing.assert_allclose(
+            [s for _, s in neighbours[f"s{i}"]], row[expected], atol=1e-3
+        )
+
+
+def test_similar_series_incremental(similar_values):
+    ss = SimilarSeries(k=6, block_size=4)
+    previous = ss(similar_series_matrix(similar_values))
+
+    similar_values[2] = similar_values[5][::-1]
+    matrix = similar_series_matrix(similar_values)
+
+    assert ss(matrix, changed=["s2"], previous=previous) == ss(matrix)
+
+
+def test_agg_similar_keywords(tmp_path, agg_serpapi_config_path):
+    ask = AggSimilarKeywords(parent_path=tmp_path, k=1)
+
+    indexes = ask(serpapi_config_paths=[agg_serpapi_config_path])
+    index = indexes[("DE", "today 5-y")]
+    assert index["neighbours"] == [[1], [0]]
+    assert index["scores"][0] == index["scores"][1]
+    assert ask.load(ask.target_folder(geo="DE", timeframe="today 5-y")) == index
+
+    assert ask(serpapi_config_paths=[agg_serpapi_config_path]) == {}
@@ -0,0 +1,138 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sm_trendy.aggregate.stats import AggTrendStats, SeriesMatrix, TrendStats
+
+
+@pytest.fixture
+def stats_series():
+    weeks = 3 * 52
+    dates = pd.date_range("2020-01-05", periods=weeks, freq="7D")
+    seasonal = np.tile(np.r_[np.full(26, 10), np.full(26, 50)], 3)
+    flat = np.r_[np.full(weeks - 4, 20), np.full(4, 40)]
+    return pd.concat(
+        [
+            pd.DataFrame(
+                {"series_id": "seasonal", "date": dates, "extracted_value": seasonal}
+            ),
+            # downloaded a week earlier
+            pd.DataFrame(
+                {
+                    "series_id": "flat",
+                    "date": dates - pd.Timedelta(days=7),
+                    "extracted_value": flat,
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "series_id": "short",
+                    "date": dates[-6:],
+                    "extracted_value": [1, 2, 3, 4, 5, 6],
+                }
+            ),
+        ]
+    ).sample(frac=1, random_state=42)
+
+
+def test_series_matrix(stats_series):
+    matrix = SeriesMatrix(stats_series)
+
+    assert matrix.ids.tolist() == ["flat", "seasonal", "short"]
+    assert matrix.values.shape == (3, 3 * 52)
+    assert matrix.values.dtype == np.float32
+    np.testing.assert_array_equal(matrix.values[2, -6:], [1, 2, 3, 4, 5, 6])
+    assert np.isnan(matrix.values[2, :-6]).all()
+    assert matrix.dates[0, -1] == np.datetime64("2022-12-18")
+    assert matrix.dates[1, -1] == np.datetime64("2022-12-25")
+
+
+def test_trend_stats(stats_series):
+    stats = TrendStats()(SeriesMatrix(stats_series))
+
+    assert stats.loc["flat", "latest_value"] == 40
+    assert stats.loc["flat", "momentum_4w"] == 1.0
+    assert stats.loc["flat", "yoy_growth"] == 1.0
+    assert stats.loc["flat", "momentum_12w"] == pytest.approx(1 / 3, abs=1e-4)
+    assert stats.loc["flat", "peak_date"] == pd.Timestamp("2022-11-27")
+    assert stats.loc["seasonal", "seasonality_strength"] == 1.0
+    assert stats.loc["seasonal", "yoy_growth"] == 0.0
+    assert stats.loc["seasonal", "peak_date"] == pd.Timestamp("2020-07-05")
+    assert stats.loc["short", "momentum_4w"] == pytest.approx(4.5 / 1.5 - 1)
+    assert np.isnan(stats.loc["short", "yoy_growth"])
+    assert np.isnan(stats.loc["short", "seasonality_strength"])
+
+
+def test_agg_trend_stats(tmp_path, agg_serpapi_config_path):
+    ats = AggTrendStats(parent_path=tmp_path, top_n=1)
+    stats = ats(serpapi_config_paths=[agg_serpapi_config_path])
+
+    assert sorted(stats["keyword"]) == ["curtain", "phone case"]
+    assert (stats["latest_value"] >= 0).all()
+
+    snapshot_date = stats["snapshot_date"].max()
+    assert (
+        tmp_path
+        / "stats"
+        / "format=parquet"
+        / f"snapshot_date={snapshot_date}"
+        / "data.parquet"
+    ).exists()
+
+    with open(
+        tmp_path / "top_movers" / "format=json" / "snapshot_date=latest" / "data.json"
+    ) as fp:
+        top_movers = json.load(fp)
+    assert len(top_movers["DE"]["today 5-y"]["rising"]) == 1
+    assert top_movers["DE"]["today 5-y"]["rising"][0]["momentum_4w"] > 0
+
+
+def test_series_matrix_step(stats_series):
+    assert SeriesMatrix(stats_series).step == pd.Timedelta(weeks=1)
+
+    hourly = pd.DataFrame(
+        {
+            "series_id": "now",
+            "date": pd.date_range("2023-07-30", periods=24, freq="H"),
+            "extracted_value": range(24),
+        }
+    )
+    assert SeriesMatrix(hourly).step == pd.Timedelta(hours=1)
+    assert SeriesMatrix(hourly.head(1)).step is None
+
+
+def test_top_movers(tmp_path):
+    stats = pd.DataFrame(
+        {
+            "keyword": ["a", "b", "c", "d", "e"],
+            "series_id": ["a", "b", "c", "d", "e"],
+            "geo": ["DE", "DE", "DE", "DE", "US"],
+            "timeframe": ["today 5-y"] * 3 + ["today 12-m", "today 5-y"],
+            "momentum_4w": [0.5, -0.2, 0.1, -0.3, np.nan],
+            "yoy_growth": [0.0] * 5,
+            "latest_value": [50.0] * 5,
+        }
+    )
+
+    # fewer keywords in a geo than twice top_n
+    top_movers = AggTrendStats(parent_path=tmp_path, top_n=3).top_movers(stats)
+
+    assert list(top_movers) == ["DE"]
+    assert sorted(top_movers["DE"]) == ["today 12-m", "today 5-y"]
+    movers = top_movers["DE"]["today 5-y"]
+    assert [r["keyword"] for r in movers["rising"]] == ["a", "c"]
+    assert [r["keyword"] for r in movers["falling"]] == ["b"]
+    assert top_movers["DE"]["today 12-m"] == {
+        "rising": [],
+        "falling": [
+            {
+                "keyword": "d",
+                "series_id": "d",
+                "momentum_4w": -0.3,
+                "yoy_growth": 0.0,
+                "latest_value": 50.0,
+            }
+        ],
+    }
@@ -0,0 +1,62 @@
+import datetime
+
+import pytest
+
+from sm_trendy.aggregate.store import TrendStore
+
+
+@pytest.fixture
+def trend_store(data_directory):
+    return TrendStore(parent_folder=data_directory / "aggregate" / "serpapi_downloaded")
+
+
+def test_trend_store_catalog(trend_store):
+    assert trend_store.catalog == {
+        "keyword=curtain/cat=0/geo=de/timeframe=today-5-y": [
+            "2023-07-26",
+            "2023-07-27",
+            "2023-07-31",
+        ],
+        "keyword=phone-case/cat=0/geo=de/timeframe=today-5-y": [
+            "2023-07-26",
+            "2023-07-27",
+            "2023-07-31",
+        ],
+    }
+
+    df = trend_store.list_keywords(keyword="phone case", geo="DE")
+    assert df["keyword"].tolist() == ["phone-case"]
+    assert df["latest_snapshot_date"].tolist() == ["2023-07-31"]
+    assert trend_store.list_keywords(geo="US").empty
+
+
+def test_trend_store_get_series(trend_store):
+    df = trend_store.get_series("phone case", geo="DE")
+    assert df["query"].unique().tolist() == ["phone case"]
+
+    df_earlier = trend_store.get_series(
+        "phone case", geo="DE", snapshot=datetime.date(2023, 7, 26)
+    )
+    assert df_earlier["date"].min() < df["date"].min()
+
+    trend_store.get_series("phone case", geo="de", timeframe="today-5-y")
+    assert trend_store.cache.hits == 1
+
+    with pytest.raises(KeyError):
+        trend_store.get_series("phone case", geo="DE", snapshot="2023-07-01")
+    with pytest.raises(KeyError):
+        trend_store.get_series("lamp", geo="DE")
+
+
+def test_trend_store_get_many(trend_store):
+    df = trend_store.get_many(["phone case", "curtain", "lamp"], geo="DE")
+
+    assert df.columns.tolist() == ["phone case", "curtain"]
+    assert df.index.is_monotonic_increasing
+    assert len(df) == 260
+    assert (
+        df["curtain"]
+        == trend_store.get_series("curtain", geo="DE").set_index("date")[
+            "extracted_value"
+        ]
+    ).all()
@@ -1,3 +1,9 @@
+import io
+import json
+import zipfile
+
+import pytest
+
 from sm_trendy.manual.config import SerpAPI2Manual
 
 
@@ -10,3 +16,23 @@ def test_serpapi_to_manual(tmp_path, serpapi_config_bundle):
         "keyword=phone-case",
         "keyword=curtain",
     }
+    path_params = serpapi_config_bundle[0].path_params
+    with open(path_params.path(parent_folder=tmp_path) / "manual.json") as fp:
+        assert json.load(fp) == path_params.model_dump()
+
+    with pytest.raises(AssertionError):
+        SerpAPI2Manual(manual_folder=tmp_path)
+
+
+def test_serpapi_to_manual_zip_bundle(tmp_path, serpapi_config_bundle):
+    m = SerpAPI2Manual(manual_folder=tmp_path / "manual", max_workers=2)
+
+    m(serpapi_config_bundle, zip_bundle=tmp_path / "manual.zip")
+
+    with zipfile.ZipFile(io.BytesIO((tmp_path / "manual.zip").read_bytes())) as zf:
+        names = zf.namelist()
+        manual_config = json.loads(zf.read(names[0]))
+    assert names == [
+        f"{c.path_params.partition}/manual.json" for c in serpapi_config_bundle
+    ]
+    assert manual_config == serpapi_config_bundle[0].path_params.model_dump()
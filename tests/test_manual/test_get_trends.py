@@ -1,4 +1,16 @@
-from sm_trendy.manual.get_trends import ManualSingleTrend
+import datetime
+import shutil
+
+import pandas as pd
+import pytest
+
+from sm_trendy.manual.get_trends import (
+    ManualDownload,
+    ManualSingleTrend,
+    keyword_column,
+    read_multi_timeline,
+)
+from sm_trendy.utilities.retry import RetryQueue
 
 
 def test_manual_single_trend(serpapi_config_bundle, data_directory):
@@ -13,3 +25,82 @@ def test_manual_single_trend(serpapi_config_bundle, data_directory):
 
     for c in ["date", "query", "extracted_value"]:
         assert c in df
+    assert df["query"].unique().tolist() == ["phone case"]
+    assert len(df) == 260
+
+
+@pytest.mark.parametrize(
+    "data, columns",
+    [
+        (
+            b"Category: All categories\n\nWeek,curtain: (Germany)\n"
+            b"2018-07-29,14\n2018-08-05,<1\n",
+            ["date", "curtain: (Germany)"],
+        ),
+        (
+            b"Day,curtain: (Germany),phone case: (Germany)\n"
+            b"2023-07-01,14,80\n2023-07-02,19,100\n",
+            ["date", "curtain: (Germany)", "phone case: (Germany)"],
+        ),
+        (
+            b"\xef\xbb\xbfCategory: All categories\n\nMonth,curtain: (Germany)\n"
+            b"2018-07,14\n2018-08,19\n",
+            ["date", "curtain: (Germany)"],
+        ),
+    ],
+)
+def test_read_multi_timeline(data, columns):
+    df = read_multi_timeline(data)
+
+    assert df.columns.tolist() == columns
+    assert len(df) == 2
+    assert pd.api.types.is_datetime64_any_dtype(df["date"])
+
+
+def test_read_multi_timeline_no_header():
+    with pytest.raises(ValueError):
+        read_multi_timeline(b"Category: All categories\n\nTime,curtain\n")
+
+
+def test_keyword_column():
+    columns = ["curtain: (Germany)", "Phone Case: (Germany)"]
+    assert keyword_column(columns, "phone case") == "Phone Case: (Germany)"
+    assert keyword_column(columns[:1], "lamp") == "curtain: (Germany)"
+    with pytest.raises(ValueError):
+        keyword_column(columns, "lamp")
+
+
+def test_manual_download(tmp_path, serpapi_config_bundle, data_directory):
+    manual_folder = tmp_path / "manual"
+    shutil.copytree(data_directory / "manual" / "manual_config", manual_folder)
+    not_ready = serpapi_config_bundle[1].path_params.path(parent_folder=manual_folder)
+    (not_ready / "multiTimeline.csv").unlink()
+
+    mdl = ManualDownload(
+        parent_folder=tmp_path / "data",
+        snapshot_date=datetime.date(2023, 7, 31),
+        manual_folder=manual_folder,
+    )
+    assert mdl.ready == {serpapi_config_bundle[0].path_params.partition}
+
+    rq = RetryQueue(mdl, max_workers=4)
+    assert rq(serpapi_config_bundle) == {"succeeded": 1, "retries": 0, "failed": 1}
+    assert list((tmp_path / "data").rglob("data.parquet"))
+
+
+def test_manual_download_ready_listed_once(
+    tmp_path, serpapi_config_bundle, data_directory, mocker
+):
+    manual_folder = tmp_path / "manual"
+    shutil.copytree(data_directory / "manual" / "manual_config", manual_folder)
+
+    mdl = ManualDownload(
+        parent_folder=tmp_path / "data",
+        snapshot_date=datetime.date(2023, 7, 31),
+        manual_folder=manual_folder,
+    )
+    glob = mocker.spy(type(manual_folder), "glob")
+
+    rq = RetryQueue(mdl, max_workers=4)
+    assert rq(serpapi_config_bundle) == {"succeeded": 2, "retries": 0, "failed": 0}
+    assert glob.call_count == 1
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from sm_trendy.serve.app import LRUCache, create_app
+from sm_trendy.utilities.config import PathParams
+from sm_trendy.utilities.storage import StoreJSON
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture
+def serve_path_params():
+    return PathParams(keyword="curtain", cat="0", geo="DE", timeframe="today 5-y")
+
+
+@pytest.fixture
+def serve_client(tmp_path, serve_path_params):
+    records = [
+        {"query": "curtain", "value": v, "date": f"2023-07-{d:02d}"}
+        for v, d in zip(range(10, 40), range(1, 31))
+    ]
+    StoreJSON(
+        target_folder=serve_path_params.path(parent_folder=tmp_path),
+        snapshot_date="latest",
+        content_encoding="gzip",
+    ).save(records=records, formats=["json"])
+
+    with open(tmp_path / "metadata.json", "w") as fp:
+        json.dump(
+            [
+                {"keyword": k, "geo": g, "path": f"{k}/{g}"}
+                for k in ["curtain", "curtain rod", "coffee"]
+                for g in ["DE", "US"]
+            ],
+            fp,
+        )
+
+    return TestClient(create_app(parent_folder=tmp_path, cache_size=2))
+
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert len(cache) == 2
+
+    cache = LRUCache(maxsize=2, ttl=-1)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_serve_series(serve_client):
+    params = {"keyword": "curtain", "geo": "DE", "timeframe": "today 5-y"}
+    response = serve_client.get("/series", params=params)
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 30
+
+    etag = response.headers["etag"]
+    response = serve_client.get(
+        "/series", params=params, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert serve_client.get("/health").json()["cache_hits"] == 1
+
+    response = serve_client.get("/series", params={**params, "geo": "US"})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize(
+    "snapshot_date", ["latest/../../../../tmp/secret", "../latest", "2023-13-01"]
+)
+def test_serve_series_invalid_snapshot_date(serve_client, snapshot_date):
+    params = {"keyword": "curtain", "geo": "DE", "snapshot_date": snapshot_date}
+    response = serve_client.get("/series", params=params)
+
+    assert response.status_code == 422
+
+
+def test_serve_search(serve_client):
+    response = serve_client.get("/search", params={"q": "curt", "geo": "us"})
+
+    assert [e["keyword"] for e in response.json()] == ["curtain", "curtain rod"]
+    assert serve_client.get("/summary").status_code == 404
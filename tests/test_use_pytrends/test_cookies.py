@@ -0,0 +1,95 @@
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from sm_trendy.use_pytrends.cookies import CookieCache
+from sm_trendy.use_pytrends.get_trends import _TrendReq
+
+
+@pytest.fixture
+def cookie_server():
+    """sets the NID cookie on POST only, as google trends does"""
+    posts = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            posts.append(self.path)
+            self.send_response(200)
+            self.send_header(
+                "Set-Cookie",
+                f"NID=nid-{len(posts)}; expires={formatdate(time.time() + 3600, usegmt=True)}; path=/",
+            )
+            self.end_headers()
+
+        def do_GET(self):
+            self.send_response(405)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    class LocalTrendReq(_TrendReq):
+        COOKIE_URL = f"http://127.0.0.1:{server.server_port}/trends/explore/"
+
+    yield LocalTrendReq, posts
+    server.shutdown()
+
+
+def test_cookie_cache(tmp_path):
+    cache = CookieCache(path=tmp_path / "cookies.json", max_age=60)
+    assert cache.get("direct") is None
+
+    cache.put("direct", {"NID": "a"}, expires=time.time() + 3600)
+    assert cache.get("direct") == {"NID": "a"}
+    # capped by max_age
+    assert (
+        CookieCache(path=tmp_path / "cookies.json")._load()["direct"]["expires"]
+        <= time.time() + 60
+    )
+
+    cache.put("proxy", {"NID": "b"}, expires=time.time() - 1)
+    assert cache.get("proxy") is None
+
+
+def test_trend_req_cookie(tmp_path, cookie_server):
+    LocalTrendReq, posts = cookie_server
+    cache = CookieCache(path=tmp_path / "cookies.json")
+
+    trends_service = LocalTrendReq(hl="en-US", tz=120, cookie_cache=cache)
+    assert trends_service.cookies == {"NID": "nid-1"}
+    assert posts == ["/trends/explore/?geo=US"]
+    assert cache._load()["direct"]["expires"] == pytest.approx(
+        time.time() + 3600, abs=60
+    )
+
+    # new instances and new runs reuse the cached cookie
+    assert LocalTrendReq(hl="en-US", tz=120, cookie_cache=cache).cookies == {
+        "NID": "nid-1"
+    }
+    assert len(posts) == 1
+
+
+def test_trend_req_threads(cookie_server):
+    LocalTrendReq, posts = cookie_server
+    requests_get = requests.get
+    cookies = []
+
+    def create():
+        cookies.append(LocalTrendReq(hl="en-US", tz=120).cookies)
+
+    threads = [threading.Thread(target=create) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert requests.get is requests_get
+    assert len(posts) == 8
+    assert sorted(c["NID"] for c in cookies) == sorted(f"nid-{i}" for i in range(1, 9))
@@ -1,9 +1,21 @@
+import copy
 import datetime
+import json
+import time
 
 import pandas as pd
 import pytest
-
-from sm_trendy.use_pytrends.get_trends import SingleTrend, _TrendReq
+from pytrends import exceptions
+
+from sm_trendy.use_pytrends.config import ConfigBundle
+from sm_trendy.use_pytrends.get_trends import (
+    BatchTrend,
+    PooledDownload,
+    SingleTrend,
+    _TrendReq,
+    batch_configs,
+)
+from sm_trendy.use_pytrends.proxy import ProxyPool
 from sm_trendy.utilities.storage import StoreDataFrame
 
 
@@ -62,3 +74,140 @@ def test_store_dataframe(tmp_path, singletrend):
 
     pd.testing.assert_frame_equal(singletrend.dataframe, df_parquet_reloaded)
     pd.testing.assert_frame_equal(df_csv_reloaded, df_parquet_reloaded)
+
+
+def test_pooled_download(tmp_path, data_directory, test_directory):
+    with open(data_directory / "test_config.json", "r") as fp:
+        config = json.load(fp)
+    config["global"]["path"]["parent_folder"] = str(tmp_path)
+    config_path = tmp_path / "config.json"
+    with open(config_path, "w") as fp:
+        json.dump(config, fp)
+    cb = ConfigBundle(file_path=config_path)
+
+    class FakeTrendReq:
+        def __init__(self, proxy: str):
+            self.proxy = proxy
+
+        def build_payload(self, kw_list, cat=0, timeframe="today 5-y", geo=""):
+            if self.proxy == "throttled":
+                raise exceptions.TooManyRequestsError("429", response=None)
+
+        def interest_over_time(self):
+            return pd.read_csv(
+                test_directory / "data" / "test_keyword_motion_sensor.csv"
+            )
+
+    proxy_pool = ProxyPool(
+        ["throttled", "healthy"], min_interval=0, max_consecutive_failures=1
+    )
+    pdl = PooledDownload(
+        parent_folder=tmp_path,
+        snapshot_date=datetime.date(2023, 6, 1),
+        proxy_pool=proxy_pool,
+        trends_service_factory=FakeTrendReq,
+    )
+
+    assert pdl(cb) == {"downloaded": len(cb), "failed": 0}
+    assert proxy_pool.healthy == ["healthy"]
+    for c in cb:
+        assert list(c.path_params.path(parent_folder=tmp_path).rglob("data.csv"))
+
+
+def test_pooled_download_latency_excludes_save(
+    tmp_path, data_directory, pytrends_service, mocker
+):
+    cb = ConfigBundle(file_path=data_directory / "test_config.json")
+    save = mocker.patch.object(
+        StoreDataFrame, "save", side_effect=lambda *args, **kwargs: time.sleep(0.2)
+    )
+    proxy_pool = ProxyPool(["direct"], min_interval=0)
+    pdl = PooledDownload(
+        parent_folder=tmp_path,
+        snapshot_date=datetime.date(2023, 6, 1),
+        proxy_pool=proxy_pool,
+        trends_service_factory=lambda proxy: pytrends_service,
+    )
+
+    assert pdl(cb) == {"downloaded": len(cb), "failed": 0}
+    assert save.call_count == len(cb)
+    assert proxy_pool.summary()[0]["latency"] < 0.1
+
+
+class BatchTrendReq:
+    """each keyword is the motion sensor trend, scaled by its position"""
+
+    def __init__(self, test_directory):
+        self.test_directory = test_directory
+        self.payloads = []
+
+    def build_payload(self, kw_list, cat=0, timeframe="today 5-y", geo=""):
+        self.payloads.append(kw_list)
+
+    def interest_over_time(self):
+        df = pd.read_csv(
+            self.test_directory / "data" / "test_keyword_motion_sensor.csv"
+        )
+        kw_list = self.payloads[-1]
+        values = df.pop("motion sensor")
+        for i, keyword in enumerate(kw_list):
+            df.insert(i + 1, keyword, (values * (i + 1) / len(kw_list)).round())
+
+        return df
+
+
+def test_batch_trend(test_directory):
+    trends_service = BatchTrendReq(test_directory)
+    bt = BatchTrend(
+        trends_service=trends_service,
+        keywords=["phone case", "curtain"],
+        geo="DE",
+    )
+
+    assert set(bt.trends) == {"phone case", "curtain"}
+    df = bt.trends["phone case"].dataframe
+    assert df.columns.tolist() == ["date", "phone case", "isPartial"]
+    assert df["phone case"].max() == 100
+    assert bt.trends["curtain"].metadata["batch"] == ["phone case", "curtain"]
+    assert trends_service.payloads == [["phone case", "curtain"]]
+
+    with pytest.raises(ValueError):
+        BatchTrend(trends_service=trends_service, keywords=["a"] * 6, geo="DE")
+
+
+def test_batch_configs(data_directory):
+    cb = ConfigBundle(file_path=data_directory / "test_config.json")
+    configs = cb.configs * 3
+    for i, c in enumerate(configs[:-1]):
+        c = copy.deepcopy(c)
+        c.trend_params.keyword = f"keyword {i}"
+        configs[i] = c
+    configs[0].trend_params.geo = "US"
+
+    batches = batch_configs(configs, batch_size=2)
+    assert [[c.trend_params.keyword for c in b] for b in batches] == [
+        ["keyword 0"],
+        ["keyword 1", "keyword 2"],
+        ["keyword 3", "keyword 4"],
+        ["curtain"],
+    ]
+
+
+def test_pooled_download_batched(tmp_path, data_directory, test_directory):
+    cb = ConfigBundle(file_path=data_directory / "test_config.json")
+    trends_service = BatchTrendReq(test_directory)
+    pdl = PooledDownload(
+        parent_folder=tmp_path,
+        snapshot_date=datetime.date(2023, 6, 1),
+        proxy_pool=ProxyPool(["direct"], min_interval=0),
+        trends_service_factory=lambda proxy: trends_service,
+        batch_size=5,
+    )
+
+    assert pdl(cb) == {"downloaded": 2, "failed": 0}
+    assert trends_service.payloads == [["phone case", "curtain"]]
+    for c in cb:
+        csv_files = list(c.path_params.path(parent_folder=tmp_path).rglob("data.csv"))
+        df = pd.read_csv(csv_files[0])
+        assert df.columns.tolist() == ["date", c.trend_params.keyword, "isPartial"]
+        assert df[c.trend_params.keyword].max() == 100
@@ -0,0 +1,153 @@
+import threading
+import time
+
+import pytest
+import requests
+from pytrends import exceptions
+
+from sm_trendy.use_pytrends.proxy import ProxyPool, classify_error
+
+
+def test_proxy_pool_scoring():
+    pool = ProxyPool(["a", "b"], min_interval=0)
+
+    for url, latency in [("a", 1.0), ("b", 0.1)]:
+        proxy = pool.proxies[url]
+        proxy.in_use = True
+        pool.release(proxy, latency=latency)
+
+    assert pool.acquire().url == "b"
+    # b is in use
+    assert pool.acquire().url == "a"
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.01)
+
+
+def test_proxy_pool_rate_limit():
+    pool = ProxyPool(["a"], min_interval=0.2)
+    proxy = pool.acquire()
+    pool.release(proxy, latency=0.01)
+
+    t0 = time.monotonic()
+    pool.acquire()
+    assert time.monotonic() - t0 >= 0.15
+
+
+def test_proxy_pool_eviction_and_probation():
+    pool = ProxyPool(
+        ["a", "b"],
+        min_interval=0,
+        max_consecutive_failures=2,
+        probation_seconds=0.1,
+    )
+    for _ in range(2):
+        proxy = pool.proxies["a"]
+        proxy.in_use = True
+        pool.release(proxy, latency=0.1, outcome="error")
+
+    assert pool.proxies["a"].state == "evicted"
+    assert pool.healthy == ["b"]
+
+    assert pool.acquire().url == "b"
+    time.sleep(0.15)
+    proxy = pool.acquire()
+    assert proxy.url == "a"
+    assert proxy.state == "probation"
+
+    # a failure on probation evicts again, for twice as long
+    pool.release(proxy, latency=0.1, outcome="error")
+    assert pool.proxies["a"].state == "evicted"
+    assert pool.proxies["a"].evicted_until - time.monotonic() > 0.15
+
+    time.sleep(0.25)
+    proxy = pool.acquire()
+    pool.release(proxy, latency=0.1)
+    assert pool.proxies["a"].state == "healthy"
+
+
+def test_proxy_pool_throttled():
+    pool = ProxyPool(["a"], min_interval=0.05)
+    with pytest.raises(exceptions.TooManyRequestsError):
+        with pool.proxy():
+            raise exceptions.TooManyRequestsError("throttled", response=None)
+
+    proxy = pool.proxies["a"]
+    assert proxy.throttles == 1
+    # the rate of the proxy is halved
+    assert proxy.rate.interval == pytest.approx(0.1)
+    assert proxy.rate.next_request_at - time.monotonic() > 0.05
+
+
+def test_proxy_pool_concurrent():
+    pool = ProxyPool([f"p{i}" for i in range(4)], min_interval=0)
+    in_use = set()
+    lock = threading.Lock()
+    overlaps = []
+
+    def work():
+        for _ in range(20):
+            with pool.proxy() as url:
+                with lock:
+                    overlaps.append(url in in_use)
+                    in_use.add(url)
+                time.sleep(0.001)
+                with lock:
+                    in_use.discard(url)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(overlaps) == 160
+    assert not any(overlaps)
+    assert sum(p["requests"] for p in pool.summary()) == 160
+
+
+def test_proxy_pool_neutral_outcome():
+    pool = ProxyPool(["a"], min_interval=0, max_consecutive_failures=3)
+    proxy = pool.proxies["a"]
+    for _ in range(2):
+        proxy.in_use = True
+        pool.release(proxy, latency=0.1, outcome="error")
+    rate = proxy.rate.rate
+    error_rate = proxy.error_rate
+
+    # e.g., a 400 for an invalid keyword
+    response = requests.Response()
+    response.status_code = 400
+    with pytest.raises(exceptions.ResponseError):
+        with pool.proxy():
+            raise exceptions.ResponseError("400", response=response)
+
+    assert not proxy.in_use
+    assert proxy.rate.rate == rate
+    assert proxy.error_rate == error_rate
+    assert proxy.consecutive_failures == 2
+    assert proxy.requests == 2
+    assert proxy.latency is not None
+
+    # the error streak goes on
+    proxy.in_use = True
+    pool.release(proxy, latency=0.1, outcome="error")
+    assert proxy.state == "evicted"
+
+
+def test_classify_error():
+    assert classify_error(requests.exceptions.ProxyError()) == "error"
+    assert (
+        classify_error(exceptions.TooManyRequestsError("429", response=None))
+        == "throttled"
+    )
+    assert classify_error(requests.exceptions.ReadTimeout()) == "error"
+    assert classify_error(ValueError()) is None
+
+    response = requests.Response()
+    response.status_code = 502
+    assert classify_error(exceptions.ResponseError("502", response=response)) == (
+        "error"
+    )
+    # errors of the request, e.g., an invalid keyword, are not the proxy's
+    response.status_code = 400
+    assert classify_error(exceptions.ResponseError("400", response=response)) is None
@@ -1,8 +1,10 @@
+import datetime
 import json
 
 import pytest
 
-from sm_trendy.use_serpapi.get_trends import SerpAPISingleTrend
+from sm_trendy.use_serpapi.config import SerpAPIConfigBundle
+from sm_trendy.use_serpapi.get_trends import SerpAPIDownload, SerpAPISingleTrend
 
 
 @pytest.fixture
@@ -26,3 +28,34 @@ def test_serpapi_single_trend(serpapi_search_result):
 
 def test_download_convert_dataframe(serpapi_search_result):
     serpapi_search_result
+
+
+def test_serpapi_download_deduplicated(
+    tmp_path, data_directory, serpapi_search_result, mocker
+):
+    mocker.patch.object(
+        SerpAPISingleTrend,
+        "search_results",
+        new=property(lambda self: serpapi_search_result),
+    )
+    config = SerpAPIConfigBundle(
+        file_path=data_directory / "use_serpapi" / "test_serpapi_config.json",
+        serpapi_key="test",
+    )[0]
+    for day in [30, 31]:
+        SerpAPIDownload(
+            parent_folder=tmp_path, snapshot_date=datetime.date(2023, 7, day)
+        )(config)
+
+    target_folder = config.path_params.path(parent_folder=tmp_path)
+    # the raw json is only saved with the data
+    assert [p.parent.name for p in target_folder.glob("format=json/*/data.json")] == [
+        "snapshot_date=2023-07-30"
+    ]
+    assert not (
+        target_folder / "format=csv" / "snapshot_date=2023-07-31" / "data.csv"
+    ).exists()
+    with open(
+        target_folder / "format=csv" / "snapshot_date=2023-07-31" / "metadata.json"
+    ) as fp:
+        assert "search_metadata" in json.load(fp)
@@ -0,0 +1,108 @@
+import datetime
+import json
+
+import pandas as pd
+import pytest
+
+from sm_trendy.utilities.metrics import METRICS, Metrics
+from sm_trendy.utilities.storage import StoreDataFrame, StoreDeltaDataFrame
+
+
+def test_metrics_timer():
+    metrics = Metrics(buckets=(0.1, 1))
+    with metrics.timer("upload", "csv") as t:
+        t.bytes = 10
+    with pytest.raises(ValueError):
+        with metrics.timer("upload", "csv"):
+            raise ValueError("failed")
+    metrics.observe("fetch", "serpapi", 0.5)
+    metrics.observe("fetch", "serpapi", 2)
+
+    stages = {(s["stage"], s["kind"]): s for s in metrics.report("test")["stages"]}
+    assert stages[("upload", "csv")]["count"] == 2
+    assert stages[("upload", "csv")]["errors"] == 1
+    assert stages[("upload", "csv")]["bytes"] == 10
+    assert stages[("fetch", "serpapi")]["seconds"] == 2.5
+    assert stages[("fetch", "serpapi")]["p50_seconds"] == 1
+    assert stages[("fetch", "serpapi")]["p99_seconds"] == 1
+
+    metrics.reset()
+    assert metrics.report("test")["stages"] == []
+
+
+def test_metrics_quantile():
+    metrics = Metrics(buckets=(1, 2, 4))
+    for seconds in [0.5, 1.5, 1.5, 3]:
+        metrics.observe("read", "csv", seconds)
+    m = metrics.stages[("read", "csv")]
+
+    assert m.quantile(0.25) == 1
+    assert m.quantile(0.5) == 1.5
+    assert m.quantile(1) == 4
+
+
+def test_metrics_prometheus():
+    metrics = Metrics(buckets=(0.1, 1))
+    metrics.observe("upload", "csv", 0.5, n_bytes=100)
+    metrics.observe("upload", "csv", 5, error=True)
+
+    lines = metrics.to_prometheus("agg").splitlines()
+    labels = 'command="agg",stage="upload",kind="csv"'
+
+    assert "# TYPE trendy_stage_seconds histogram" in lines
+    assert f'trendy_stage_seconds_bucket{{{labels},le="0.1"}} 0' in lines
+    assert f'trendy_stage_seconds_bucket{{{labels},le="1"}} 1' in lines
+    assert f'trendy_stage_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+    assert f"trendy_stage_seconds_count{{{labels}}} 2" in lines
+    assert f"trendy_stage_errors_total{{{labels}}} 1" in lines
+    assert f"trendy_stage_bytes_total{{{labels}}} 100" in lines
+
+
+def test_metrics_write_report(tmp_path):
+    metrics = Metrics()
+    metrics.observe("fetch", "serpapi", 0.2)
+
+    folder = metrics.write_report(tmp_path, "download-serpapi", summary={"failed": 0})
+
+    assert folder.parent == tmp_path / "_runs" / "command=download-serpapi"
+    with open(folder / "report.json", "r") as fp:
+        report = json.load(fp)
+    assert report["command"] == "download-serpapi"
+    assert report["summary"] == {"failed": 0}
+    assert report["stages"][0]["stage"] == "fetch"
+    assert "trendy_stage_seconds_count" in (folder / "metrics.prom").read_text()
+
+
+class TrendData:
+    dataframe = pd.DataFrame({"date": ["2023-07-30"], "extracted_value": [1]})
+    metadata = {"keyword": "curtain"}
+
+
+def test_store_dataframe_metrics(tmp_path):
+    METRICS.reset()
+    sdf = StoreDataFrame(target_folder=tmp_path, snapshot_date=datetime.date.today())
+    sdf.save(TrendData(), formats=["csv", "parquet"])
+
+    stages = {(s["stage"], s["kind"]): s for s in METRICS.report("test")["stages"]}
+    assert stages[("serialise", "csv")]["count"] == 1
+    assert stages[("upload", "csv")]["bytes"] == stages[("serialise", "csv")]["bytes"]
+    assert stages[("upload", "parquet")]["count"] == 1
+    assert stages[("upload", "json")]["count"] == 2
+
+
+def test_store_delta_dataframe_metrics(tmp_path):
+    METRICS.reset()
+    for day in [26, 27]:
+        sdd = StoreDeltaDataFrame(
+            target_folder=tmp_path, snapshot_date=datetime.date(2023, 7, day)
+        )
+        sdd.save(TrendData())
+
+    stages = {(s["stage"], s["kind"]): s for s in METRICS.report("test")["stages"]}
+    # base.parquet, then delta.parquet
+    assert stages[("serialise", "parquet")]["count"] == 2
+    assert stages[("upload", "parquet")]["bytes"] == (
+        stages[("serialise", "parquet")]["bytes"]
+    )
+    # metadata.json twice, delta.json once
+    assert stages[("upload", "json")]["count"] == 3
@@ -0,0 +1,76 @@
+import pstats
+
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+
+from sm_trendy.aggregate.agg import AggAPIJSON
+from sm_trendy.cli import trendy
+from sm_trendy.utilities.metrics import METRICS
+from sm_trendy.utilities.profiling import Profiler
+
+
+@pytest.fixture
+def dataframe():
+    return pd.DataFrame(
+        {
+            "query": ["curtain"] * 100,
+            "date": pd.date_range("2023-01-01", periods=100),
+            "extracted_value": range(100),
+        }
+    )
+
+
+def test_profiler_cpu(tmp_path, dataframe):
+    METRICS.reset()
+    profiler = Profiler(mode="cpu", profile_dir=tmp_path)
+    profiler.start()
+    AggAPIJSON().to_json_bytes(dataframe, sort_by="date")
+    folder = profiler.stop(command="agg")
+
+    assert folder.parent == tmp_path / "command=agg"
+    stats = pstats.Stats(str(folder / "profile.pstats"))
+    assert any(name == "to_json_bytes" for _, _, name in stats.stats)
+    assert "cumulative" in (folder / "profile.txt").read_text()
+
+
+def test_profiler_memory(tmp_path, dataframe):
+    METRICS.reset()
+    profiler = Profiler(mode="memory", profile_dir=tmp_path)
+    profiler.start()
+    payloads = [AggAPIJSON().to_json_bytes(dataframe) for _ in range(10)]
+    folder = profiler.stop(command="agg")
+
+    report = (folder / "memory.txt").read_text()
+    assert len(payloads) == 10
+    assert "peak:" in report
+    assert "sm_trendy.aggregate.agg:" in report
+
+
+def test_profiler_next_to_run_report(tmp_path):
+    METRICS.reset()
+    profiler = Profiler(mode="cpu", profile_dir=tmp_path / "profiles")
+    profiler.start()
+    run_folder = METRICS.write_report(tmp_path, "agg")
+    folder = profiler.stop(command="agg")
+
+    assert folder == run_folder
+    assert (folder / "profile.pstats").exists()
+
+
+def test_cli_profile(tmp_path, data_directory):
+    config_file = data_directory / "use_serpapi" / "test_serpapi_config.json"
+    result = CliRunner().invoke(
+        trendy,
+        [
+            "--profile",
+            "cpu",
+            "--profile-dir",
+            str(tmp_path),
+            "validate-config",
+            str(config_file),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert list(tmp_path.glob("command=validate-config/run=*/profile.pstats"))
@@ -0,0 +1,239 @@
+import datetime
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from pytrends import exceptions
+from serpapi.serp_api_client import SerpApiClient
+
+from sm_trendy.use_serpapi.config import SerpAPIConfigBundle
+from sm_trendy.use_serpapi.get_trends import (
+    SerpAPIDownload,
+    SerpAPIError,
+    SerpAPISingleTrend,
+    SerpAPIThrottledError,
+)
+from sm_trendy.utilities.rate import AdaptiveRateController, is_throttled
+
+
+def test_is_throttled():
+    response = requests.Response()
+    response.status_code = 429
+    assert is_throttled(requests.exceptions.HTTPError(response=response))
+    assert is_throttled(exceptions.TooManyRequestsError("429", response=None))
+    assert is_throttled(SerpAPIThrottledError("Too many requests", status_code=429))
+    assert not is_throttled(Exception("Request failed with error Processing"))
+    assert not is_throttled(SerpAPIError("Invalid API key.", status_code=401))
+    assert not is_throttled(ValueError("not found"))
+
+
+@pytest.mark.parametrize(
+    "error, status_code, throttled",
+    [
+        ("Too many requests", 429, True),
+        ("Your account has exceeded the hourly throughput limit.", 200, True),
+        ("Your account has run out of searches.", 429, False),
+        ("Invalid API key. Your API key should be here: ...", 401, False),
+        ("Error", 200, False),
+    ],
+)
+def test_serpapi_error(error, status_code, throttled):
+    e = SerpAPISingleTrend._error(error, status_code=status_code)
+
+    assert isinstance(e, SerpAPIError)
+    assert is_throttled(e) == throttled
+    assert e.status_code == status_code
+
+
+def test_aimd():
+    rc = AdaptiveRateController(
+        interval=1, min_interval=0.5, max_interval=8, increase=0.25, jitter=0
+    )
+    rc.success()
+    assert rc.rate == 1.25
+    for _ in range(10):
+        rc.success()
+    assert rc.rate == 2
+
+    rc.throttled()
+    assert rc.rate == 1
+    for _ in range(2):
+        rc.throttled()
+    assert rc.rate == 0.25
+    rc.throttled()
+    # bounded by max_interval
+    assert rc.rate == 0.125
+    assert rc.next_request_at > time.monotonic()
+
+
+def test_circuit_breaker():
+    rc = AdaptiveRateController(
+        interval=0.01,
+        min_interval=0.01,
+        max_interval=0.02,
+        failure_threshold=2,
+        cooldown=0.2,
+    )
+    rc.throttled()
+    assert rc.state == "closed"
+    rc.throttled()
+    assert rc.state == "open"
+    assert not rc.ready()
+
+    assert rc.reserve() == pytest.approx(0.2, abs=0.02)
+    assert rc.state == "half-open"
+    # a throttled probe opens the circuit again
+    rc.throttled()
+    assert rc.state == "open"
+
+    rc.reserve()
+    rc.success()
+    assert rc.state == "closed"
+
+
+def test_circuit_breaker_probe_failed():
+    rc = AdaptiveRateController(
+        interval=0.01, min_interval=0.01, failure_threshold=1, cooldown=0.05
+    )
+    rc.throttled()
+    assert rc.state == "open"
+    probing = threading.Event()
+
+    def probe():
+        with pytest.raises(ValueError):
+            with rc.request():
+                probing.set()
+                time.sleep(0.2)
+                raise ValueError("invalid keyword")
+
+    thread = threading.Thread(target=probe)
+    thread.start()
+    probing.wait()
+    assert rc.state == "half-open"
+    assert not rc.ready()
+
+    # the other callers wait for the outcome of the probe
+    t0 = time.monotonic()
+    rc.wait()
+    assert time.monotonic() - t0 >= 0.1
+    thread.join()
+
+    # the failed probe opened the circuit again, and this caller probes
+    assert rc.throttles == 1
+    assert rc.state == "half-open"
+    assert rc.probing
+    rc.success()
+    assert rc.state == "closed"
+    assert not rc.probing
+
+
+@contextmanager
+def serpapi_server(respond):
+    """stand-in for SerpAPI, `respond` returns the status and body
+    of the n-th request"""
+    requested_at = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requested_at.append(time.monotonic())
+            status, body = respond(len(requested_at))
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps(body).encode("utf-8"))
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    backend = SerpApiClient.BACKEND
+    SerpApiClient.BACKEND = f"http://127.0.0.1:{server.server_port}"
+
+    try:
+        yield requested_at
+    finally:
+        SerpApiClient.BACKEND = backend
+        server.shutdown()
+
+
+@pytest.fixture
+def throttling_serpapi(data_directory):
+    """stand-in for SerpAPI that throttles the 4th to 6th requests"""
+    with open(data_directory / "use_serpapi" / "serpapi_coffee_results.json") as fp:
+        results = json.load(fp)
+
+    def respond(n):
+        if 4 <= n <= 6:
+            return 429, {"error": "Too many requests"}
+        return 200, results
+
+    with serpapi_server(respond) as requested_at:
+        yield requested_at
+
+
+def test_rate_controller_serpapi(tmp_path, data_directory, throttling_serpapi):
+    scb = SerpAPIConfigBundle(
+        file_path=data_directory / "use_serpapi" / "test_serpapi_config.json",
+        serpapi_key="test",
+    )
+    rc = AdaptiveRateController(
+        interval=0.02,
+        min_interval=0.01,
+        max_interval=0.5,
+        failure_threshold=3,
+        cooldown=0.3,
+    )
+    sdl = SerpAPIDownload(
+        parent_folder=tmp_path,
+        snapshot_date=datetime.date(2023, 7, 31),
+        rate_controller=rc,
+    )
+
+    rates = []
+    for _ in range(10):
+        try:
+            sdl(scb[0])
+        except Exception as e:
+            assert "Request failed" in str(e)
+        rates.append(rc.rate)
+
+    assert rc.throttles == 3
+    assert rc.successes == 7
+    assert rc.state == "closed"
+    # cut on each throttle, and increased again on success
+    assert rates[5] < rates[4] < rates[3] < rates[2]
+    assert rates[9] > rates[6]
+    # the circuit opened after the 6th request
+    gaps = [b - a for a, b in zip(throttling_serpapi, throttling_serpapi[1:])]
+    assert gaps[5] >= 0.25
+    assert max(gaps[:3]) < 0.25
+    assert list(tmp_path.rglob("data.csv"))
+
+
+def test_rate_controller_serpapi_invalid_key(tmp_path, data_directory):
+    scb = SerpAPIConfigBundle(
+        file_path=data_directory / "use_serpapi" / "test_serpapi_config.json",
+        serpapi_key="invalid",
+    )
+    rc = AdaptiveRateController(interval=0.01, min_interval=0.01, failure_threshold=2)
+    sdl = SerpAPIDownload(
+        parent_folder=tmp_path,
+        snapshot_date=datetime.date(2023, 7, 31),
+        rate_controller=rc,
+    )
+    rate = rc.rate
+
+    error = {"error": "Invalid API key. Your API key should be here: ..."}
+    with serpapi_server(lambda n: (401, error)):
+        for _ in range(3):
+            with pytest.raises(SerpAPIError, match="Invalid API key"):
+                sdl(scb[0])
+
+    assert rc.rate == rate
+    assert rc.throttles == 0
+    assert rc.state == "closed"
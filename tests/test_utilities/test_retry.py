@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from collections import Counter
+
+import pytest
+import requests
+
+from sm_trendy.use_serpapi.config import SerpAPIConfigBundle
+from sm_trendy.use_serpapi.get_trends import SerpAPISingleTrend, SerpAPIThrottledError
+from sm_trendy.utilities.retry import DeadLetterFile, RetryQueue, classify_failure
+
+
+@pytest.fixture
+def serpapi_config_bundle(data_directory):
+    return SerpAPIConfigBundle(
+        file_path=data_directory / "use_serpapi" / "test_serpapi_config.json",
+        serpapi_key="secret",
+    )
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (SerpAPIThrottledError("Too many requests", status_code=429), "transient"),
+        (requests.exceptions.ConnectionError("reset"), "transient"),
+        (requests.exceptions.ReadTimeout("timeout"), "transient"),
+        (FileNotFoundError("multiTimeline.csv"), "permanent"),
+        (SerpAPISingleTrend._error("Invalid API key.", status_code=401), "permanent"),
+        (
+            SerpAPISingleTrend._error(
+                "Your account has run out of searches.", status_code=429
+            ),
+            "permanent",
+        ),
+        (SerpAPISingleTrend._error("Internal error", status_code=503), "transient"),
+        (Exception("interest_over_time is not found"), "permanent"),
+    ],
+)
+def test_classify_failure(error, expected):
+    assert classify_failure(error) == expected
+
+
+def test_classify_failure_status():
+    response = requests.Response()
+    response.status_code = 503
+    assert classify_failure(requests.exceptions.HTTPError(response=response)) == (
+        "transient"
+    )
+    response.status_code = 404
+    assert classify_failure(requests.exceptions.HTTPError(response=response)) == (
+        "permanent"
+    )
+
+
+class FlakyDownload:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = Counter()
+
+    def __call__(self, config):
+        keyword = config.serpapi_params.q
+        self.calls[keyword] += 1
+        if self.calls[keyword] <= len(self.failures.get(keyword, [])):
+            raise self.failures[keyword][self.calls[keyword] - 1]
+
+
+def test_retry_queue(tmp_path, serpapi_config_bundle):
+    download = FlakyDownload(
+        {
+            "phone case": [SerpAPIThrottledError("Too many requests", status_code=429)]
+            * 2,
+            "curtain": [FileNotFoundError("multiTimeline.csv")],
+        }
+    )
+    dead_letter = DeadLetterFile(tmp_path / "dead_letter.jsonl")
+    rq = RetryQueue(download, max_attempts=3, backoff=0.01, dead_letter=dead_letter)
+
+    assert rq(serpapi_config_bundle) == {"succeeded": 1, "retries": 2, "failed": 1}
+    assert download.calls == {"phone case": 3, "curtain": 1}
+
+    with open(dead_letter.path) as fp:
+        records = [json.loads(line) for line in fp]
+    assert len(records) == 1
+    assert records[0]["serpapi"]["q"] == "curtain"
+    assert "api_key" not in records[0]["serpapi"]
+    assert records[0]["failure"] == "permanent"
+    assert records[0]["attempts"] == 1
+
+    # a follow-up run only downloads the failures
+    serpapi_config_bundle.raw_configs["keywords"] = DeadLetterFile.load(
+        dead_letter.path
+    )
+    assert [c.serpapi_params.q for c in serpapi_config_bundle] == ["curtain"]
+    assert serpapi_config_bundle[0].serpapi_params.api_key == "secret"
+    assert rq(serpapi_config_bundle) == {"succeeded": 1, "retries": 0, "failed": 0}
+    assert not dead_letter.path.exists()
+
+
+def test_retry_queue_max_attempts(tmp_path, serpapi_config_bundle):
+    download = FlakyDownload(
+        {"phone case": [requests.exceptions.ConnectionError("reset")] * 5}
+    )
+    dead_letter = DeadLetterFile(tmp_path / "dead_letter.jsonl")
+    rq = RetryQueue(download, max_attempts=2, backoff=0.01, dead_letter=dead_letter)
+
+    assert rq(serpapi_config_bundle) == {"succeeded": 1, "retries": 1, "failed": 1}
+    assert download.calls["phone case"] == 2
+
+    records = DeadLetterFile.load(dead_letter.path)
+    assert records == [
+        {
+            "serpapi": {
+                "engine": "google_trends",
+                "q": "phone case",
+                "geo": "DE",
+                "data_type": "TIMESERIES",
+                "tz": "120",
+                "cat": "0",
+                "date": "today 5-y",
+            }
+        }
+    ]
+
+
+def test_retry_queue_max_workers(serpapi_config_bundle):
+    running, peak = [], []
+    lock = threading.Lock()
+
+    def download(config):
+        with lock:
+            running.append(config)
+            peak.append(len(running))
+            first = len(peak) == 1
+        time.sleep(0.05)
+        running.remove(config)
+        if first:
+            raise TimeoutError("read timeout")
+
+    rq = RetryQueue(download, backoff=0.01, max_workers=2)
+
+    assert rq(serpapi_config_bundle.configs * 2) == {
+        "succeeded": 4,
+        "retries": 1,
+        "failed": 0,
+    }
+    assert max(peak) == 2
@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from sm_trendy.utilities.schema import TREND_SCHEMA, enforce_trend_schema
+
+
+@pytest.fixture
+def serpapi_dataframe():
+    return pd.DataFrame(
+        {
+            "query": ["curtain", "curtain"],
+            "value": ["14", "<1"],
+            "extracted_value": [14, 0],
+            "date_range": ["Jul 29 – Aug 4, 2018", "Aug 5 – 11, 2018"],
+            "timestamp": ["1532822400", "1533427200"],
+            "date": ["2018-07-29", "2018-08-05"],
+        }
+    )
+
+
+@pytest.fixture
+def manual_dataframe():
+    return pd.DataFrame(
+        {
+            "date": ["2018-07-29", "2018-08-05"],
+            "extracted_value": ["14", "<1"],
+            "query": ["curtain", "curtain"],
+            "geo": ["DE", "DE"],
+            "timeframe": ["today 5-y", "today 5-y"],
+            "cat": ["0", "0"],
+        }
+    )
+
+
+@pytest.mark.parametrize("fixture", ["serpapi_dataframe", "manual_dataframe"])
+def test_enforce_trend_schema(request, fixture):
+    df = enforce_trend_schema(request.getfixturevalue(fixture))
+
+    assert "value" not in df
+    for c in df.columns:
+        assert str(df[c].dtype) == TREND_SCHEMA[c], c
+
+    assert df.extracted_value.tolist() == [14, 0]
+    assert df.below_one.tolist() == [False, True]
+
+    pd.testing.assert_frame_equal(enforce_trend_schema(df), df)
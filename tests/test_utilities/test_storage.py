@@ -1,6 +1,25 @@
+import datetime
+import gzip
+import hashlib
+import json
+import sys
+
+import pandas as pd
 import pytest
+from cloudpathlib import S3Client, S3Path
 
-from sm_trendy.utilities.storage import StoreJSON
+from sm_trendy.utilities.schema import enforce_trend_schema
+from sm_trendy.utilities.storage import (
+    StoreDataFrame,
+    StoreDeltaDataFrame,
+    StoreJSON,
+    dataframe_content_hash,
+    decompress,
+    is_empty_folder,
+    list_snapshot_dates,
+    resolve_data_path,
+    write_object,
+)
 
 
 @pytest.fixture
@@ -19,3 +38,208 @@ def test_store_json(tmp_path, test_storage_records):
     assert [
         i.name for i in (target_path / "format=json" / "snapshot_date=latest").iterdir()
     ] == ["data.json"]
+
+
+class _TrendData:
+    def __init__(self, dataframe):
+        self.dataframe = dataframe
+        self.metadata = {"keyword": "curtain"}
+
+
+@pytest.fixture
+def test_storage_dataframe():
+    return pd.DataFrame(
+        {
+            "date": ["2023-07-02", "2023-07-09", "2023-07-16"],
+            "extracted_value": [12, 15, 14],
+        }
+    )
+
+
+def test_dataframe_content_hash(test_storage_dataframe):
+    df = test_storage_dataframe
+
+    assert dataframe_content_hash(df) == dataframe_content_hash(
+        df[["extracted_value", "date"]]
+    )
+    assert dataframe_content_hash(df) != dataframe_content_hash(
+        df.assign(extracted_value=[12, 15, 13])
+    )
+
+
+def test_store_dataframe_deduplicate(tmp_path, test_storage_dataframe):
+    target_path = tmp_path / "test_store_dataframe_deduplicate"
+
+    deduplicated = []
+    for snapshot_date in [datetime.date(2023, 7, 26), datetime.date(2023, 7, 27)]:
+        sdf = StoreDataFrame(
+            target_folder=target_path, snapshot_date=snapshot_date, deduplicate=True
+        )
+        deduplicated.append(
+            sdf.save(_TrendData(test_storage_dataframe), formats=["csv", "parquet"])
+        )
+    assert deduplicated == [False, True]
+
+    for f in ["csv", "parquet"]:
+        assert list_snapshot_dates(target_path / f"format={f}") == [
+            "2023-07-26",
+            "2023-07-27",
+        ]
+
+        data_path = (
+            target_path / f"format={f}" / "snapshot_date=2023-07-27" / f"data.{f}"
+        )
+        assert not data_path.exists()
+
+        with open(data_path.parent / "metadata.json", "r") as fp:
+            metadata = json.load(fp)
+        assert metadata["keyword"] == "curtain"
+        assert metadata["storage"]["pointer"] == "2023-07-26"
+
+        assert resolve_data_path(data_path) == (
+            target_path / f"format={f}" / "snapshot_date=2023-07-26" / f"data.{f}"
+        )
+
+    sdf = StoreDataFrame(
+        target_folder=target_path,
+        snapshot_date=datetime.date(2023, 7, 28),
+        deduplicate=True,
+    )
+    sdf.save(
+        _TrendData(test_storage_dataframe.assign(extracted_value=[12, 15, 13])),
+        formats=["csv"],
+    )
+    assert (
+        target_path / "format=csv" / "snapshot_date=2023-07-28" / "data.csv"
+    ).exists()
+
+
+def test_store_dataframe_requested_formats_only(tmp_path, test_storage_dataframe):
+    target_path = tmp_path / "test_store_dataframe_requested_formats_only"
+
+    sdf = StoreDataFrame(
+        target_folder=target_path, snapshot_date=datetime.date(2023, 7, 26)
+    )
+    sdf.save(_TrendData(test_storage_dataframe), formats=["csv"])
+
+    assert sorted(p.name for p in target_path.iterdir()) == ["format=csv"]
+
+
+def _weekly_series(start: str, values):
+    dates = pd.date_range(start, periods=len(values), freq="7D")
+    return enforce_trend_schema(
+        pd.DataFrame(
+            {
+                "query": "curtain",
+                "date_range": dates.strftime("%b %d, %Y"),
+                "date": dates,
+                "extracted_value": values,
+            }
+        )
+    )
+
+
+def test_store_delta_dataframe(tmp_path):
+    target_path = tmp_path / "test_store_delta_dataframe"
+
+    snapshots = {
+        datetime.date(2023, 7, 26): _weekly_series("2023-01-01", list(range(10, 30))),
+        # window moves by one week
+        datetime.date(2023, 7, 27): _weekly_series("2023-01-08", list(range(11, 31))),
+        # rescaled by google, with one changed point
+        datetime.date(2023, 7, 28): _weekly_series(
+            "2023-01-08", [v * 2 for v in range(11, 30)] + [100]
+        ),
+        # completely different series
+        datetime.date(2023, 7, 29): _weekly_series(
+            "2023-01-08", list(range(50, 30, -1))
+        ),
+    }
+
+    for snapshot_date, df in snapshots.items():
+        sdd = StoreDeltaDataFrame(
+            target_folder=target_path, snapshot_date=snapshot_date
+        )
+        sdd.save(_TrendData(df))
+
+    format_path = target_path / "format=delta"
+    assert (format_path / "snapshot_date=2023-07-26" / "base.parquet").exists()
+    assert (format_path / "snapshot_date=2023-07-29" / "base.parquet").exists()
+
+    for snapshot_date in [datetime.date(2023, 7, 27), datetime.date(2023, 7, 28)]:
+        folder = format_path / f"snapshot_date={snapshot_date.isoformat()}"
+        assert not (folder / "base.parquet").exists()
+        assert len(pd.read_parquet(folder / "delta.parquet")) <= 2
+
+    with open(format_path / "snapshot_date=2023-07-28" / "delta.json", "r") as fp:
+        assert json.load(fp)["scale"] == 2.0
+
+    sdd = StoreDeltaDataFrame(target_folder=target_path)
+    for snapshot_date, df in snapshots.items():
+        pd.testing.assert_frame_equal(sdd.load(snapshot_date=snapshot_date), df)
+
+    pd.testing.assert_frame_equal(sdd.load(), snapshots[datetime.date(2023, 7, 29)])
+
+
+def test_store_json_gzip(tmp_path, test_storage_records):
+    sj = StoreJSON(
+        target_folder=tmp_path, snapshot_date="latest", content_encoding="gzip"
+    )
+    sj.save(records=test_storage_records, formats=["json"])
+
+    raw = (tmp_path / "format=json" / "snapshot_date=latest" / "data.json").read_bytes()
+
+    assert raw[:2] == b"\x1f\x8b"
+    assert json.loads(decompress(raw)) == test_storage_records
+
+
+def test_decompress(mocker):
+    body = b'\n  [{"name": "A"}]'
+    assert decompress(body) == body
+    assert decompress(gzip.compress(body)) == body
+    assert decompress(gzip.compress(body), content_encoding="gzip") == body
+    assert decompress(body, content_encoding="identity") == body
+    assert decompress(b"") == b""
+
+    mocker.patch.dict(sys.modules, {"brotli": None})
+    with pytest.raises(ImportError, match="pip install brotli"):
+        decompress(b"\x8b\x05\x80")
+
+
+def test_write_object_s3_headers(mocker):
+    client = S3Client(no_sign_request=True)
+    put_object = mocker.patch.object(client.client, "put_object")
+    target_path = S3Path("s3://sm-google-trend/agg/metadata.json", client=client)
+    body = b'{"name": "A"}'
+
+    etag = write_object(
+        target_path=target_path,
+        body=body,
+        content_encoding="gzip",
+        cache_control="public, max-age=3600",
+    )
+
+    kwargs = put_object.call_args.kwargs
+    assert kwargs["Bucket"] == "sm-google-trend"
+    assert kwargs["Key"] == "agg/metadata.json"
+    assert kwargs["ContentType"] == "application/json"
+    assert kwargs["ContentEncoding"] == "gzip"
+    assert kwargs["CacheControl"] == "public, max-age=3600"
+    assert decompress(kwargs["Body"]) == body
+    assert etag == f'"{hashlib.md5(kwargs["Body"]).hexdigest()}"'
+
+
+def test_is_empty_folder(tmp_path, mocker):
+    assert is_empty_folder(tmp_path / "missing")
+    assert is_empty_folder(tmp_path)
+    (tmp_path / "a").mkdir()
+    assert not is_empty_folder(tmp_path)
+
+    client = S3Client(no_sign_request=True)
+    list_objects = mocker.patch.object(
+        client.client, "list_objects_v2", return_value={"KeyCount": 1}
+    )
+    assert not is_empty_folder(S3Path("s3://sm-google-trend/manual/", client=client))
+    list_objects.assert_called_once_with(
+        Bucket="sm-google-trend", Prefix="manual/", MaxKeys=1
+    )